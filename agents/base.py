@@ -1,6 +1,7 @@
 from __future__ import annotations
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from utils.logger import log_event
+from utils.profiler import count_items, profile_step
 
 class BaseAgent:
     id: str = "base"
@@ -13,5 +14,24 @@ class BaseAgent:
     def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         raise NotImplementedError
 
+    def execute(self, payload: Dict[str, Any], profile: bool = False, cprofile_dir: Optional[str] = None,
+                attribute: bool = True) -> Dict[str, Any]:
+        # Entry point used by the workflow runner; `run` stays the per-agent hook
+        self.last_profile: Optional[Dict[str, Any]] = None
+        if not profile:
+            return self.run(payload)
+        with profile_step(self.id, cprofile_dir, attribute) as stats:
+            out = self.run(payload)
+        items_in, items_out = count_items(payload), count_items(out)
+        items = items_out if items_out is not None else items_in
+        stats.update({
+            "agent": type(self).__name__,
+            "items_in": items_in,
+            "items_out": items_out,
+            "items_per_sec": round(items / stats["wall_s"], 1) if items and stats["wall_s"] else None,
+        })
+        self.last_profile = stats
+        return out
+
     def _log(self, kind: str, payload):
         log_event(self.id, kind, payload)
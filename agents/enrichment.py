@@ -1,12 +1,123 @@
 from __future__ import annotations
-from typing import Dict, Any
+import os
+from typing import Dict, Any, List, Callable, Optional
 from agents.base import BaseAgent
-from tools.clients import mock_enrich
+from tools.clients import ClearbitClient, is_mock, mock_enrich
+from utils.cache import CACHE_DIR, DiskCache, content_key
+from utils.leads import LeadTable
+from utils.stream import chunked, is_stream
+
+def lead_domain(lead: Dict[str, Any]) -> str:
+    email = lead.get("email") or ""
+    if "@" in email:
+        return email.split("@", 1)[1].lower()
+    return f"{lead['company'].replace(' ', '').lower()}.com"
+
+class BulkEnricher:
+    """Enriches leads with one lookup per unique email (role) and per unique domain (stack).
+
+    Lookups go memo -> persistent cache -> provider, and provider calls are made in
+    BULK_SIZE batches; results are fanned back out to every lead sharing the key.
+    """
+
+    def __init__(self, client: ClearbitClient, cache: Optional[DiskCache] = None, batch_size: Optional[int] = None):
+        self.client = client
+        self.cache = cache
+        self.batch_size = batch_size or client.BULK_SIZE
+        self.people: Dict[str, Dict[str, Any]] = {}
+        self.companies: Dict[str, Dict[str, Any]] = {}
+        self.unique = {"person": 0, "company": 0}
+        self.api_calls = 0
+        # Cache entries are scoped to the provider and mock/live mode, so mock data never answers a live run
+        self.namespace = f"{getattr(client, 'provider', type(client).__name__)}:{'mock' if is_mock() else 'live'}"
+
+    def _resolve(self, kind: str, keys: List[str], memo: Dict[str, Dict[str, Any]],
+                 fetch: Callable[[List[str]], Dict[str, Dict[str, Any]]]) -> None:
+        missing = [k for k in dict.fromkeys(keys) if k not in memo]
+        self.unique[kind] += len(missing)
+        if missing and self.cache is not None:
+            ckeys = {content_key(self.namespace, kind, k): k for k in missing}
+            for ck, val in self.cache.get_many(list(ckeys)).items():
+                memo[ckeys[ck]] = val
+            missing = [k for k in missing if k not in memo]
+        for batch in chunked(missing, self.batch_size):
+            found = fetch(batch)
+            self.api_calls += 1
+            memo.update(found)
+            if self.cache is not None:
+                self.cache.set_many({content_key(self.namespace, kind, k): v for k, v in found.items()})
+
+    def enrich(self, leads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        domains = [lead_domain(L) for L in leads]
+        emails = [L.get("email") or f"{L['contact_name']}@{d}" for L, d in zip(leads, domains)]
+        self._resolve("person", emails, self.people, self.client.enrich_people)
+        self._resolve("company", domains, self.companies, self.client.enrich_companies)
+        return [
+            {
+                "company": L["company"],
+                "contact": L["contact_name"],
+                "role": self.people.get(e, {}).get("role", ""),
+                "technologies": self.companies.get(d, {}).get("technologies", []),
+                "domain": d,
+                **({"signal": L["signal"]} if "signal" in L else {}),
+                **({"email": L["email"]} if L.get("email") else {}),
+            }
+            for L, e, d in zip(leads, emails, domains)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "unique_emails": self.unique["person"],
+            "unique_domains": self.unique["company"],
+            "api_calls": self.api_calls,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
 
 class DataEnrichmentAgent(BaseAgent):
+    def _enricher(self, payload: Dict[str, Any]) -> BulkEnricher:
+        cache = None
+        if payload.get("cache", True):
+            cache = DiskCache(
+                payload.get("cache_path") or os.getenv("ENRICH_CACHE_PATH") or CACHE_DIR / "enrichment.sqlite",
+                ttl=payload.get("cache_ttl", 14 * 86400),
+                max_entries=payload.get("cache_max_entries", 1_000_000),
+            )
+        return BulkEnricher(ClearbitClient(), cache, payload.get("batch_size"))
+
     def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         leads = payload.get("leads", [])
+        bulk = payload.get("bulk", True)
+        if is_stream(leads):
+            return {"enriched_leads": self._enrich_stream(leads, self._enricher(payload) if bulk else None)}
         self._log("input", {"count": len(leads)})
-        enriched = mock_enrich(leads)
-        self._log("output", {"count": len(enriched)})
+        if not bulk:
+            enriched = mock_enrich(leads)
+            self._log("output", {"count": len(enriched)})
+            return {"enriched_leads": enriched}
+        enricher = self._enricher(payload)
+        try:
+            enriched = enricher.enrich(leads)
+        finally:
+            if enricher.cache is not None:
+                enricher.cache.close()
+        self._log("output", {"count": len(enriched), **enricher.stats()})
+        if payload.get("columnar"):
+            enriched = LeadTable.from_records(enriched)
         return {"enriched_leads": enriched}
+
+    def _enrich_stream(self, chunks, enricher: Optional[BulkEnricher]):
+        n = 0
+        try:
+            for chunk in chunks:
+                enriched = enricher.enrich(chunk) if enricher else mock_enrich(chunk)
+                n += len(enriched)
+                if enricher is not None:
+                    enricher.people.clear()  # emails rarely repeat across chunks; keep memory flat
+                yield enriched
+        finally:
+            stats = {}
+            if enricher is not None:
+                stats = enricher.stats()
+                if enricher.cache is not None:
+                    enricher.cache.close()
+            self._log("output", {"count": n, "streamed": True, **stats})
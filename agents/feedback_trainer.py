@@ -1,32 +1,107 @@
 from __future__ import annotations
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Tuple
 from agents.base import BaseAgent
 from tools.clients import GoogleSheetsClient, mock_recos
+from utils import logger
+from utils.runstore import DEFAULT_CAMPAIGN_ID, get_store
+
+FLAGS = ("opened", "clicked", "replied", "booked_meeting")
+RATES = ("open_rate", "click_rate", "reply_rate", "meeting_rate")
+SEGMENT_DIMS = ("signal", "role", "stack", "variant")
+OVERALL = ("all", "all")
+
+DEFAULT_WINDOW_RUNS = 30
+DEFAULT_MIN_SEGMENT = 20
+SEGMENT_LIFT = 1.5
+
+class SegmentedMetrics:
+    """Running [n, opened, clicked, replied, booked_meeting] counters per (dimension, value).
+
+    Each response updates the overall counter and one counter per segment dimension in
+    a single pass; counters from earlier runs can be merged in without the raw responses.
+    """
+
+    def __init__(self, counts: Dict[Tuple[str, str], List[int]] | None = None):
+        self.counts: Dict[Tuple[str, str], List[int]] = counts if counts is not None else {}
+
+    def update(self, r: Dict[str, Any]) -> None:
+        seg = r.get("segment") or {}
+        flags = (1, *(1 if r.get(f) else 0 for f in FLAGS))
+        for key in (OVERALL, *((d, str(seg.get(d) or "unknown")) for d in SEGMENT_DIMS)):
+            c = self.counts.get(key)
+            if c is None:
+                self.counts[key] = list(flags)
+            else:
+                for i, v in enumerate(flags):
+                    c[i] += v
+
+    def update_many(self, responses: Iterable[Dict[str, Any]]) -> "SegmentedMetrics":
+        for r in responses:
+            self.update(r)
+        return self
+
+    def rates(self, key: Tuple[str, str] = OVERALL) -> Dict[str, float]:
+        n, *hits = self.counts.get(key, [0, 0, 0, 0, 0])
+        return {name: h / (n or 1) for name, h in zip(RATES, hits)}
+
+    def segments(self, min_n: int = 1) -> List[Dict[str, Any]]:
+        return [
+            {"dim": dim, "value": value, "n": c[0], **self.rates((dim, value))}
+            for (dim, value), c in sorted(self.counts.items()) if (dim, value) != OVERALL and c[0] >= min_n
+        ]
 
 def compute_metrics(responses: List[Dict[str, Any]]) -> Dict[str, float]:
-    n = len(responses) or 1
-    opens = sum(r.get("opened", False) for r in responses)
-    clicks = sum(r.get("clicked", False) for r in responses)
-    replies = sum(r.get("replied", False) for r in responses)
-    meetings = sum(r.get("booked_meeting", False) for r in responses)
-    return {
-        "open_rate": opens / n,
-        "click_rate": clicks / n,
-        "reply_rate": replies / n,
-        "meeting_rate": meetings / n,
-    }
+    return SegmentedMetrics().update_many(responses).rates()
+
+def segment_recos(window: SegmentedMetrics, min_n: int = DEFAULT_MIN_SEGMENT, lift: float = SEGMENT_LIFT) -> List[str]:
+    # Subject variants are judged on opens, everything else on replies
+    recs = []
+    for dim in SEGMENT_DIMS:
+        rate = "open_rate" if dim == "variant" else "reply_rate"
+        base = window.rates()[rate]
+        segs = [s for s in window.segments(min_n) if s["dim"] == dim and s["value"] not in ("unknown", "none")]
+        if len(segs) < 2:
+            continue
+        best = max(segs, key=lambda s: s[rate])
+        worst = min(segs, key=lambda s: s[rate])
+        label = rate.replace("_", " ")
+        if best[rate] > base * lift or (base == 0 and best[rate] > 0):
+            recs.append(f"Lean into {dim} '{best['value']}': {label} {best[rate]:.1%} vs {base:.1%} overall (n={best['n']}).")
+        if worst is not best and worst[rate] * lift < base:
+            recs.append(f"Deprioritize {dim} '{worst['value']}': {label} {worst[rate]:.1%} vs {base:.1%} overall (n={worst['n']}).")
+    return recs
 
 class FeedbackTrainerAgent(BaseAgent):
     def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         responses = payload.get("responses", [])
-        self._log("input", {"count": len(responses)})
-        metrics = compute_metrics(responses)
-        recos = mock_recos(metrics)
+        campaign_id = payload.get("campaign_id", DEFAULT_CAMPAIGN_ID)
+        window_runs = int(payload.get("window_runs", DEFAULT_WINDOW_RUNS))
+        min_segment = int(payload.get("min_segment_size", DEFAULT_MIN_SEGMENT))
+
+        current = SegmentedMetrics().update_many(responses)
+        n = current.counts.get(OVERALL, [0])[0]
+        self._log("input", {"count": n})
+        if n == 0:
+            # Nothing to learn from: zero rows would read as 0% rates and drag down the rolling window
+            self._log("output", {"no_data": True})
+            return {"recommendations": [], "metrics": {}, "segments": [], "no_data": True}
+        metrics = current.rates()
+
+        # Rolling window: this run's per-segment counters plus the last N runs' stored aggregates
+        store = get_store()
+        store.record_metrics(logger.RUN_ID, campaign_id, self.id, metrics)
+        store.record_segments(logger.RUN_ID, campaign_id, self.id, current.counts)
+        window = SegmentedMetrics(store.segment_window(campaign_id, window_runs))
+
+        recos = mock_recos(metrics) + segment_recos(window, min_segment)
+        segments = window.segments(min_segment)
         self._log("metrics", metrics)
+        self._log("segments", {"window_runs": window_runs, "segments": segments})
         self._log("recommendations", recos)
+        store.record_event(logger.RUN_ID, campaign_id, self.id, "recommendations", recos)
 
         gs = GoogleSheetsClient()
         rows = [["timestamp","metric","value"]] + [[self.id, k, f"{v:.3f}"] for k,v in metrics.items()]
         gs.append_recommendations(rows)
 
-        return {"recommendations": recos, "metrics": metrics}
+        return {"recommendations": recos, "metrics": metrics, "segments": segments}
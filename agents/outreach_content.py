@@ -1,7 +1,12 @@
 from __future__ import annotations
 from typing import Dict, Any, List
-import os
+from concurrent.futures import ThreadPoolExecutor
+import json, os, random, re, threading, time
 from agents.base import BaseAgent
+from tools.clients import FakeGeminiModel
+from tools.ratelimit import TokenBucket, rate_share
+from utils.cache import CACHE_DIR, DiskCache, content_key
+from utils.prospect_index import prospect_key
 
 # ------------------------------------------------------------------
 # 📩 Fallback template (used if Gemini is unavailable or errors out)
@@ -37,45 +42,10 @@ def _fallback_email(lead: Dict[str, Any]) -> Dict[str, str]:
 
 
 # ------------------------------------------------------------------
-# 🤖 OutreachContentAgent
+# ✍️ Prompting + parsing
 # ------------------------------------------------------------------
-class OutreachContentAgent(BaseAgent):
-    def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        ranked = payload.get("ranked_leads", [])
-        persona = payload.get("persona", "SDR")
-        tone = payload.get("tone", "friendly")
-        messages: List[Dict[str, Any]] = []
-
-        # ------------------------------
-        # Try Gemini first; fallback if missing
-        # ------------------------------
-        gemini_key = os.getenv("GEMINI_API_KEY")
-        use_gemini = bool(gemini_key)
-
-        if use_gemini:
-            try:
-                import google.generativeai as genai
-                genai.configure(api_key=gemini_key)
-                model = genai.GenerativeModel("gemini-2.0-flash")
-            except Exception as e:
-                self._log(
-                    "warning",
-                    {
-                        "msg": "Gemini import/config failed, using fallback",
-                        "error": str(e),
-                    },
-                )
-                use_gemini = False
-
-        # ------------------------------
-        # Generate emails
-        # ------------------------------
-        for item in ranked[:10]:
-            lead = item["lead"]
-
-            if use_gemini:
-                try:
-                    prompt = f"""
+def build_prompt(lead: Dict[str, Any], tone: str, persona: str) -> str:
+    return f"""
 You are an expert SDR writing short, high-relevance cold emails.
 
 Write one B2B outreach email (<120 words), friendly, concise, outcome-focused.
@@ -96,53 +66,413 @@ Return the result as:
 Subject: ...
 Body: ...
 """
-                    resp = model.generate_content(prompt)
-                    text = (getattr(resp, "text", None) or "").strip()
 
-                    if not text:
-                        rb = _fallback_email(lead)
-                        subject, body = rb["subject"], rb["body"]
-                    else:
-                        if text.lower().startswith("subject:"):
-                            first_line, *rest = text.splitlines()
-                            subject = (
-                                first_line.split(":", 1)[1].strip()
-                                if ":" in first_line
-                                else "Quick idea for you"
-                            )
-                            body = "\n".join(rest).strip()
-                        else:
-                            subject = "Quick idea for you"
-                            body = text
-                except Exception as e:
-                    self._log(
-                        "warning",
-                        {
-                            "msg": "Gemini call failed, using fallback",
-                            "error": str(e),
-                        },
-                    )
-                    rb = _fallback_email(lead)
-                    subject, body = rb["subject"], rb["body"]
-            else:
-                rb = _fallback_email(lead)
-                subject, body = rb["subject"], rb["body"]
-
-            # save message
-            messages.append(
+def parse_email(text: str, lead: Dict[str, Any]) -> Dict[str, str]:
+    text = (text or "").strip()
+    if not text:
+        return _fallback_email(lead)
+    if text.lower().startswith("subject:"):
+        first_line, *rest = text.splitlines()
+        subject = first_line.split(":", 1)[1].strip() if ":" in first_line else "Quick idea for you"
+        return {"subject": subject, "body": "\n".join(rest).strip()}
+    return {"subject": "Quick idea for you", "body": text}
+
+BATCH_MARKER = "LEADS_JSON:"
+
+def build_batch_prompt(leads: List[Dict[str, Any]], tone: str, persona: str) -> str:
+    # Shared instructions once, then one compact JSON record per lead
+    records = [{"id": i, "company": L.get("company"), "contact": L.get("contact"), "role": L.get("role"),
+                "signal": L.get("signal")} for i, L in enumerate(leads)]
+    return f"""
+You are an expert SDR writing short, high-relevance cold emails.
+
+Write one B2B outreach email (<120 words) for EACH lead below: friendly, concise, outcome-focused.
+Tone: {tone}
+Persona: {persona}
+
+Constraints per email:
+- 1 clear subject line
+- 3–5 short sentences
+- 1 specific CTA (15-min chat)
+- No emojis or buzzwords
+Return ONLY a JSON array with one object per lead, in any order:
+[{{"id": <lead id>, "subject": "...", "body": "..."}}]
+
+{BATCH_MARKER}
+{json.dumps(records, ensure_ascii=False)}
+"""
+
+def parse_batch(text: str, n: int) -> Dict[int, Dict[str, str]]:
+    """Valid {"id", "subject", "body"} entries by lead index; anything malformed is simply left out."""
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", (text or "").strip())
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {}
+    if isinstance(data, dict):
+        data = data.get("emails", [])
+    out: Dict[int, Dict[str, str]] = {}
+    for item in data if isinstance(data, list) else []:
+        if not isinstance(item, dict):
+            continue
+        i, subject, body = item.get("id"), item.get("subject"), item.get("body")
+        if (isinstance(i, int) and 0 <= i < n and i not in out and isinstance(subject, str) and subject.strip()
+                and isinstance(body, str) and body.strip()):
+            out[i] = {"subject": subject.strip(), "body": body.strip()}
+    return out
+
+def build_short_prompt(lead: Dict[str, Any], tone: str, persona: str) -> str:
+    # Cheaper prompt for mid-tier leads: fewer instructions in, a shorter email out
+    return f"""Write a 3-sentence B2B cold email (<60 words) with a 15-min chat CTA. Tone: {tone}.
+Company: {lead.get('company')}
+Contact: {lead.get('contact')}
+Role: {lead.get('role')}
+Signal: {lead.get('signal')}
+Return as:
+Subject: ...
+Body: ...
+"""
+
+def subject_variant(subject: str, company: str | None) -> str:
+    # Subject line with the company name templated out, so variants group across leads
+    return subject.replace(company, "{company}") if company else subject
+
+def lead_segment(lead: Dict[str, Any], subject: str) -> Dict[str, str]:
+    return {
+        "signal": lead.get("signal") or "unknown",
+        "role": lead.get("role") or "unknown",
+        "stack": "+".join(sorted(lead.get("technologies") or [])) or "none",
+        "variant": subject_variant(subject, lead.get("company")),
+    }
+
+def _is_quota_error(e: Exception) -> bool:
+    msg = str(e).lower()
+    return type(e).__name__ in ("ResourceExhausted", "TooManyRequests") or "429" in msg or "quota" in msg
+
+
+# ------------------------------------------------------------------
+# 🧭 Score-tier routing (token budget + deadline)
+# ------------------------------------------------------------------
+DEFAULT_TIERS = [
+    {"name": "high", "min_score": 0.6, "mode": "full"},
+    {"name": "mid", "min_score": 0.3, "mode": "short"},
+    {"name": "low", "min_score": 0.0, "mode": "template"},
+]
+PROMPTS = {"full": build_prompt, "short": build_short_prompt}
+OUTPUT_TOKENS = {"full": 250, "short": 120}  # reserved per call until the real usage is known
+DOWNGRADE = {"full": "short", "short": "template"}
+
+def estimate_tokens(text: str | None) -> int:
+    return len(text or "") // 4 + 1
+
+def _percentile(values: List[float], q: float) -> float | None:
+    if not values:
+        return None
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+class TierRouter:
+    """Maps lead scores to generation modes ("full" / "short" / "template") within a run budget.
+
+    Each LLM call reserves its estimated tokens first; when the budget can't cover it, or the
+    deadline has passed, the lead is downgraded one mode at a time down to the template.
+    """
+
+    def __init__(self, tiers: List[Dict[str, Any]] | None = None, token_budget: int | None = None,
+                 deadline_s: float | None = None):
+        self.tiers = sorted(tiers or DEFAULT_TIERS, key=lambda t: -float(t.get("min_score", 0)))
+        self.token_budget = int(token_budget) if token_budget is not None else None
+        self.deadline_s = deadline_s
+        self.started = time.monotonic()
+        self.used = self.reserved = 0
+        self.stats = {t["name"]: {"leads": 0, "full": 0, "short": 0, "template": 0, "cached": 0,
+                                  "downgraded": 0, "tokens": 0, "latency": []} for t in self.tiers}
+        self._lock = threading.Lock()
+
+    def tier_for(self, score: float) -> Dict[str, Any]:
+        for t in self.tiers:
+            if score >= float(t.get("min_score", 0)):
+                return t
+        return self.tiers[-1]
+
+    def past_deadline(self) -> bool:
+        return self.deadline_s is not None and time.monotonic() - self.started >= self.deadline_s
+
+    def reserve(self, tokens: int) -> bool:
+        with self._lock:
+            if self.token_budget is not None and self.used + self.reserved + tokens > self.token_budget:
+                return False
+            self.reserved += tokens
+            return True
+
+    def settle(self, reserved: int, used: int) -> None:
+        with self._lock:
+            self.reserved -= reserved
+            self.used += used
+
+    def record(self, tier: str, mode: str, latency: float, tokens: int, cached: bool, downgraded: int) -> None:
+        with self._lock:
+            st = self.stats[tier]
+            st["leads"] += 1
+            st[mode] += 1
+            st["cached"] += int(cached)
+            st["downgraded"] += downgraded
+            st["tokens"] += tokens
+            st["latency"].append(latency)
+
+    def report(self, cost_per_1k_tokens: float | None = None) -> Dict[str, Any]:
+        tiers = {}
+        for name, st in self.stats.items():
+            lat = st["latency"]
+            p50, p95 = _percentile(lat, 0.5), _percentile(lat, 0.95)
+            tiers[name] = {
+                **{k: v for k, v in st.items() if k != "latency"},
+                "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                **({"est_cost_usd": round(st["tokens"] / 1000 * cost_per_1k_tokens, 6)} if cost_per_1k_tokens else {}),
+            }
+        elapsed = time.monotonic() - self.started
+        return {"tiers": tiers, "token_budget": self.token_budget, "tokens_used": self.used,
+                "deadline_s": self.deadline_s, "elapsed_s": round(elapsed, 3),
+                "deadline_met": self.deadline_s is None or elapsed <= self.deadline_s}
+
+# ------------------------------------------------------------------
+# 🤖 OutreachContentAgent
+# ------------------------------------------------------------------
+DEFAULT_MODEL = "gemini-2.0-flash"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RPM = 600
+QUOTA_RETRIES = 3
+BACKOFF_BASE = 1.0
+MAX_BATCH_SIZE = 50
+JSON_CONFIG = {"response_mime_type": "application/json"}
+
+_models: Dict[tuple, Any] = {}
+_models_lock = threading.Lock()
+
+def get_model(model_name: str, api_key: str):
+    # Configured model handles are kept per process so warm workers skip genai setup
+    with _models_lock:
+        key = (model_name, api_key)
+        if key not in _models:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            _models[key] = genai.GenerativeModel(model_name)
+        return _models[key]
+
+class OutreachContentAgent(BaseAgent):
+    def _load_model(self, model_name: str):
+        if model_name == "fake":
+            return FakeGeminiModel()
+        gemini_key = os.getenv("GEMINI_API_KEY")
+        if not gemini_key:
+            return None
+        try:
+            return get_model(model_name, gemini_key)
+        except Exception as e:
+            self._log(
+                "warning",
                 {
-                    "lead": lead.get("contact"),
-                    "to": lead.get("domain", "unknown@unknown.com"),
-                    "subject": subject,
-                    "email_body": body,
-                }
+                    "msg": "Gemini import/config failed, using fallback",
+                    "error": str(e),
+                },
             )
+            return None
+
+    def _generate(self, model, bucket: TokenBucket | None, lead: Dict[str, Any], tone: str, persona: str,
+                  cache: DiskCache | None = None, model_name: str = DEFAULT_MODEL,
+                  prompt: str | None = None, usage: Dict[str, Any] | None = None) -> Dict[str, str]:
+        prompt = prompt or build_prompt(lead, tone, persona)
+        key = content_key(model_name, prompt)
+        if cache is not None:
+            hit = cache.get(key)
+            if hit is not None:
+                if usage is not None:
+                    usage["cached"] = True
+                return hit
+        for attempt in range(QUOTA_RETRIES + 1):
+            if bucket:
+                bucket.acquire()
+            try:
+                resp = model.generate_content(prompt)
+                text = getattr(resp, "text", None)
+                email = parse_email(text, lead)
+                if usage is not None:
+                    meta = getattr(resp, "usage_metadata", None)
+                    usage["tokens"] = ((getattr(meta, "prompt_token_count", None) or estimate_tokens(prompt))
+                                       + (getattr(meta, "candidates_token_count", None) or estimate_tokens(text)))
+                if cache is not None and (text or "").strip():
+                    cache.set(key, email)
+                return email
+            except Exception as e:
+                if _is_quota_error(e) and attempt < QUOTA_RETRIES:
+                    time.sleep(BACKOFF_BASE * (2 ** attempt) * (0.5 + random.random()))
+                    continue
+                self._log(
+                    "warning",
+                    {
+                        "msg": "Gemini call failed, using fallback",
+                        "error": str(e),
+                    },
+                )
+                if usage is not None:
+                    usage["tokens"] = estimate_tokens(prompt)
+                return _fallback_email(lead)
+
+    def _generate_routed(self, models: Dict[str, Any], bucket: TokenBucket | None, lead: Dict[str, Any], score: float,
+                         router: TierRouter, tone: str, persona: str, cache: DiskCache | None,
+                         model_names: Dict[str, str]) -> Dict[str, str]:
+        tier = router.tier_for(score)
+        mode, downgraded = tier.get("mode", "full"), 0
+        if mode != "template" and router.past_deadline():
+            mode, downgraded = "template", 1
+        prompt, reserved, hit = None, 0, None
+        while mode != "template":
+            prompt = PROMPTS[mode](lead, tone, persona)
+            # Cached emails cost no tokens, so look them up before touching the budget
+            hit = cache.get(content_key(model_names[mode], prompt)) if cache is not None else None
+            if hit is not None:
+                break
+            reserved = estimate_tokens(prompt) + OUTPUT_TOKENS[mode]
+            if router.reserve(reserved):
+                break
+            mode, downgraded = DOWNGRADE[mode], downgraded + 1
+        t0 = time.perf_counter()
+        usage: Dict[str, Any] = {}
+        if hit is not None:
+            email, usage["cached"] = hit, True
+        elif mode == "template":
+            email = _fallback_email(lead)
+        else:
+            email = self._generate(models[mode], bucket, lead, tone, persona, cache, model_names[mode], prompt, usage)
+            router.settle(reserved, usage.get("tokens", 0))
+        router.record(tier["name"], mode, time.perf_counter() - t0, usage.get("tokens", 0),
+                      usage.get("cached", False), downgraded)
+        return email
+
+    def _generate_batch(self, model, bucket: TokenBucket | None, leads: List[Dict[str, Any]], tone: str, persona: str,
+                        cache: DiskCache | None = None, model_name: str = DEFAULT_MODEL) -> List[Dict[str, str]]:
+        # Cache is per lead (same keys as single-lead mode); only misses are packed into the request
+        keys = [content_key(model_name, build_prompt(L, tone, persona)) for L in leads]
+        hits = cache.get_many(keys) if cache is not None else {}
+        todo = [i for i, k in enumerate(keys) if k not in hits]
+        emails: List[Any] = [hits.get(k) for k in keys]
+        if not todo:
+            return emails
+        batch = [leads[i] for i in todo]
+        prompt = build_batch_prompt(batch, tone, persona)
+        parsed: Dict[int, Dict[str, str]] = {}
+        for attempt in range(QUOTA_RETRIES + 1):
+            if bucket:
+                bucket.acquire()
+            try:
+                resp = model.generate_content(prompt, generation_config=JSON_CONFIG)
+                parsed = parse_batch(getattr(resp, "text", None), len(batch))
+                break
+            except Exception as e:
+                if _is_quota_error(e) and attempt < QUOTA_RETRIES:
+                    time.sleep(BACKOFF_BASE * (2 ** attempt) * (0.5 + random.random()))
+                    continue
+                self._log("warning", {"msg": "Gemini batch call failed, using fallback", "error": str(e), "leads": len(batch)})
+                break
+        if len(parsed) < len(batch):
+            self._log("warning", {"msg": "Batch entries missing or invalid, using fallback for them",
+                                  "invalid": len(batch) - len(parsed), "leads": len(batch)})
+        if cache is not None and parsed:
+            cache.set_many({keys[todo[j]]: em for j, em in parsed.items()})
+        for j, i in enumerate(todo):
+            emails[i] = parsed.get(j) or _fallback_email(leads[i])
+        return emails
+
+    def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        ranked = payload.get("ranked_leads", [])
+        persona = payload.get("persona", "SDR")
+        tone = payload.get("tone", "friendly")
+        concurrency = int(payload.get("concurrency", DEFAULT_CONCURRENCY))
+        batch_size = max(1, min(int(payload.get("batch_size", 1)), MAX_BATCH_SIZE))
+        rpm = payload.get("requests_per_minute", DEFAULT_RPM)
+        if payload.get("max_messages") is not None:
+            ranked = ranked[: int(payload["max_messages"])]
+        leads = [item["lead"] for item in ranked]
+        routing = payload.get("routing") or None
+        if routing is True:
+            routing = {}
+
+        # ------------------------------
+        # Try Gemini first; fallback if missing
+        # ------------------------------
+        model_name = payload.get("model", os.getenv("GEMINI_MODEL", DEFAULT_MODEL))
+        model = self._load_model(model_name)
+        use_gemini = model is not None
+
+        # ------------------------------
+        # Generate emails (bounded pool + shared RPM bucket; order follows ranking)
+        # ------------------------------
+        cache_stats = routing_stats = None
+        if use_gemini:
+            bucket = TokenBucket.per_minute(float(rpm) / rate_share() if rpm else None)
+            cache = None
+            if payload.get("cache", True):
+                cache = DiskCache(
+                    payload.get("cache_path") or os.getenv("LLM_CACHE_PATH") or CACHE_DIR / "outreach_emails.sqlite",
+                    ttl=payload.get("cache_ttl", 30 * 86400),
+                    max_entries=payload.get("cache_max_entries", 100_000),
+                )
+            try:
+                with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                    if routing is not None:
+                        if batch_size > 1:
+                            self._log("warning", {"msg": "routing sends one request per lead; batch_size is ignored",
+                                                  "batch_size": batch_size})
+                            batch_size = 1
+                        # Score tiers pick full / short / template per lead; ranking order means
+                        # the budget and deadline are spent on the best leads first
+                        router = TierRouter(routing.get("tiers"), routing.get("token_budget"), routing.get("deadline_s"))
+                        short_name = routing.get("short_model") or model_name
+                        names = {"full": model_name, "short": short_name}
+                        models = {"full": model, "short": model if short_name == model_name else self._load_model(short_name) or model}
+                        scores = [float(item.get("score") or 0.0) for item in ranked]
+                        emails = list(pool.map(
+                            lambda LS: self._generate_routed(models, bucket, LS[0], LS[1], router, tone, persona, cache, names),
+                            zip(leads, scores)
+                        ))
+                        routing_stats = router.report(routing.get("cost_per_1k_tokens"))
+                    elif batch_size > 1:
+                        # N leads per request with JSON output; order still follows ranking
+                        batches = [leads[i:i + batch_size] for i in range(0, len(leads), batch_size)]
+                        emails = [em for part in pool.map(
+                            lambda B: self._generate_batch(model, bucket, B, tone, persona, cache, model_name), batches
+                        ) for em in part]
+                    else:
+                        emails = list(pool.map(
+                            lambda L: self._generate(model, bucket, L, tone, persona, cache, model_name), leads
+                        ))
+            finally:
+                if cache is not None:
+                    cache_stats = cache.stats()
+                    cache.close()
+        else:
+            emails = [_fallback_email(L) for L in leads]
+
+        messages: List[Dict[str, Any]] = [
+            {
+                "lead": lead.get("contact"),
+                "to": lead.get("email"),
+                "subject": em["subject"],
+                "email_body": em["body"],
+                "segment": lead_segment(lead, em["subject"]),
+                "prospect_key": prospect_key(lead),
+            }
+            for lead, em in zip(leads, emails)
+        ]
 
         # Log both summary and full messages for dashboard
         self._log("output", {
             "count": len(messages),
             "gemini_used": use_gemini,
+            "batch_size": batch_size,
+            "cache": cache_stats,
+            "routing": routing_stats,
             "messages": messages
         })
-        return {"messages": messages}
-
+        return {"messages": messages, **({"routing": routing_stats} if routing_stats else {})}
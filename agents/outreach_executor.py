@@ -1,12 +1,133 @@
 from __future__ import annotations
-from typing import Dict, Any
+import os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 from agents.base import BaseAgent
-from tools.clients import mock_send
+from tools.clients import SendGridClient, is_mock, mock_send
+from utils import logger
+from utils.cache import CACHE_DIR, DiskCache, content_key
+from utils.prospect_index import ProspectIndex, index_path
+from utils.runstore import DEFAULT_CAMPAIGN_ID
+from utils.stream import chunked
+
+DEFAULT_MAX_IN_FLIGHT = 4
+
+def idempotency_key(campaign_id: str, message: Dict[str, Any]) -> str:
+    # One send per recipient address per campaign, however often the step is retried or resumed
+    if message.get("idempotency_key"):
+        return message["idempotency_key"]
+    to = (message.get("to") or "").strip().lower()
+    return content_key("send", campaign_id, to) if to else content_key("send", campaign_id, "lead", str(message.get("lead")))
+
+class BatchSender:
+    """Sends messages in provider-sized batches, several batches in flight at once.
+
+    A persistent ledger of idempotency keys makes resends no-ops: keys already delivered
+    (in this run or an earlier one) come back as "skipped" with the original message id.
+    Keys are recorded only after the provider accepts a batch, so delivery is at-least-once:
+    a crash mid-batch can resend that batch on the next run.
+    """
+
+    def __init__(self, client: SendGridClient, ledger: Optional[DiskCache] = None,
+                 batch_size: Optional[int] = None, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.client = client
+        self.ledger = ledger
+        self.batch_size = batch_size or client.BATCH_SIZE
+        self.max_in_flight = max(1, max_in_flight)
+        self.counts = {"sent": 0, "skipped": 0, "failed": 0, "batches": 0}
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def _send(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        try:
+            results = self.client.send_batch(batch)
+        except Exception as e:
+            results = [{"status": "failed", "id": None, "error": f"{type(e).__name__}: {e}"} for _ in batch]
+        # The ledger keeps the provider's message id (None if it sent none) so skips can report it
+        sent = {m["idempotency_key"]: r["id"] for m, r in zip(batch, results) if r["status"] == "sent"}
+        if self.ledger is not None and sent:
+            self.ledger.set_many(sent)
+        with self._lock:
+            self.counts["batches"] += 1
+            self.counts["sent"] += len(sent)
+            self.counts["failed"] += len(batch) - len(sent)
+        return results
+
+    def send(self, campaign_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        t0 = time.perf_counter()
+        keys = [idempotency_key(campaign_id, m) for m in messages]
+        done: Dict[str, Optional[str]] = self.ledger.get_many(list(set(keys))) if self.ledger is not None else {}
+        out: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+        todo, seen = [], set()
+        for i, (m, k) in enumerate(zip(messages, keys)):
+            if k in done or k in seen:
+                out[i] = {"status": "skipped", "message_id": done.get(k)}
+                self.counts["skipped"] += 1
+                continue
+            seen.add(k)
+            if not m.get("to"):
+                out[i] = {"status": "failed", "message_id": None, "error": "no recipient address"}
+                self.counts["failed"] += 1
+                continue
+            todo.append((i, {"to": m.get("to"), "subject": m.get("subject", ""), "body": m.get("email_body", ""),
+                             "idempotency_key": k}))
+        batches = list(chunked(todo, self.batch_size))
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            for batch, results in zip(batches, pool.map(lambda b: self._send([m for _, m in b]), batches)):
+                for (i, m), r in zip(batch, results):
+                    out[i] = {"status": r["status"], "message_id": r["id"]}
+                    if r.get("error"):
+                        out[i]["error"] = r["error"]
+        self.elapsed += time.perf_counter() - t0
+        return [
+            {"lead": m.get("lead"), **res, "idempotency_key": k, **({"segment": m["segment"]} if "segment" in m else {})}
+            for m, k, res in zip(messages, keys, out)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        delivered = self.counts["sent"]
+        return {**self.counts, "elapsed_s": round(self.elapsed, 3),
+                "messages_per_sec": round(delivered / self.elapsed, 1) if self.elapsed and delivered else None}
 
 class OutreachExecutorAgent(BaseAgent):
     def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         messages = payload.get("messages", [])
-        self._log("input", {"count": len(messages)})
-        results = mock_send(messages)
-        self._log("output", {"count": len(results)})
-        return {"sent_status": results, "campaign_id": "cmp-mock-001"}
+        campaign_id = payload.get("campaign_id") or os.getenv("CAMPAIGN_ID") or DEFAULT_CAMPAIGN_ID
+        self._log("input", {"count": len(messages), "campaign": campaign_id})
+        if not payload.get("batched", True):
+            results = mock_send(messages)
+            self._log("output", {"count": len(results)})
+            return {"sent_status": results, "campaign_id": campaign_id}
+
+        ledger = None
+        # Mock sends deliver nothing, so they must never mark recipients as delivered for a live run
+        if payload.get("dedupe", True) and not is_mock():
+            # Always writable, even when batch runs share the other caches read-only
+            ledger = DiskCache(payload.get("ledger_path") or os.getenv("SEND_LEDGER_PATH") or CACHE_DIR / "send_ledger.sqlite",
+                               ttl=None, max_entries=None, readonly=False)
+        sender = BatchSender(SendGridClient(), ledger, payload.get("batch_size"),
+                             int(payload.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT)))
+        try:
+            results = sender.send(campaign_id, messages)
+        finally:
+            if ledger is not None:
+                ledger.close()
+        stats = sender.stats()
+        if ledger is not None and payload.get("record_contacted", True):
+            stats["contacted_indexed"] = self._record_contacted(messages, results, payload.get("seen_index_path"))
+        self._log("output", {"count": len(results), **stats})
+        return {"sent_status": results, "campaign_id": campaign_id, "send_stats": stats}
+
+    def _record_contacted(self, messages: List[Dict[str, Any]], results: List[Dict[str, Any]],
+                          path: Optional[str] = None) -> int:
+        # Delivered prospects go into the cross-run index that ProspectSearchAgent's skip_seen reads
+        keys = [m["prospect_key"] for m, r in zip(messages, results)
+                if m.get("prospect_key") and r["status"] in ("sent", "skipped")]
+        if not keys:
+            return 0
+        index = ProspectIndex(index_path(path))
+        try:
+            index.add(keys, state="contacted", run_id=logger.RUN_ID)
+        finally:
+            index.close()
+        return len(set(keys))
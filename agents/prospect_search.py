@@ -1,23 +1,117 @@
 from __future__ import annotations
-from typing import Dict, Any, List
+import queue, threading
+from typing import Dict, Any, List, Iterator, Optional
 from agents.base import BaseAgent
 from tools.clients import ApolloClient, ClayClient
+from utils.prospect_index import ProspectIndex, index_path, prospect_key
+from utils.stream import DEFAULT_CHUNK_SIZE, chunked
+
+_DONE = object()
+
+def fan_out_pages(clients: List[Any], query: Dict[str, Any], per_page: int) -> Iterator[List[Dict[str, Any]]]:
+    """Pull `search_pages` from every client concurrently and yield pages as they arrive.
+
+    Closing the iterator (or stopping early) tells the source threads to stop paging.
+    """
+    q: "queue.Queue[Any]" = queue.Queue(maxsize=2 * max(1, len(clients)))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def pump(client):
+        try:
+            for page in client.search_pages(query, per_page):
+                if stop.is_set() or not put(page):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    threads = [threading.Thread(target=pump, args=(c,), daemon=True) for c in clients]
+    for t in threads:
+        t.start()
+    try:
+        remaining = len(threads)
+        while remaining:
+            item = q.get()
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop.set()
 
 class ProspectSearchAgent(BaseAgent):
+    def __init__(self, node_id: str, instructions: str | None = None, tools: list[dict] | None = None,
+                 clients: Optional[List[Any]] = None):
+        super().__init__(node_id, instructions, tools)
+        self.clients = clients
+
     def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         icp = payload.get("icp", {})
         signals = payload.get("signals", [])
         limit = int(payload.get("_limit", 20))
+        page_size = int(payload.get("page_size", 100))
 
         self._log("input", {"icp": icp, "signals": signals, "limit": limit})
 
-        apollo = ApolloClient()
-        clay = ClayClient()
+        clients = self.clients if self.clients is not None else [ApolloClient(), ClayClient()]
+        # Opt-in: drop prospects that OutreachExecutorAgent has already contacted in an earlier run
+        index = None
+        if payload.get("skip_seen", False):
+            index = ProspectIndex(index_path(payload.get("seen_index_path")))
+        days = payload.get("recontact_after_days")
+        max_age = float(days) * 86400 if days is not None else None
+        leads = self._iter_leads(clients, {"icp": icp, "signals": signals}, limit, page_size, index, max_age)
 
-        A = apollo.search({"icp": icp, "signals": signals})
-        C = clay.search({"icp": icp, "signals": signals})
-        combined = {(l["company"], l["email"]): l for l in (A + C)}
-        leads = list(combined.values())[:limit]
+        if payload.get("stream"):
+            chunk_size = int(payload.get("chunk_size", DEFAULT_CHUNK_SIZE))
+            return {"leads": chunked(leads, chunk_size)}
+        return {"leads": list(leads)}
 
-        self._log("output", {"count": len(leads)})
-        return {"leads": leads}
+    def _iter_leads(self, clients, query: Dict[str, Any], limit: int, page_size: int,
+                    index: Optional[ProspectIndex] = None, max_age: Optional[float] = None):
+        # Dedupe on normalized (company, email) as pages arrive, drop prospects contacted by earlier
+        # runs, and stop paging every source once `limit` new leads have been yielded. Nothing is
+        # recorded here: a prospect only counts as handled once a send to it succeeds.
+        seen, kept, skipped = set(), 0, 0
+        if limit <= 0:
+            if index is not None:
+                index.close()
+            self._log("output", {"count": 0})
+            return
+        pages = fan_out_pages(clients, query, page_size)
+        try:
+            for page in pages:
+                fresh = []
+                for l in page:
+                    key = prospect_key(l)
+                    if key not in seen:
+                        seen.add(key)
+                        fresh.append((key, l))
+                handled = index.seen([k for k, _ in fresh], max_age) if index is not None else ()
+                for key, l in fresh:
+                    if key in handled:
+                        skipped += 1
+                        continue
+                    kept += 1
+                    yield l
+                    if kept >= limit:
+                        return
+        finally:
+            pages.close()
+            stats = {}
+            if index is not None:
+                stats = {"skipped_seen": skipped, "index": index.stats()}
+                index.close()
+            self._log("output", {"count": kept, **stats})
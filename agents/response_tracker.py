@@ -2,11 +2,31 @@ from __future__ import annotations
 from typing import Dict, Any
 from agents.base import BaseAgent
 from tools.clients import mock_responses
+from tools.events import ingest, tail_file
+from utils import logger
+from utils.runstore import DEFAULT_CAMPAIGN_ID, get_store, message_key
 
 class ResponseTrackerAgent(BaseAgent):
     def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        campaign_id = payload.get("campaign_id","cmp-mock-001")
+        campaign_id = payload.get("campaign_id", DEFAULT_CAMPAIGN_ID)
         self._log("input", {"campaign": campaign_id})
+        if payload.get("mode") == "events":
+            return self._run_events(payload, campaign_id)
         responses = mock_responses(payload.get("sent_status", []))
+        get_store().record_responses(logger.RUN_ID, campaign_id, self.id, responses)
         self._log("output", {"count": len(responses)})
         return {"responses": responses}
+
+    def _run_events(self, payload: Dict[str, Any], campaign_id: str) -> Dict[str, Any]:
+        # Incremental: index this run's sends, apply only events not seen before, read back current state
+        store = get_store()
+        sent = payload.get("sent_status", [])
+        registered = store.register_messages(logger.RUN_ID, campaign_id, sent)
+        ingested = ingest(payload.get("events", []), store)
+        if payload.get("events_file"):
+            res = tail_file(payload["events_file"], store)
+            ingested = {k: ingested.get(k, 0) + v for k, v in res.items()}
+        responses = store.message_states([message_key(s) for s in sent if message_key(s)])
+        totals = store.campaign_totals(campaign_id)
+        self._log("output", {"count": len(responses), "registered": registered, "ingested": ingested, "totals": totals})
+        return {"responses": responses, "campaign_totals": totals}
@@ -1,7 +1,11 @@
 from __future__ import annotations
-from typing import Dict, Any, List
+import heapq
+from array import array
+from typing import Dict, Any, List, Optional, Tuple
 
 from agents.base import BaseAgent
+from utils.leads import LeadTable, RankedLeads
+from utils.stream import is_stream
 
 def score_lead(lead: Dict[str, Any], criteria: Dict[str, Any]) -> float:
     score = 0.0
@@ -17,14 +21,137 @@ def score_lead(lead: Dict[str, Any], criteria: Dict[str, Any]) -> float:
         score += 0.3
     return max(0.0, min(1.0, score))
 
+GOOD_SIGNALS = ("recent_funding", "hiring_for_sales")
+
+class BatchScorer:
+    """Scores many leads against one criteria set.
+
+    Preferred/avoided technologies are mapped to bits once; each lead is reduced to
+    (is_vp, #preferred, #avoided, good_signal) via memoized role/signal/stack lookups,
+    and every distinct tuple is scored once with the same arithmetic as score_lead.
+    """
+
+    def __init__(self, criteria: Dict[str, Any]):
+        prefer = set(criteria.get("preferred_tech", []))
+        avoid = set(criteria.get("avoid_tech", []))
+        self.bits = {t: 1 << i for i, t in enumerate(sorted(prefer | avoid))}
+        self.prefer_mask = sum(self.bits[t] for t in prefer)
+        self.avoid_mask = sum(self.bits[t] for t in avoid)
+        self._stack: Dict[Tuple[str, ...], Tuple[int, int]] = {}
+        self._role: Dict[str, bool] = {}
+        self._score: Dict[Tuple[bool, int, int, bool], float] = {}
+
+    def _stack_counts(self, techs) -> Tuple[int, int]:
+        key = tuple(techs)
+        hit = self._stack.get(key)
+        if hit is None:
+            mask = 0
+            for t in key:
+                mask |= self.bits.get(t, 0)
+            hit = self._stack[key] = (bin(mask & self.prefer_mask).count("1"), bin(mask & self.avoid_mask).count("1"))
+        return hit
+
+    def _combo_score(self, key: Tuple[bool, int, int, bool]) -> float:
+        s = self._score.get(key)
+        if s is None:
+            vp, n_pref, n_avoid, good = key
+            score = 0.0
+            if vp:
+                score += 0.3
+            score += 0.2 * n_pref
+            score -= 0.2 * n_avoid
+            if good:
+                score += 0.3
+            s = self._score[key] = max(0.0, min(1.0, score))
+        return s
+
+    def score(self, lead: Dict[str, Any]) -> float:
+        role = lead.get("role", "")
+        vp = self._role.get(role)
+        if vp is None:
+            vp = self._role[role] = "VP" in role
+        n_pref, n_avoid = self._stack_counts(lead.get("technologies", []))
+        return self._combo_score((vp, n_pref, n_avoid, lead.get("signal", "") in GOOD_SIGNALS))
+
+    def score_all(self, leads: List[Dict[str, Any]]) -> List[float]:
+        roles, stacks, combos = self._role, self._stack_counts, self._combo_score
+        out = []
+        for L in leads:
+            role = L.get("role", "")
+            vp = roles.get(role)
+            if vp is None:
+                vp = roles[role] = "VP" in role
+            n_pref, n_avoid = stacks(L.get("technologies", []))
+            out.append(combos((vp, n_pref, n_avoid, L.get("signal", "") in GOOD_SIGNALS)))
+        return out
+
+    def score_table(self, table: LeadTable) -> List[float]:
+        # Walks the role/stack/signal columns directly; no per-row objects are built
+        roles, stacks, combos = self._role, self._stack_counts, self._combo_score
+        out = []
+        for role, techs, signal in zip(table.column("role", ""), table.column("technologies", ()),
+                                       table.column("signal", "")):
+            vp = roles.get(role)
+            if vp is None:
+                vp = roles[role] = "VP" in role
+            n_pref, n_avoid = stacks(techs)
+            out.append(combos((vp, n_pref, n_avoid, signal in GOOD_SIGNALS)))
+        return out
+
+def _rank_order(scores: List[float], top_k: Optional[int]) -> List[int]:
+    if top_k is not None and top_k < len(scores):
+        # nlargest is stable like sort(reverse=True), so ties keep input order
+        return heapq.nlargest(top_k, range(len(scores)), key=scores.__getitem__)
+    return sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+
+def rank_table(table: LeadTable, criteria: Dict[str, Any], top_k: Optional[int] = None) -> RankedLeads:
+    # Same ranking as rank_leads, returned as a view over the table instead of wrapper dicts
+    raw = BatchScorer(criteria).score_table(table)
+    rounded = {s: round(s, 3) for s in set(raw)}
+    scores = [rounded[s] for s in raw]
+    order = _rank_order(scores, top_k)
+    return RankedLeads(table, array("q", order), array("d", (scores[i] for i in order)))
+
+def rank_leads(leads: List[Dict[str, Any]], criteria: Dict[str, Any], top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+    raw = BatchScorer(criteria).score_all(leads)
+    rounded = {s: round(s, 3) for s in set(raw)}
+    scores = [rounded[s] for s in raw]
+    order = _rank_order(scores, top_k)
+    return [{"lead": leads[i], "score": scores[i]} for i in order]
+
+def rank_stream(chunks, criteria: Dict[str, Any], top_k: int) -> List[Dict[str, Any]]:
+    # Bounded min-heap of (score, -index, lead): memory is O(top_k + chunk), order matches rank_leads
+    scorer = BatchScorer(criteria)
+    rounded: Dict[float, float] = {}
+    heap: List[Tuple[float, int, Dict[str, Any]]] = []
+    i = 0
+    for chunk in chunks:
+        for L, s in zip(chunk, scorer.score_all(chunk)):
+            r = rounded.get(s)
+            if r is None:
+                r = rounded[s] = round(s, 3)
+            if len(heap) < top_k:
+                heapq.heappush(heap, (r, -i, L))
+            elif (r, -i) > heap[0][:2]:
+                heapq.heapreplace(heap, (r, -i, L))
+            i += 1
+    return [{"lead": L, "score": r} for r, _, L in sorted(heap, key=lambda x: x[:2], reverse=True)]
+
+DEFAULT_STREAM_TOP_K = 1000
+
 class ScoringAgent(BaseAgent):
     def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         leads = payload.get("enriched_leads", [])
         criteria = payload.get("scoring_criteria", {})
-        ranked: List[Dict[str, Any]] = []
-        for L in leads:
-            s = score_lead(L, criteria)
-            ranked.append({"lead": L, "score": round(s, 3)})
-        ranked.sort(key=lambda x: x["score"], reverse=True)
+        top_k = payload.get("top_k")
+        if is_stream(leads):
+            ranked = rank_stream(leads, criteria, int(top_k if top_k is not None else DEFAULT_STREAM_TOP_K))
+            self._log("output", {"top": ranked[:3], "kept": len(ranked), "streamed": True})
+            return {"ranked_leads": ranked}
+        if isinstance(leads, LeadTable):
+            ranked = rank_table(leads, criteria, int(top_k) if top_k is not None else None)
+            self._log("output", {"top": ranked[:3], "columnar": True})
+            return {"ranked_leads": ranked}
+        ranked = rank_leads(leads, criteria, int(top_k) if top_k is not None else None)
         self._log("output", {"top": ranked[:3]})
         return {"ranked_leads": ranked}
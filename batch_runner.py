@@ -0,0 +1,96 @@
+from __future__ import annotations
+import argparse, json, os, pathlib, re, sys, time, traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+# ------------------------------------------------------------------
+# 📦 Multi-campaign batch runner: one run_workflow per campaign, spread over processes
+# ------------------------------------------------------------------
+def load_campaigns(source: str | pathlib.Path) -> List[Dict[str, Any]]:
+    """A directory of *.json workflows, or a manifest: [{"workflow": path, "name"?, "max_parallel"?}, ...]."""
+    src = pathlib.Path(source)
+    if src.is_dir():
+        entries = [{"workflow": str(p)} for p in sorted(src.glob("*.json"))]
+    else:
+        manifest = json.loads(src.read_text(encoding="utf-8"))
+        entries = manifest.get("campaigns", []) if isinstance(manifest, dict) else manifest
+        for e in entries:
+            wf = pathlib.Path(e["workflow"])
+            e["workflow"] = str(wf if wf.is_absolute() else src.parent / wf)
+    seen: Dict[str, int] = {}
+    for e in entries:
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", e.get("name") or pathlib.Path(e["workflow"]).stem)
+        seen[name] = seen.get(name, 0) + 1
+        e["name"] = name if seen[name] == 1 else f"{name}-{seen[name]}"
+    return entries
+
+def run_campaign(entry: Dict[str, Any], base_dir: str, cache_readonly: bool = True, resume: bool = False,
+                 rate_share: int = 1) -> Dict[str, Any]:
+    # Runs in a pool process: logs, checkpoints and final output live under base_dir/<name>/.
+    # Provider and LLM rate limits are per process, so each of `rate_share` workers takes its slice.
+    os.environ["RATE_LIMIT_SHARE"] = str(rate_share)
+    from utils import logger
+    run_dir = pathlib.Path(base_dir) / entry["name"]
+    run_id = logger.configure(run_dir=run_dir, run_id=f"{entry['name']}-{logger.new_run_id()}")
+    if cache_readonly:
+        os.environ["CACHE_READONLY"] = "1"
+    t0 = time.perf_counter()
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+        import langgraph_builder as lgb
+        from utils.checkpoint import CheckpointStore
+        from utils.leads import json_or_str
+
+        workflow = json.loads(pathlib.Path(entry["workflow"]).read_text(encoding="utf-8"))
+        ctx = lgb.run_workflow(workflow, max_parallel=int(entry.get("max_parallel", 1)),
+                               checkpoints=CheckpointStore(run_dir / "checkpoints"), resume=resume)
+        final = ctx["steps"][workflow["steps"][-1]["id"]]
+        out_path = run_dir / "final.json"
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_text(json.dumps(final, indent=2, default=json_or_str), encoding="utf-8")
+        status: Dict[str, Any] = {"status": "ok", "output": str(out_path)}
+    except Exception as e:
+        status = {"status": "error", "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}
+    finally:
+        logger.flush()
+    return {"name": entry["name"], "workflow": entry["workflow"], "run_id": run_id,
+            "elapsed_s": round(time.perf_counter() - t0, 3), **status}
+
+def run_batch(source: str | pathlib.Path, processes: int | None = None, base_dir: str | pathlib.Path = ".runs/campaigns",
+              cache_readonly: bool = True, resume: bool = False) -> Dict[str, Any]:
+    campaigns = load_campaigns(source)
+    t0 = time.perf_counter()
+    results = []
+    workers = max(1, min(processes or os.cpu_count() or 1, len(campaigns)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futs = [pool.submit(run_campaign, c, str(base_dir), cache_readonly, resume, workers) for c in campaigns]
+        for fut in as_completed(futs):
+            res = fut.result()
+            results.append(res)
+            print(f"[{res['status']}] {res['name']} in {res['elapsed_s']}s" + (f" — {res['error']}" if res["status"] != "ok" else ""))
+    results.sort(key=lambda r: r["name"])
+    summary = {"campaigns": len(results), "failed": sum(r["status"] != "ok" for r in results),
+               "elapsed_s": round(time.perf_counter() - t0, 3), "results": results}
+    out = pathlib.Path(base_dir) / f"batch-{time.strftime('%Y%m%dT%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    summary["summary_path"] = str(out)
+    return summary
+
+def main():
+    ap = argparse.ArgumentParser(description="Run many campaign workflows in parallel processes")
+    ap.add_argument("source", help="Directory of workflow JSONs, or a manifest JSON")
+    ap.add_argument("--processes", type=int, default=None, help="Pool size (default: CPU count)")
+    ap.add_argument("--out-dir", default=".runs/campaigns")
+    ap.add_argument("--cache-writable", action="store_true", help="Let campaigns write to the shared caches")
+    ap.add_argument("--resume", action="store_true")
+    args = ap.parse_args()
+    if not pathlib.Path(args.source).exists():
+        print(f"Not found: {args.source}", file=sys.stderr); sys.exit(2)
+    summary = run_batch(args.source, args.processes, args.out_dir, not args.cache_writable, args.resume)
+    print(f"\n{summary['campaigns']} campaign(s), {summary['failed']} failed, {summary['elapsed_s']}s — {summary['summary_path']}")
+    sys.exit(1 if summary["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+from __future__ import annotations
+import argparse, json, pathlib, random, sys, time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from agents.scoring import score_lead, rank_leads
+
+ROLES = ["VP Sales", "Head of RevOps", "CTO", "Director of Demand Gen", "COO"]
+STACKS = [["HubSpot", "Salesforce"], ["Snowflake", "dbt"], ["Segment", "Marketo"], ["Amplitude", "Mixpanel"]]
+SIGNALS = ["recent_funding", "hiring_for_sales", "new_cto", "product_launch"]
+CRITERIA = {"preferred_tech": ["Salesforce", "HubSpot", "dbt"], "avoid_tech": ["Mixpanel"]}
+
+def leads(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [{"company": f"Co{i}", "role": rng.choice(ROLES), "technologies": rng.choice(STACKS),
+             "signal": rng.choice(SIGNALS)} for i in range(n)]
+
+def baseline(ls, criteria):
+    ranked = [{"lead": L, "score": round(score_lead(L, criteria), 3)} for L in ls]
+    ranked.sort(key=lambda x: x["score"], reverse=True)
+    return ranked
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,100000,1000000")
+    ap.add_argument("--top-k", type=int, default=100)
+    args = ap.parse_args()
+    out = []
+    for n in map(int, args.sizes.split(",")):
+        ls = leads(n)
+        t0 = time.perf_counter(); ref = baseline(ls, CRITERIA); t_base = time.perf_counter() - t0
+        t0 = time.perf_counter(); full = rank_leads(ls, CRITERIA); t_batch = time.perf_counter() - t0
+        t0 = time.perf_counter(); top = rank_leads(ls, CRITERIA, args.top_k); t_topk = time.perf_counter() - t0
+        assert full == ref and top == ref[: args.top_k]
+        out.append({"n": n, "score_lead_s": round(t_base, 4), "batch_s": round(t_batch, 4),
+                    "batch_top_k_s": round(t_topk, 4), "speedup_top_k": round(t_base / t_topk, 2)})
+        print(json.dumps(out[-1]))
+
+if __name__ == "__main__":
+    main()
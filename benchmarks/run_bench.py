@@ -0,0 +1,169 @@
+from __future__ import annotations
+import argparse, contextlib, datetime as dt, json, os, pathlib, platform, random, statistics, subprocess, sys, tempfile, time, tracemalloc
+from typing import Any, Callable, Dict, List
+
+REPO = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO))
+
+import langgraph_builder as lgb
+from agents.enrichment import DataEnrichmentAgent
+from agents.feedback_trainer import FeedbackTrainerAgent
+from agents.outreach_content import OutreachContentAgent, _fallback_email
+from agents.outreach_executor import OutreachExecutorAgent
+from agents.prospect_search import ProspectSearchAgent
+from agents.response_tracker import ResponseTrackerAgent
+from agents.scoring import ScoringAgent, rank_leads
+from benchmarks.synthetic import SyntheticSearchClient, synthetic_enrich, synthetic_leads
+from tools.clients import mock_responses, mock_send
+from utils import logger
+
+PROVIDER_KEYS = ["APOLLO_API_KEY", "CLAY_API_KEY", "CLEARBIT_KEY", "SENDGRID_API_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY"]
+CRITERIA = {"preferred_tech": ["Salesforce", "HubSpot", "dbt"], "avoid_tech": ["Mixpanel"]}
+RESULTS_DIR = REPO / "benchmarks" / "results"
+
+@contextlib.contextmanager
+def offline_env():
+    # Benchmarks always run offline: blank provider keys (load_dotenv won't override set vars), restore them after
+    saved = {k: os.environ.get(k) for k in PROVIDER_KEYS}
+    os.environ.update({k: "" for k in PROVIDER_KEYS})
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+class BenchSearchAgent(ProspectSearchAgent):
+    """ProspectSearchAgent over two synthetic sources of `synthetic_n` leads in total."""
+    def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        n, seed = int(payload["synthetic_n"]), int(payload.get("seed", 0))
+        self.clients = [SyntheticSearchClient(n - n // 2, seed), SyntheticSearchClient(n // 2, seed + 1)]
+        return super().run(payload)
+
+def bench_workflow(n: int, seed: int) -> Dict[str, Any]:
+    return {"workflow_name": f"bench-{n}", "config": {"scoring": CRITERIA}, "steps": [
+        {"id": "prospect_search", "agent": "BenchSearchAgent",
+         "inputs": {"synthetic_n": n, "seed": seed, "_limit": n, "page_size": 1000, "skip_seen": False}},
+        {"id": "enrichment", "agent": "DataEnrichmentAgent",
+         "inputs": {"leads": "{{prospect_search.output.leads}}", "cache": False}},
+        {"id": "scoring", "agent": "ScoringAgent",
+         "inputs": {"enriched_leads": "{{enrichment.output.enriched_leads}}", "scoring_criteria": "{{config.scoring}}"}},
+        {"id": "outreach_content", "agent": "OutreachContentAgent",
+         "inputs": {"ranked_leads": "{{scoring.output.ranked_leads}}", "cache": False}},
+        {"id": "send", "agent": "OutreachExecutorAgent", "inputs": {"messages": "{{outreach_content.output.messages}}", "dedupe": False}},
+        {"id": "response_tracker", "agent": "ResponseTrackerAgent",
+         "inputs": {"campaign_id": "{{send.output.campaign_id}}", "sent_status": "{{send.output.sent_status}}"}},
+        {"id": "feedback_trainer", "agent": "FeedbackTrainerAgent",
+         "inputs": {"responses": "{{response_tracker.output.responses}}"}},
+    ]}
+
+def measure(fn: Callable[[], Any], items: int, repeat: int, seed: int) -> Dict[str, Any]:
+    times: List[float] = []
+    for _ in range(repeat):
+        random.seed(seed)
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    # Separate traced pass so tracemalloc overhead doesn't skew timings
+    random.seed(seed)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    times.sort()
+    p50 = statistics.median(times)
+    return {
+        "items": items,
+        "runs": repeat,
+        "p50_s": round(p50, 5),
+        "p95_s": round(times[min(len(times) - 1, int(0.95 * len(times)))], 5),
+        "max_s": round(times[-1], 5),
+        "items_per_sec": round(items / p50, 1) if p50 else None,
+        "peak_mem_mb": round(peak / 2**20, 2),
+    }
+
+def agent_cases(n: int, seed: int) -> List[tuple]:
+    random.seed(seed)
+    leads = list(synthetic_leads(n, seed))
+    enriched = synthetic_enrich(leads, seed)
+    ranked = rank_leads(enriched, CRITERIA)
+    messages = [{"lead": r["lead"]["contact"], "to": r["lead"].get("email"), **_fallback_email(r["lead"])} for r in ranked]
+    sent = mock_send(messages)
+    responses = mock_responses(sent)
+    return [
+        ("ProspectSearchAgent", lambda: BenchSearchAgent("bench").run({"synthetic_n": n, "seed": seed, "_limit": n, "page_size": 1000, "skip_seen": False})),
+        ("DataEnrichmentAgent", lambda: DataEnrichmentAgent("bench").run({"leads": leads, "cache": False})),
+        ("ScoringAgent", lambda: ScoringAgent("bench").run({"enriched_leads": enriched, "scoring_criteria": CRITERIA})),
+        ("OutreachContentAgent", lambda: OutreachContentAgent("bench").run({"ranked_leads": ranked, "cache": False})),
+        ("OutreachExecutorAgent", lambda: OutreachExecutorAgent("bench").run({"messages": messages, "dedupe": False})),
+        ("ResponseTrackerAgent", lambda: ResponseTrackerAgent("bench").run({"sent_status": sent})),
+        ("FeedbackTrainerAgent", lambda: FeedbackTrainerAgent("bench").run({"responses": responses})),
+    ]
+
+def git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True, text=True).stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    print(f"\n=== vs {previous['meta'].get('git_rev')} (items/sec ratio, >1 is faster) ===")
+    for size, agents in current["results"].items():
+        for name, m in agents.items():
+            old = previous.get("results", {}).get(size, {}).get(name)
+            if old and old.get("items_per_sec") and m.get("items_per_sec"):
+                ratio = m["items_per_sec"] / old["items_per_sec"]
+                flag = "  <-- regression" if ratio < 0.9 else ""
+                print(f"{size:>8} {name:<24} {ratio:6.2f}x{flag}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Throughput / latency / memory benchmarks for the prospect-to-lead pipeline")
+    ap.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated lead counts (up to 1000000)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--agents-only", action="store_true", help="Skip the end-to-end run_workflow case")
+    ap.add_argument("--out", help="Result JSON path (default benchmarks/results/bench-<rev>-<ts>.json)")
+    ap.add_argument("--compare", help="Previous result JSON to diff against")
+    args = ap.parse_args()
+    with offline_env():
+        run(args)
+
+def run(args: argparse.Namespace) -> None:
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix="bench-"))
+    logger.configure(run_dir=tmp / ".runs", run_id="bench")
+    lgb.AGENT_MAP["BenchSearchAgent"] = "benchmarks.run_bench:BenchSearchAgent"
+
+    report: Dict[str, Any] = {"meta": {
+        "git_rev": git_rev(),
+        "timestamp": dt.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+    }, "results": {}}
+
+    for n in map(int, args.sizes.split(",")):
+        res: Dict[str, Any] = {}
+        for name, fn in agent_cases(n, args.seed):
+            res[name] = measure(fn, n, args.repeat, args.seed)
+            print(json.dumps({"n": n, "case": name, **res[name]}))
+        if not args.agents_only:
+            wf = bench_workflow(n, args.seed)
+            def whole():
+                lgb.run_workflow(wf)
+                logger.flush(timeout=None)
+            res["run_workflow"] = measure(whole, n, args.repeat, args.seed)
+            print(json.dumps({"n": n, "case": "run_workflow", **res["run_workflow"]}))
+        report["results"][str(n)] = res
+
+    out = pathlib.Path(args.out) if args.out else RESULTS_DIR / f"bench-{report['meta']['git_rev']}-{report['meta']['timestamp'].replace(':', '')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote {out}")
+    if args.compare:
+        compare(report, json.loads(pathlib.Path(args.compare).read_text(encoding="utf-8")))
+
+if __name__ == "__main__":
+    main()
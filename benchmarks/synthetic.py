@@ -0,0 +1,50 @@
+from __future__ import annotations
+import random
+from typing import Any, Dict, Iterator, List
+from tools.clients import MOCK_NAMES, MOCK_ROLES, MOCK_STACKS
+
+# Seeded, deterministic scale-ups of tools.clients.mock_leads / mock_enrich.
+SIGNALS = ["recent_funding", "hiring_for_sales", "new_cto", "product_launch"]
+
+def synthetic_leads(n: int, seed: int = 0, companies: int = 5000) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for i in range(n):
+        c = rng.randrange(companies)
+        base, person = MOCK_NAMES[c % len(MOCK_NAMES)]
+        company = f"{base} {c}"
+        first = person.split()[0].lower()
+        yield {
+            "company": company,
+            "contact_name": f"{person} {i}",
+            "email": f"{first}.{i}@{company.replace(' ', '').lower()}.com",
+            "linkedin": f"https://www.linkedin.com/in/{first}-{i}",
+            "signal": rng.choice(SIGNALS),
+        }
+
+def synthetic_enrich(leads: List[Dict[str, Any]], seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [{
+        "company": L["company"],
+        "contact": L["contact_name"],
+        "role": rng.choice(MOCK_ROLES),
+        "technologies": rng.choice(MOCK_STACKS),
+        "domain": f"{L['company'].replace(' ', '').lower()}.com",
+        "email": L["email"],
+        "signal": L["signal"],
+    } for L in leads]
+
+class SyntheticSearchClient:
+    """Stand-in for Apollo/Clay that pages through `n` synthetic leads."""
+
+    def __init__(self, n: int, seed: int = 0):
+        self.n, self.seed = n, seed
+
+    def search_pages(self, query: Dict[str, Any], per_page: int = 100):
+        page: List[Dict[str, Any]] = []
+        for lead in synthetic_leads(self.n, self.seed):
+            page.append(lead)
+            if len(page) == per_page:
+                yield page
+                page = []
+        if page:
+            yield page
@@ -1,6 +1,8 @@
 import json
 from pathlib import Path
 import streamlit as st
+from utils.blobstore import BLOB_KEY, BlobStore, is_ref
+from utils.runstore import RunStore, default_path
 
 # -------------------------------------------------------
 # 🎨 Page Setup
@@ -15,26 +17,24 @@ st.title("🤖 LangGraph Prospect-to-Lead Dashboard")
 st.markdown("### End-to-End Campaign Metrics")
 
 # -------------------------------------------------------
-# 📊 Load Feedback Trainer Metrics
+# 📊 Load Feedback Trainer Metrics (indexed run store)
 # -------------------------------------------------------
-data_path = Path(".runs") / "feedback_trainer.log"
-if not data_path.exists():
-    st.error("⚠️ No feedback_trainer.log found. Run your workflow first!")
+store_path = default_path()
+if not store_path.exists():
+    st.error(f"⚠️ No run store found at {store_path}. Run your workflow first!")
     st.stop()
 
-metrics, recommendations = {}, []
-with open(data_path, "r", encoding="utf-8") as f:
-    for line in f:
-        try:
-            entry = json.loads(line.strip())
-            if not isinstance(entry, dict):
-                continue
-            if entry.get("kind") == "metrics":
-                metrics = entry.get("payload", {})
-            elif entry.get("kind") == "recommendations":
-                recommendations = entry.get("payload", [])
-        except json.JSONDecodeError:
-            continue
+store = RunStore(store_path, readonly=True)
+campaigns = store.campaigns()
+if not campaigns:
+    st.error("⚠️ The run store has no campaigns yet. Run your workflow first!")
+    st.stop()
+
+campaign_id = st.selectbox("Campaign", campaigns, index=0)
+last_runs = st.slider("Runs to show", min_value=1, max_value=200, value=30)
+history = store.metrics_history(campaign_id, last_runs=last_runs)
+metrics = history[-1]["metrics"] if history else {}
+recommendations = store.latest_event(campaign_id, "recommendations") or []
 
 # -------------------------------------------------------
 # 📈 Metrics Summary
@@ -62,6 +62,19 @@ progress_cols[1].progress(click_rate / 100, text="Click Rate")
 progress_cols[2].progress(reply_rate / 100, text="Reply Rate")
 progress_cols[3].progress(meeting_rate / 100, text="Meeting Rate")
 
+if len(history) > 1:
+    st.caption(f"Last {len(history)} runs of {campaign_id}")
+    st.line_chart({
+        name: {h["run_id"]: h["metrics"].get(name, 0) for h in history}
+        for name in ("open_rate", "click_rate", "reply_rate", "meeting_rate")
+    })
+
+totals = store.response_totals(campaign_id)
+st.caption(
+    f"{totals['responses']} tracked responses · {totals['opened']} opened · {totals['clicked']} clicked · "
+    f"{totals['replied']} replied · {totals['booked_meeting']} meetings"
+)
+
 # -------------------------------------------------------
 # 🧠 Recommendations
 # -------------------------------------------------------
@@ -82,40 +95,92 @@ st.subheader("✉️ Generated Outreach Emails")
 
 emails_path = Path(".runs") / "outreach_content.log"
 if emails_path.exists():
+    # Latest output record only; large message lists are logged as a blob reference plus a sample
+    latest = None
     with open(emails_path, "r", encoding="utf-8") as f:
-        lines = [l.strip() for l in f.readlines() if l.strip()]
-        emails = []
-        for l in lines:
+        for l in f:
             try:
-                emails.append(json.loads(l))
+                entry = json.loads(l)
             except Exception:
                 continue
-
-        shown = 0
-        for entry in emails:
-            if isinstance(entry, dict) and "output" in entry:
-                msgs = entry["output"].get("messages", [])
-                for msg in msgs[:5]:
-                    shown += 1
-                    subject = msg.get("subject", "Untitled")
-                    body = msg.get("email_body", "")
-                    to = msg.get("to", "unknown@unknown.com")
-                    lead = msg.get("lead", "N/A")
-
-                    with st.expander(f"💌 {shown}. {subject}", expanded=False):
-                        st.markdown(f"**To:** {to}")
-                        st.markdown(f"**Lead:** {lead}")
-                        st.markdown("---")
-                        st.write(body)
-
-            if shown >= 5:
-                break
-
-    if shown == 0:
+            if isinstance(entry, dict) and entry.get("kind") == "output":
+                latest = entry
+
+    msgs = (latest or {}).get("payload", {}).get("messages", [])
+    if is_ref(msgs):
+        st.caption(f"{msgs.get('count', '?')} messages logged ({msgs['bytes'] / 1024:.0f} KB, stored as a blob)")
+        full = None
+        if st.checkbox("Load all messages", key="load_messages"):
+            try:
+                full = BlobStore(Path(".runs") / "blobs").load(msgs[BLOB_KEY])
+            except FileNotFoundError:
+                st.warning("The full message list has been pruned from the blob store; showing the logged sample.")
+        if full is not None:
+            st.dataframe([{k: m.get(k) for k in ("lead", "to", "subject")} for m in full], use_container_width=True)
+            msgs = full
+        else:
+            msgs = msgs.get("sample", [])
+
+    for shown, msg in enumerate(msgs[:5], 1):
+        subject = msg.get("subject", "Untitled")
+        body = msg.get("email_body", "")
+        to = msg.get("to", "unknown@unknown.com")
+        lead = msg.get("lead", "N/A")
+
+        with st.expander(f"💌 {shown}. {subject}", expanded=False):
+            st.markdown(f"**To:** {to}")
+            st.markdown(f"**Lead:** {lead}")
+            st.markdown("---")
+            st.write(body)
+
+    if not msgs:
         st.info("No generated emails found yet. Run OutreachContentAgent first.")
 else:
     st.info("No outreach_content.log found yet. Run your workflow first.")
 
+# -------------------------------------------------------
+# ⏱️ Step Latency Breakdown (from --profile runs)
+# -------------------------------------------------------
+st.divider()
+st.subheader("⏱️ Step Latency Breakdown")
+
+profile_path = Path(".runs") / "profile.log"
+if profile_path.exists():
+    runs = {}
+    with open(profile_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line.strip())
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entry, dict) and entry.get("kind") == "step":
+                runs.setdefault(entry.get("run_id", "unknown"), []).append(entry.get("payload", {}))
+
+    if runs:
+        run_ids = list(runs.keys())
+        run_id = st.selectbox("Run", run_ids[::-1], index=0)
+        steps = runs[run_id]
+        st.bar_chart({"wall_s": {s.get("node"): s.get("wall_s", 0) for s in steps},
+                      "cpu_s": {s.get("node"): s.get("cpu_s", 0) for s in steps}})
+        st.dataframe([
+            {
+                "step": s.get("node"),
+                "agent": s.get("agent"),
+                "wall_s": s.get("wall_s"),
+                "cpu_s": s.get("cpu_s"),
+                "mem_peak_mb": s.get("mem_peak_mb"),
+                "items": s.get("items_out") if s.get("items_out") is not None else s.get("items_in"),
+                "items/sec": s.get("items_per_sec"),
+                "client_calls": (sum(m.get("calls", 0) for m in s["client_calls"].values())
+                                 if s.get("client_calls") is not None else None),  # None: parallel run
+            }
+            for s in steps
+        ], use_container_width=True)
+    else:
+        st.info("No profiled steps yet.")
+else:
+    st.info("No profile.log found yet. Run the workflow with --profile.")
+
 # -------------------------------------------------------
 # 🦾 Footer
 # -------------------------------------------------------
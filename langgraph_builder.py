@@ -1,8 +1,12 @@
 from __future__ import annotations
-import argparse, json, re, sys, pathlib
-from typing import Any, Dict
-from dotenv import load_dotenv
+import argparse, functools, json, re, sys, pathlib, time, tracemalloc
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Dict, List, Set
+from utils import logger
+from utils.checkpoint import CheckpointStore, checkpoint_key
+from utils.leads import json_default
 from utils.logger import log_event
+from tools.transport import CLIENT_METRICS, METRICS
 
 AGENT_MAP = {
     "ProspectSearchAgent": "agents.prospect_search:ProspectSearchAgent",
@@ -14,75 +18,301 @@ AGENT_MAP = {
     "FeedbackTrainerAgent": "agents.feedback_trainer:FeedbackTrainerAgent",
 }
 
+@functools.lru_cache(maxsize=None)
 def dimport(path: str):
     mod, cls = path.split(":")
     m = __import__(mod, fromlist=[cls])
     return getattr(m, cls)
 
-def render_refs(obj: Any, ctx: Dict[str, Any]) -> Any:
-    import re, json
+REF_RE = re.compile(r"\{\{([^}]+)\}\}")
+_MISSING = object()
 
-    # If the whole value is exactly a single {{ref}}, return the real object
+# ------------------------------------------------------------------
+# Compiled references: parsed once per workflow, resolved per step
+# ------------------------------------------------------------------
+class Ref:
+    """A whole-value {{path}}; resolves to the referenced object itself (no copy)."""
+    __slots__ = ("raw", "path", "local", "step")
+
+    def __init__(self, raw: str, expr: str, step_ids: Set[str]):
+        self.raw = raw
+        self.path = tuple(expr.strip().split("."))
+        head = self.path[0]
+        # {{X.output...}} addresses step X directly; anything else is looked up from the root ctx
+        self.local = head in step_ids
+        if self.local:
+            self.step = head
+        elif head == "steps" and len(self.path) > 1 and self.path[1] in step_ids:
+            self.step = self.path[1]
+        else:
+            self.step = None
+
+    def lookup(self, ctx: Dict[str, Any]) -> Any:
+        if self.local:
+            out = ctx["steps"].get(self.step, {})
+            if len(self.path) == 1:
+                return {"output": out}
+            if self.path[1] != "output":
+                return _MISSING
+            cur, rest = out, self.path[2:]
+        else:
+            cur, rest = ctx, self.path
+        for p in rest:
+            if not isinstance(cur, dict) or p not in cur:
+                return _MISSING
+            cur = cur[p]
+        return cur
+
+    def resolve(self, ctx: Dict[str, Any]) -> Any:
+        val = self.lookup(ctx)
+        return self.raw if val is _MISSING else val
+
+
+class Template:
+    """A string with inline {{path}} substitutions."""
+    __slots__ = ("raw", "parts", "refs")
+
+    def __init__(self, raw: str, step_ids: Set[str]):
+        self.raw = raw
+        self.parts: List[Any] = []
+        pos = 0
+        for m in REF_RE.finditer(raw):
+            self.parts.append(raw[pos:m.start()])
+            self.parts.append(Ref(m.group(0), m.group(1), step_ids))
+            pos = m.end()
+        self.parts.append(raw[pos:])
+        self.refs = [p for p in self.parts if isinstance(p, Ref)]
+
+    def resolve(self, ctx: Dict[str, Any]) -> str:
+        out = []
+        for p in self.parts:
+            if isinstance(p, Ref):
+                val = p.lookup(ctx)
+                p = p.raw if val is _MISSING else val if isinstance(val, str) else json.dumps(val, default=json_default)
+            out.append(p)
+        return "".join(out)
+
+
+class _Container:
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = items
+
+
+class ListNode(_Container):
+    def resolve(self, ctx: Dict[str, Any]) -> List[Any]:
+        return [x.resolve(ctx) if isinstance(x, _NODES) else x for x in self.items]
+
+
+class DictNode(_Container):
+    def resolve(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v.resolve(ctx) if isinstance(v, _NODES) else v for k, v in self.items.items()}
+
+
+_NODES = (Ref, Template, ListNode, DictNode)
+
+def compile_refs(obj: Any, step_ids: Set[str], refs: List[Ref]) -> Any:
+    # Subtrees without any {{ref}} are kept as-is and handed to agents untouched.
     if isinstance(obj, str):
-        m = re.fullmatch(r"\{\{([^}]+)\}\}", obj)
+        m = REF_RE.fullmatch(obj)
         if m:
-            path = m.group(1).strip()
-            cur = ctx
-            for p in path.split("."):
-                if p not in cur:
-                    return obj  # leave unresolved if missing
-                cur = cur[p]
-            return cur  # <-- return the actual object (list/dict/str/num)
-
-        # Otherwise, allow inline string substitutions inside a larger string
-        def repl(mm):
-            path = mm.group(1).strip()
-            cur = ctx
-            for p in path.split("."):
-                if p not in cur:
-                    return mm.group(0)  # leave unresolved
-                cur = cur[p]
-            # When embedding inside a string, convert to string
-            return cur if isinstance(cur, str) else json.dumps(cur)
-
-        return re.sub(r"\{\{([^}]+)\}\}", repl, obj)
-
+            ref = Ref(obj, m.group(1), step_ids)
+            refs.append(ref)
+            return ref
+        if REF_RE.search(obj):
+            tpl = Template(obj, step_ids)
+            refs.extend(tpl.refs)
+            return tpl
+        return obj
     if isinstance(obj, list):
-        return [render_refs(x, ctx) for x in obj]
+        items = [compile_refs(x, step_ids, refs) for x in obj]
+        return ListNode(items) if any(isinstance(x, _NODES) for x in items) else obj
     if isinstance(obj, dict):
-        return {k: render_refs(v, ctx) for k, v in obj.items()}
+        items = {k: compile_refs(v, step_ids, refs) for k, v in obj.items()}
+        return DictNode(items) if any(isinstance(v, _NODES) for v in items.values()) else obj
     return obj
 
+def resolve_inputs(compiled: Any, ctx: Dict[str, Any]) -> Any:
+    return compiled.resolve(ctx) if isinstance(compiled, _NODES) else compiled
+
+def fingerprint_inputs(node: Any, ctx: Dict[str, Any], keys: Dict[str, str]) -> Any:
+    # Resolved-input identity without serializing upstream outputs: a ref to step X
+    # contributes X's checkpoint key (Merkle-style); config refs contribute their value.
+    if isinstance(node, Ref):
+        if node.step:
+            return ["ref", keys.get(node.step), node.path]
+        val = node.lookup(ctx)
+        return ["ref", None, node.path, None if val is _MISSING else val]
+    if isinstance(node, Template):
+        return ["tpl", [fingerprint_inputs(p, ctx, keys) for p in node.parts]]
+    if isinstance(node, ListNode):
+        return [fingerprint_inputs(x, ctx, keys) for x in node.items]
+    if isinstance(node, DictNode):
+        return {k: fingerprint_inputs(v, ctx, keys) for k, v in node.items.items()}
+    return node
+
 
-def run_workflow(workflow: Dict[str, Any]) -> Dict[str, Any]:
-    steps = workflow.get("steps", [])
-    ctx: Dict[str, Any] = {"config": workflow.get("config", {}), "steps": {}}
-    prev_output = None
-    for step in steps:
-        node_id = step["id"]
-        agent_name = step["agent"]
-        inputs = step.get("inputs", {})
-        instructions = step.get("instructions", "")
-        tools = step.get("tools", [])
-
-        rich_ctx = {**ctx, node_id: {"output": prev_output}, **{s["id"]: {"output": ctx["steps"].get(s["id"], {})} for s in steps}}
-        inputs = render_refs(inputs, rich_ctx)
-
-        AgentCls = dimport(AGENT_MAP[agent_name])
-        agent = AgentCls(node_id=node_id, instructions=instructions, tools=tools)
-        log_event(node_id, "start", {"inputs": inputs})
-        out = agent.run(inputs)
-        ctx["steps"][node_id] = out
-        prev_output = out
-        log_event(node_id, "end", {"output_keys": list(out.keys())})
+class CompiledStep:
+    __slots__ = ("id", "agent", "instructions", "tools", "inputs", "refs", "deps")
+
+    def __init__(self, step: Dict[str, Any], step_ids: Set[str]):
+        self.id = step["id"]
+        self.agent = step["agent"]
+        self.instructions = step.get("instructions", "")
+        self.tools = step.get("tools", [])
+        self.refs: List[Ref] = []
+        self.inputs = compile_refs(step.get("inputs", {}), step_ids, self.refs)
+        # A step depends on every other step it references as {{X.output...}} or {{steps.X...}}
+        self.deps = {r.step for r in self.refs if r.step and r.step != self.id}
+
+    def checkpoint_key(self, ctx: Dict[str, Any], keys: Dict[str, str]) -> str:
+        return checkpoint_key(self.agent, self.instructions, self.tools, fingerprint_inputs(self.inputs, ctx, keys))
+
+
+class Plan:
+    def __init__(self, workflow: Dict[str, Any]):
+        steps = workflow.get("steps", [])
+        step_ids = {s["id"] for s in steps}
+        self.config = workflow.get("config", {})
+        self.steps = [CompiledStep(s, step_ids) for s in steps]
+        self.dag = {s.id: s.deps for s in self.steps}
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        # Kahn's algorithm, only to reject cycles up front
+        done: Set[str] = set()
+        while len(done) < len(self.dag):
+            ready = [n for n, d in self.dag.items() if n not in done and d <= done]
+            if not ready:
+                stuck = sorted(n for n in self.dag if n not in done)
+                raise ValueError(f"Cyclic step dependencies: {stuck}")
+            done.update(ready)
+
+    def new_context(self) -> Dict[str, Any]:
+        return {"config": self.config, "steps": {}}
+
+    def unresolved(self) -> List[str]:
+        # Statically checkable problems: unknown agents, refs to nothing (config / unknown steps)
+        problems = [f"{s.id}: unknown agent {s.agent!r}" for s in self.steps if s.agent not in AGENT_MAP]
+        ctx = self.new_context()
+        for s in self.steps:
+            for r in s.refs:
+                if r.step is None and r.lookup(ctx) is _MISSING:
+                    problems.append(f"{s.id}: unresolved reference {r.raw}")
+        return problems
+
+def compile_workflow(workflow: Dict[str, Any]) -> Plan:
+    return Plan(workflow)
+
+def build_dag(steps: List[Dict[str, Any]]) -> Dict[str, Set[str]]:
+    return compile_workflow({"steps": steps}).dag
+
+
+def run_workflow(workflow: Dict[str, Any] | Plan, max_parallel: int = 1,
+                 checkpoints: CheckpointStore | None = None, resume: bool = False,
+                 profile: bool = False, cprofile_dir: str | pathlib.Path | None = None) -> Dict[str, Any]:
+    plan = workflow if isinstance(workflow, Plan) else compile_workflow(workflow)
+    max_parallel = max(1, max_parallel)
+    ctx = plan.new_context()
+    keys: Dict[str, str] = {}
+    profiles: Dict[str, Dict[str, Any]] = {}
+
+    def run_step(step: CompiledStep, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        AgentCls = dimport(AGENT_MAP[step.agent])
+        agent = AgentCls(node_id=step.id, instructions=step.instructions, tools=step.tools)
+        log_event(step.id, "start", {"inputs": inputs})
+        execute = getattr(agent, "execute", None)
+        out = (execute(inputs, profile=profile, cprofile_dir=cprofile_dir, attribute=attribute)
+               if execute else agent.run(inputs))
+        log_event(step.id, "end", {"output_keys": list(out.keys())})
+        stats = getattr(agent, "last_profile", None) if profile else None
+        if stats:
+            profiles[step.id] = stats
+            log_event("profile", "step", stats)
+        if checkpoints is not None:
+            checkpoints.save(keys[step.id], step.id, step.agent, out)
+        return out
+
+    # One tracemalloc session for the whole run, so parallel steps don't stop each other's tracing.
+    # Memory peaks and client calls are process-wide: per step only when steps run one at a time,
+    # otherwise they are reported for the whole run in ctx["profile_run"].
+    attribute = max_parallel == 1
+    own_tracing = profile and not tracemalloc.is_tracing()
+    if own_tracing:
+        tracemalloc.start()
+    if profile:
+        tracemalloc.reset_peak()
+        mem0, wall0 = tracemalloc.get_traced_memory()[0], time.perf_counter()
+        client_mark, http_mark = CLIENT_METRICS.mark(), METRICS.mark()
+
+    try:
+        # Steps are submitted in declaration order as soon as their dependencies are done;
+        # ctx is only touched from this thread, so refs are resolved before submission.
+        pending = list(plan.steps)
+        running: Dict[Any, str] = {}
+        with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+            while pending or running:
+                for step in list(pending):
+                    if len(running) >= max_parallel:
+                        break
+                    if step.deps <= ctx["steps"].keys():
+                        pending.remove(step)
+                        if checkpoints is not None:
+                            keys[step.id] = step.checkpoint_key(ctx, keys)
+                            cached = checkpoints.load(keys[step.id]) if resume else None
+                            if cached is not None:
+                                log_event(step.id, "resumed", {"checkpoint": keys[step.id]})
+                                ctx["steps"][step.id] = cached
+                                continue
+                        inputs = resolve_inputs(step.inputs, ctx)
+                        running[pool.submit(run_step, step, inputs)] = step.id
+                if not running:
+                    continue  # everything ready this round came from checkpoints
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    ctx["steps"][running.pop(fut)] = fut.result()
+        if profile:
+            # Sequential steps reset the peak themselves, so the run's peak is the largest of theirs
+            peak = round(max(0, tracemalloc.get_traced_memory()[1] - mem0) / 2**20, 3)
+            peak = max([peak] + [p["mem_peak_mb"] for p in profiles.values() if p.get("mem_peak_mb") is not None])
+            ctx["profile_run"] = {
+                "wall_s": round(time.perf_counter() - wall0, 6),
+                "mem_peak_mb": peak,
+                "client_calls": CLIENT_METRICS.snapshot(since=client_mark),
+                "http": METRICS.snapshot(since=http_mark),
+            }
+    finally:
+        if own_tracing:
+            tracemalloc.stop()
+    if profile:
+        ctx["profile"] = [profiles[s.id] for s in plan.steps if s.id in profiles]
     return ctx
 
+def print_profile(rows: List[Dict[str, Any]], run: Dict[str, Any] | None = None) -> None:
+    print("\n=== PROFILE ===")
+    print(f"{'step':<20} {'wall_s':>9} {'cpu_s':>9} {'mem_mb':>8} {'items':>9} {'items/s':>11} {'calls':>6}")
+    for r in rows:
+        calls = sum(m["calls"] for m in r["client_calls"].values()) if r.get("client_calls") is not None else "-"
+        items = r["items_out"] if r.get("items_out") is not None else r.get("items_in")
+        mem = f"{r['mem_peak_mb']:.2f}" if r.get("mem_peak_mb") is not None else "-"
+        print(f"{r['node']:<20} {r['wall_s']:>9.4f} {r['cpu_s']:>9.4f} {mem:>8} "
+              f"{items if items is not None else '-':>9} {r['items_per_sec'] or '-':>11} {calls:>6}")
+    if run:
+        calls = sum(m["calls"] for m in run["client_calls"].values())
+        print(f"{'(whole run)':<20} {run['wall_s']:>9.4f} {'-':>9} {run['mem_peak_mb']:>8.2f} {'-':>9} {'-':>11} {calls:>6}")
+
 def main():
-    load_dotenv()
     ap = argparse.ArgumentParser()
     ap.add_argument("--workflow", required=True)
     ap.add_argument("--run", action="store_true")
     ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--max-parallel", type=int, default=1, help="Max independent steps run concurrently")
+    ap.add_argument("--resume", action="store_true", help="Reuse checkpointed outputs of unchanged steps")
+    ap.add_argument("--no-checkpoint", action="store_true", help="Don't write step checkpoints")
+    ap.add_argument("--profile", action="store_true", help="Record per-step wall/CPU time, memory, items/sec and client calls")
+    ap.add_argument("--profile-cprofile", action="store_true", help="With --profile, also dump a cProfile file per step")
+    ap.add_argument("--worker", help="Send the run to a warm worker (e.g. http://127.0.0.1:8787) instead of running here")
     args = ap.parse_args()
 
     wf_path = pathlib.Path(args.workflow)
@@ -95,14 +325,42 @@ def main():
     if args.dry_run and args.run:
         print("--dry-run and --run are mutually exclusive", file=sys.stderr); sys.exit(2)
 
+    try:
+        plan = compile_workflow(workflow)
+    except ValueError as e:
+        print(str(e), file=sys.stderr); sys.exit(2)
+
     if args.dry_run:
+        problems = plan.unresolved()
+        for p in problems:
+            print(f"  - {p}")
+        if problems:
+            print(f"Validation found {len(problems)} problem(s).", file=sys.stderr); sys.exit(1)
         print("Validation OK."); return
 
-    ctx = run_workflow(workflow)
+    if args.worker:
+        from worker import submit
+        res = submit(args.worker, workflow, max_parallel=args.max_parallel, resume=args.resume,
+                     no_checkpoint=args.no_checkpoint, profile=args.profile)
+        print(f"Run {res['run_id']} finished on worker in {res['elapsed_s']}s")
+        print("\n=== FINAL OUTPUT ===")
+        print(json.dumps(res["final"], indent=2, default=json_default))
+        if args.profile:
+            print_profile(res["profile"], res.get("profile_run"))
+        return
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    checkpoints = None if args.no_checkpoint else CheckpointStore(logger.RUN_DIR / "checkpoints")
+    cprofile_dir = logger.RUN_DIR / "profiles" / logger.RUN_ID if args.profile_cprofile else None
+    ctx = run_workflow(plan, max_parallel=args.max_parallel, checkpoints=checkpoints, resume=args.resume,
+                       profile=args.profile, cprofile_dir=cprofile_dir)
     last_id = workflow["steps"][-1]["id"]
     final = ctx["steps"][last_id]
     print("\n=== FINAL OUTPUT ===")
-    print(json.dumps(final, indent=2))
+    print(json.dumps(final, indent=2, default=json_default))
+    if args.profile:
+        print_profile(ctx["profile"], ctx.get("profile_run"))
 
 if __name__ == "__main__":
     main()
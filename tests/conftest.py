@@ -0,0 +1,14 @@
+import sys, pathlib
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+@pytest.fixture(autouse=True)
+def isolated_caches(monkeypatch, tmp_path):
+    from utils import logger
+    monkeypatch.setattr(logger, "RUN_DIR", tmp_path / ".runs")
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm.sqlite"))
+    monkeypatch.setenv("ENRICH_CACHE_PATH", str(tmp_path / "enrichment.sqlite"))
+    monkeypatch.setenv("SEND_LEDGER_PATH", str(tmp_path / "send_ledger.sqlite"))
+    monkeypatch.setenv("RUN_STORE_PATH", str(tmp_path / ".runs" / "runs.sqlite"))
+    monkeypatch.setenv("SEEN_INDEX_PATH", str(tmp_path / "prospects_seen.sqlite"))
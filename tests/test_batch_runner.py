@@ -0,0 +1,37 @@
+import json
+import batch_runner
+from utils.cache import DiskCache
+
+WF = {"steps": [
+    {"id": "search", "agent": "ProspectSearchAgent", "inputs": {"_limit": 4}},
+    {"id": "score", "agent": "ScoringAgent", "inputs": {"enriched_leads": []}},
+]}
+
+def test_campaigns_run_isolated(tmp_path):
+    src = tmp_path / "wfs"
+    src.mkdir()
+    for name in ("icp_a", "icp_b"):
+        (src / f"{name}.json").write_text(json.dumps(WF))
+    (src / "broken.json").write_text(json.dumps({"steps": [{"id": "x", "agent": "NoSuchAgent"}]}))
+    summary = batch_runner.run_batch(src, processes=2, base_dir=tmp_path / "out")
+    status = {r["name"]: r["status"] for r in summary["results"]}
+    assert status == {"broken": "error", "icp_a": "ok", "icp_b": "ok"}
+    for name in ("icp_a", "icp_b"):
+        assert (tmp_path / "out" / name / "final.json").exists()
+        assert (tmp_path / "out" / name / "search.log").exists()
+
+def test_readonly_cache_reads_but_never_writes(tmp_path):
+    path = tmp_path / "c.sqlite"
+    assert DiskCache(path, readonly=True).get("k") is None and not path.exists()
+    rw = DiskCache(path)
+    rw.set("k", {"v": 1})
+    rw.close()
+    ro = DiskCache(path, readonly=True)
+    ro.set("k2", 2)
+    assert ro.get("k") == {"v": 1} and ro.get_many(["k", "k2"]) == {"k": {"v": 1}}
+
+def test_workers_split_provider_rate_limits(monkeypatch):
+    from tools import transport
+    monkeypatch.setattr(transport, "_buckets", {})
+    monkeypatch.setenv("RATE_LIMIT_SHARE", "4")
+    assert transport.provider_bucket("apollo").rate == transport.PROVIDER_RATE_LIMITS["apollo"] / 4
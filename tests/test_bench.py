@@ -0,0 +1,19 @@
+from benchmarks import run_bench
+from benchmarks.synthetic import synthetic_leads
+
+def test_synthetic_leads_are_deterministic():
+    assert list(synthetic_leads(50, seed=4)) == list(synthetic_leads(50, seed=4))
+    assert list(synthetic_leads(50, seed=4)) != list(synthetic_leads(50, seed=5))
+
+def test_measure_reports_throughput_and_memory():
+    cases = dict(run_bench.agent_cases(200, seed=1))
+    m = run_bench.measure(cases["ScoringAgent"], 200, repeat=2, seed=1)
+    assert m["items"] == 200 and m["items_per_sec"] > 0 and m["peak_mem_mb"] >= 0
+
+def test_offline_env_restores_provider_keys(monkeypatch):
+    import os
+    monkeypatch.setenv("SENDGRID_API_KEY", "sg-key")
+    monkeypatch.delenv("APOLLO_API_KEY", raising=False)
+    with run_bench.offline_env():
+        assert os.environ["SENDGRID_API_KEY"] == "" and os.environ["APOLLO_API_KEY"] == ""
+    assert os.environ["SENDGRID_API_KEY"] == "sg-key" and "APOLLO_API_KEY" not in os.environ
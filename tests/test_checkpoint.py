@@ -0,0 +1,51 @@
+import pytest
+import langgraph_builder as lgb
+from utils.checkpoint import CheckpointStore
+
+CALLS = []
+
+class CountingAgent:
+    def __init__(self, node_id, instructions=None, tools=None):
+        self.id = node_id
+    def run(self, payload):
+        CALLS.append(self.id)
+        return {"value": f"{self.id}:{payload.get('knob')}:{payload.get('up')}"}
+
+def _wf(knob):
+    return {"config": {"knob": knob}, "steps": [
+        {"id": "search", "agent": "Count", "inputs": {}},
+        {"id": "score", "agent": "Count", "inputs": {"up": "{{search.output.value}}", "knob": "{{config.knob}}"}},
+        {"id": "send", "agent": "Count", "inputs": {"up": "{{score.output.value}}"}},
+    ]}
+
+@pytest.fixture(autouse=True)
+def counting(monkeypatch):
+    CALLS.clear()
+    monkeypatch.setitem(lgb.AGENT_MAP, "Count", "unused:Count")
+    monkeypatch.setattr(lgb, "dimport", lambda path: CountingAgent)
+    monkeypatch.setattr(lgb, "log_event", lambda *a, **k: None)
+
+def test_resume_skips_unchanged_and_reruns_changed_suffix(tmp_path):
+    store = CheckpointStore(tmp_path)
+    first = lgb.run_workflow(_wf(1), checkpoints=store)
+    assert CALLS == ["search", "score", "send"]
+
+    CALLS.clear()
+    again = lgb.run_workflow(_wf(1), checkpoints=store, resume=True)
+    assert CALLS == [] and again["steps"] == first["steps"]
+
+    CALLS.clear()
+    lgb.run_workflow(_wf(2), checkpoints=store, resume=True)
+    assert CALLS == ["score", "send"]
+
+def test_prune_drops_expired_then_least_recently_used(tmp_path):
+    import os, time
+    store = CheckpointStore(tmp_path, max_age_days=1, max_entries=2)
+    for i in range(4):
+        store.save(f"{i:02d}" * 32, f"s{i}", "Count", {"i": i})
+    now = time.time()
+    for i, age in enumerate((3 * 86400, 40, 30, 20)):
+        os.utime(store._path(f"{i:02d}" * 32), (now - age, now - age))
+    assert store.load("01" * 32) == {"i": 1}  # resuming refreshes it
+    assert store.prune() == 2
+    assert [store.load(f"{i:02d}" * 32) is not None for i in range(4)] == [False, True, False, True]
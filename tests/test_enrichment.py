@@ -0,0 +1,50 @@
+import pytest
+import agents.base
+from agents.enrichment import BulkEnricher, DataEnrichmentAgent
+from utils.cache import DiskCache
+
+class CountingClearbit:
+    BULK_SIZE = 3
+    def __init__(self):
+        self.people_calls, self.company_calls = [], []
+    def enrich_people(self, emails):
+        self.people_calls.append(list(emails))
+        return {e: {"role": "VP Sales"} for e in emails}
+    def enrich_companies(self, domains):
+        self.company_calls.append(list(domains))
+        return {d: {"technologies": [d.split(".")[0]]} for d in domains}
+
+def _leads():
+    return [{"company": f"Co{i % 2}", "contact_name": f"P{i % 5}", "email": f"p{i % 5}@co{i % 2}.com"} for i in range(20)]
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    monkeypatch.setattr(agents.base, "log_event", lambda *a, **k: None)
+
+def test_unique_keys_fetched_once_in_batches(tmp_path):
+    client = CountingClearbit()
+    out = BulkEnricher(client, DiskCache(tmp_path / "c.sqlite")).enrich(_leads())
+    assert sorted(sum(client.people_calls, [])) == sorted({l["email"] for l in _leads()})
+    assert all(len(b) <= 3 for b in client.people_calls)
+    assert client.company_calls == [["co0.com", "co1.com"]]
+    assert out[3] == {"company": "Co1", "contact": "P3", "role": "VP Sales", "technologies": ["co1"], "domain": "co1.com",
+                      "email": "p3@co1.com"}
+
+def test_cache_skips_provider_on_rerun(tmp_path):
+    BulkEnricher(CountingClearbit(), DiskCache(tmp_path / "c.sqlite")).enrich(_leads())
+    client = CountingClearbit()
+    cache = DiskCache(tmp_path / "c.sqlite")
+    BulkEnricher(client, cache).enrich(_leads())
+    assert client.people_calls == [] and client.company_calls == []
+    assert cache.stats()["hits"] == 12  # 10 emails + 2 domains
+
+def test_agent_output_shape():
+    out = DataEnrichmentAgent("enrich").run({"leads": _leads()})["enriched_leads"]
+    assert len(out) == 20 and set(out[0]) == {"company", "contact", "role", "technologies", "domain", "email"}
+
+def test_mock_results_are_not_served_to_live_runs(tmp_path, monkeypatch):
+    BulkEnricher(CountingClearbit(), DiskCache(tmp_path / "c.sqlite")).enrich(_leads())  # no keys set: mock mode
+    monkeypatch.setenv("CLEARBIT_KEY", "live-key")
+    client = CountingClearbit()
+    BulkEnricher(client, DiskCache(tmp_path / "c.sqlite")).enrich(_leads())
+    assert client.company_calls == [["co0.com", "co1.com"]]
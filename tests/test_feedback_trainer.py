@@ -0,0 +1,44 @@
+import random
+import agents.base
+from agents.feedback_trainer import FeedbackTrainerAgent, SegmentedMetrics, compute_metrics, segment_recos
+from utils import logger
+
+def _responses(n, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        signal = rng.choice(["recent_funding", "new_cto"])
+        hot = signal == "recent_funding"
+        out.append({"lead": f"p{i}", "opened": rng.random() < 0.6, "clicked": rng.random() < 0.2,
+                    "replied": rng.random() < (0.4 if hot else 0.02), "booked_meeting": rng.random() < 0.05,
+                    "segment": {"signal": signal, "role": rng.choice(["VP Sales", "CTO"]), "stack": "dbt", "variant": "v1"}})
+    return out
+
+def test_single_pass_matches_global_rates():
+    responses = _responses(500)
+    n = len(responses)
+    assert compute_metrics(responses) == {
+        "open_rate": sum(r["opened"] for r in responses) / n, "click_rate": sum(r["clicked"] for r in responses) / n,
+        "reply_rate": sum(r["replied"] for r in responses) / n, "meeting_rate": sum(r["booked_meeting"] for r in responses) / n,
+    }
+    assert compute_metrics([]) == {"open_rate": 0.0, "click_rate": 0.0, "reply_rate": 0.0, "meeting_rate": 0.0}
+
+def test_segment_recos_point_at_the_strong_and_weak_signal():
+    recs = segment_recos(SegmentedMetrics().update_many(_responses(400)))
+    assert any(r.startswith("Lean into signal 'recent_funding'") for r in recs)
+    assert any(r.startswith("Deprioritize signal 'new_cto'") for r in recs)
+
+def test_window_accumulates_across_runs(monkeypatch):
+    monkeypatch.setattr(agents.base, "log_event", lambda *a, **k: None)
+    for i in range(3):
+        monkeypatch.setattr(logger, "RUN_ID", f"run-{i}")
+        out = FeedbackTrainerAgent("feedback").run({"responses": _responses(50, seed=i), "window_runs": 2})
+    by_signal = {s["value"]: s["n"] for s in out["segments"] if s["dim"] == "signal"}
+    assert sum(by_signal.values()) == 100  # last two runs only
+
+def test_empty_run_records_nothing(monkeypatch):
+    from utils.runstore import get_store
+    monkeypatch.setattr(agents.base, "log_event", lambda *a, **k: None)
+    out = FeedbackTrainerAgent("feedback").run({"responses": [], "campaign_id": "cmp-empty"})
+    assert out == {"recommendations": [], "metrics": {}, "segments": [], "no_data": True}
+    assert "cmp-empty" not in get_store().campaigns()
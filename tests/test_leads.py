@@ -0,0 +1,24 @@
+import json
+from agents.scoring import rank_leads, rank_table
+from tests.test_scoring import CRITERIA, _leads
+from utils.leads import LeadTable, json_default
+
+def _records(n):
+    return [{"company": f"Co{i % 7}", "contact": f"Person {i}", **L} for i, L in enumerate(_leads(n))]
+
+def test_table_rows_behave_like_the_source_dicts():
+    records = _records(50)
+    table = LeadTable.from_records(records)
+    assert len(table) == 50 and table == records
+    assert table[3]["company"] == "Co3" and table[3].get("missing", "x") == "x"
+    assert table[0]["company"] is table[7]["company"]  # interned
+    assert table.to_records() == records
+
+def test_rank_table_matches_rank_leads():
+    records = _records(400)
+    table = LeadTable.from_records(records)
+    assert rank_table(table, CRITERIA) == rank_leads(records, CRITERIA)
+    top = rank_table(table, CRITERIA, top_k=20)
+    assert top == rank_leads(records, CRITERIA, top_k=20)
+    assert top.table is table and [item["lead"] for item in top[:5]] == [x["lead"] for x in rank_leads(records, CRITERIA)[:5]]
+    assert json.loads(json.dumps({"ranked_leads": top[:2]}, default=json_default))["ranked_leads"] == top[:2].to_records()
@@ -0,0 +1,57 @@
+import json
+import utils.logger as logger
+
+def test_batched_writes_carry_run_id_and_rotate(monkeypatch, tmp_path):
+    monkeypatch.setattr(logger, "RUN_DIR", tmp_path)
+    monkeypatch.setattr(logger, "RUN_ID", "run-test")
+    monkeypatch.setattr(logger, "MAX_BYTES", 2000)
+    for i in range(100):
+        logger.log_event("node", "tick", {"i": i})
+        if i % 10 == 9:
+            logger.flush()
+    lines = []
+    for p in sorted(tmp_path.glob("node.log*"), reverse=True):
+        lines += [json.loads(l) for l in p.read_text(encoding="utf-8").splitlines()]
+    assert (tmp_path / "node.log.1").exists()
+    assert {r["run_id"] for r in lines} == {"run-test"}
+    assert [r["payload"]["i"] for r in lines][-10:] == list(range(90, 100))
+
+def test_large_payloads_spill_to_blob_store_once(monkeypatch, tmp_path):
+    from utils.blobstore import BlobStore, is_ref, resolve
+    monkeypatch.setattr(logger, "RUN_DIR", tmp_path)
+    leads = [{"company": f"Co{i}", "contact": f"Pat {i}", "note": "x" * 100} for i in range(200)]
+    logger.log_event("node", "start", {"inputs": {"leads": leads, "tone": "friendly"}})
+    logger.log_event("other", "output", {"leads": leads, "count": 200})
+    logger.flush()
+    rec = json.loads((tmp_path / "node.log").read_text(encoding="utf-8"))
+    ref = rec["payload"]["inputs"]["leads"]
+    assert is_ref(ref) and ref["count"] == 200 and ref["sample"] == leads[:3]
+    assert rec["payload"]["inputs"]["tone"] == "friendly"
+    assert (tmp_path / "node.log").stat().st_size < 4096
+    assert len(list((tmp_path / "blobs").rglob("*.json.gz"))) == 1  # same list from two steps, stored once
+    other = json.loads((tmp_path / "other.log").read_text(encoding="utf-8"))
+    assert resolve(other["payload"], BlobStore(tmp_path / "blobs")) == {"leads": leads, "count": 200}
+
+def test_blob_store_prunes_by_age_then_size(tmp_path):
+    import os, time
+    from utils.blobstore import BlobStore
+    store = BlobStore(tmp_path / "blobs")
+    digests = [store.put(f"payload {i} ".encode() * 200) for i in range(4)]
+    now = time.time()
+    for age, d in zip((10 * 86400, 3, 2, 1), digests):
+        os.utime(store.path(d), (now - age, now - age))
+    store.put(f"payload 1 ".encode() * 200)  # stored again: counts as fresh
+    size = store.path(digests[2]).stat().st_size
+    assert store.prune(max_age_s=86400, max_bytes=2 * size + 10) == 2
+    assert [store.path(d).exists() for d in digests] == [False, True, False, True]
+
+def test_unserializable_payload_does_not_kill_writer(monkeypatch, tmp_path):
+    monkeypatch.setattr(logger, "RUN_DIR", tmp_path)
+    logger.log_event("n", "bad", {(1, 2): 3})
+    logger.log_event("n", "good", {"i": 1})
+    logger.flush()
+    logger.log_event("n", "later", {"i": 2})
+    logger.flush(timeout=2)
+    recs = [json.loads(l) for l in (tmp_path / "n.log").read_text(encoding="utf-8").splitlines()]
+    assert [r["kind"] for r in recs] == ["bad", "good", "later"]
+    assert "log_error" in recs[0]["payload"] and recs[1]["payload"] == {"i": 1}
@@ -0,0 +1,121 @@
+import threading
+import pytest
+import agents.base
+import agents.outreach_content as oc
+from tools.clients import FakeGeminiModel
+
+def _ranked(n):
+    return [{"lead": {"company": f"Co{i}", "contact": f"Pat {i}", "domain": f"co{i}.com"}, "score": 0.5} for i in range(n)]
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    monkeypatch.setattr(agents.base, "log_event", lambda *a, **k: None)
+    monkeypatch.setattr(oc, "BACKOFF_BASE", 0.0)
+
+class CountingModel(FakeGeminiModel):
+    """FakeGeminiModel that records the peak number of generate_content calls in flight."""
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.in_flight = self.peak = 0
+        self._lock = threading.Lock()
+    def generate_content(self, prompt, generation_config=None):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            return super().generate_content(prompt, generation_config)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+def test_concurrent_generation_keeps_order_and_has_no_cap(monkeypatch):
+    model = CountingModel(latency=0.05)
+    monkeypatch.setattr(oc.OutreachContentAgent, "_load_model", lambda self, name: model)
+    agent = oc.OutreachContentAgent("outreach_content")
+    out = agent.run({"ranked_leads": _ranked(40), "concurrency": 20, "requests_per_minute": None, "cache": False})
+    assert 1 < model.peak <= 20  # calls overlap, up to the concurrency setting
+    assert [m["subject"] for m in out["messages"]] == [f"Quick idea for Co{i}" for i in range(40)]
+
+def test_quota_errors_fall_back_per_lead(monkeypatch):
+    monkeypatch.setattr(oc, "QUOTA_RETRIES", 0)
+    monkeypatch.setattr(oc.OutreachContentAgent, "_load_model", lambda self, name: FakeGeminiModel(fail_every=2))
+    out = oc.OutreachContentAgent("outreach_content").run({"ranked_leads": _ranked(6), "concurrency": 1})
+    fallback = [m for m in out["messages"] if "Analytos.ai" in m["subject"]]
+    assert len(fallback) == 3 and len(out["messages"]) == 6
+
+def test_cache_skips_repeat_generation(monkeypatch):
+    model = FakeGeminiModel()
+    monkeypatch.setattr(oc.OutreachContentAgent, "_load_model", lambda self, name: model)
+    payload = {"ranked_leads": _ranked(5)}
+    first = oc.OutreachContentAgent("outreach_content").run(payload)
+    second = oc.OutreachContentAgent("outreach_content").run({**payload, "tone": "friendly"})
+    assert next(model._calls) == 6  # 5 calls on the first run, none on the second
+    assert first == second
+
+class PartialBatchModel:
+    """Answers batch prompts with JSON, but drops lead 1 and garbles lead 2 of every batch."""
+    def __init__(self):
+        self.prompts = []
+    def generate_content(self, prompt, generation_config=None):
+        import json
+        self.prompts.append(prompt)
+        leads = json.loads(prompt.split(oc.BATCH_MARKER, 1)[1])
+        items = [{"id": L["id"], "subject": f"Hello {L['company']}", "body": "Short note."} for L in leads if L["id"] != 1]
+        items = [dict(it, body="") if it["id"] == 2 else it for it in items]
+        return type("R", (), {"text": "```json\n" + json.dumps(items) + "\n```"})()
+
+def test_batch_mode_packs_leads_and_falls_back_per_entry(monkeypatch):
+    model = PartialBatchModel()
+    monkeypatch.setattr(oc.OutreachContentAgent, "_load_model", lambda self, name: model)
+    out = oc.OutreachContentAgent("outreach_content").run({"ranked_leads": _ranked(10), "batch_size": 4})
+    assert len(model.prompts) == 3  # ceil(10 / 4) requests instead of 10
+    subjects = [m["subject"] for m in out["messages"]]
+    assert subjects[0] == "Hello Co0" and subjects[3] == "Hello Co3" and subjects[4] == "Hello Co4"
+    assert all("Analytos.ai" in subjects[i] for i in (1, 2, 5, 6, 9))
+    again = oc.OutreachContentAgent("outreach_content").run({"ranked_leads": _ranked(10), "batch_size": 4})
+    # cached leads are not asked for again: the rerun's first request carries only Co1 and Co2
+    assert len(model.prompts) == 6 and '"Co0"' not in model.prompts[3] and '"Co2"' in model.prompts[3]
+    assert again["messages"][0] == out["messages"][0]
+
+def _scored(scores):
+    return [{"lead": {"company": f"Co{i}", "contact": f"Pat {i}", "domain": f"co{i}.com"}, "score": s}
+            for i, s in enumerate(scores)]
+
+def test_routing_sends_tiers_to_full_short_and_template(monkeypatch):
+    model = FakeGeminiModel()
+    monkeypatch.setattr(oc.OutreachContentAgent, "_load_model", lambda self, name: model)
+    out = oc.OutreachContentAgent("outreach_content").run(
+        {"ranked_leads": _scored([0.9, 0.8, 0.5, 0.4, 0.1]), "routing": True, "cache": False})
+    tiers = out["routing"]["tiers"]
+    assert (tiers["high"]["full"], tiers["mid"]["short"], tiers["low"]["template"]) == (2, 2, 1)
+    assert next(model._calls) == 5  # 4 LLM calls; the low tier never reaches the model
+    assert "Analytos.ai" in out["messages"][4]["subject"] and out["messages"][2]["subject"] == "Quick idea for Co2"
+    assert tiers["high"]["tokens"] > tiers["mid"]["tokens"] / 2 > 0 and tiers["low"]["tokens"] == 0
+    assert tiers["high"]["latency_p95_ms"] is not None
+
+def test_routing_downgrades_when_budget_or_deadline_runs_out(monkeypatch):
+    monkeypatch.setattr(oc.OutreachContentAgent, "_load_model", lambda self, name: FakeGeminiModel())
+    full_cost = oc.estimate_tokens(oc.build_prompt(_scored([1])[0]["lead"], "friendly", "SDR")) + oc.OUTPUT_TOKENS["full"]
+    out = oc.OutreachContentAgent("outreach_content").run(
+        {"ranked_leads": _scored([0.9] * 6), "routing": {"token_budget": full_cost * 2}, "concurrency": 1, "cache": False})
+    rs = out["routing"]
+    high = rs["tiers"]["high"]
+    # reservations cover the worst-case output, so only a few full emails fit before downgrades
+    assert 1 <= high["full"] < 6 and high["short"] + high["template"] == 6 - high["full"] and high["downgraded"] >= 1
+    assert rs["tokens_used"] <= rs["token_budget"]
+    late = oc.OutreachContentAgent("outreach_content").run(
+        {"ranked_leads": _scored([0.9] * 3), "routing": {"deadline_s": 0}, "cache": False})
+    assert late["routing"]["tiers"]["high"]["template"] == 3 and late["routing"]["tokens_used"] == 0
+
+def test_routing_cache_hits_do_not_spend_budget(monkeypatch):
+    model = FakeGeminiModel()
+    monkeypatch.setattr(oc.OutreachContentAgent, "_load_model", lambda self, name: model)
+    warnings = []
+    monkeypatch.setattr(agents.base, "log_event", lambda node, kind, payload: warnings.append(payload) if kind == "warning" else None)
+    payload = {"ranked_leads": _scored([0.9] * 4), "routing": True}
+    oc.OutreachContentAgent("outreach_content").run(payload)
+    again = oc.OutreachContentAgent("outreach_content").run({**payload, "routing": {"token_budget": 1}, "batch_size": 4})
+    high = again["routing"]["tiers"]["high"]
+    assert (high["full"], high["cached"], high["downgraded"], again["routing"]["tokens_used"]) == (4, 4, 0, 0)
+    assert next(model._calls) == 5  # only the first run reached the model
+    assert any("batch_size is ignored" in w["msg"] for w in warnings)
@@ -0,0 +1,78 @@
+import threading, time
+import pytest
+import agents.base
+from agents.outreach_executor import BatchSender, OutreachExecutorAgent
+from utils.cache import DiskCache
+
+class CountingSendGrid:
+    BATCH_SIZE = 10
+    def __init__(self, latency=0.0, fail_to=()):
+        self.batches, self.in_flight, self.peak = [], 0, 0
+        self.latency, self.fail_to = latency, set(fail_to)
+        self._lock = threading.Lock()
+    def send_batch(self, messages):
+        with self._lock:
+            self.batches.append(len(messages))
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return [{"status": "failed", "id": None, "error": "bounced"} if m["to"] in self.fail_to
+                else {"status": "sent", "id": f"id-{m['to']}"} for m in messages]
+
+def _messages(n):
+    return [{"lead": f"P{i}", "to": f"p{i}@co.com", "subject": "Hi", "email_body": "..."} for i in range(n)]
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    monkeypatch.setattr(agents.base, "log_event", lambda *a, **k: None)
+
+def test_batches_are_capped_in_flight_and_keep_order():
+    client = CountingSendGrid(latency=0.05, fail_to={"p7@co.com"})
+    sender = BatchSender(client, batch_size=10, max_in_flight=3)
+    out = sender.send("cmp-1", _messages(95))
+    assert client.batches == [10] * 9 + [5] and client.peak == 3
+    assert [r["lead"] for r in out] == [f"P{i}" for i in range(95)]
+    assert out[7]["status"] == "failed" and out[8] == {**out[8], "status": "sent", "message_id": "id-p8@co.com"}
+    assert sender.stats()["sent"] == 94 and sender.stats()["failed"] == 1
+
+def test_resend_is_a_noop_per_idempotency_key(tmp_path):
+    ledger = DiskCache(tmp_path / "ledger.sqlite", ttl=None, max_entries=None)
+    first = BatchSender(CountingSendGrid(fail_to={"p2@co.com"}), ledger).send("cmp-1", _messages(5) + _messages(1))
+    assert [r["status"] for r in first] == ["sent", "sent", "failed", "sent", "sent", "skipped"]
+    client = CountingSendGrid()
+    again = BatchSender(client, ledger).send("cmp-1", _messages(5))
+    assert [r["status"] for r in again] == ["skipped", "skipped", "sent", "skipped", "skipped"]
+    assert client.batches == [1] and again[0]["message_id"] == "id-p0@co.com"
+    assert BatchSender(CountingSendGrid(), ledger).send("cmp-2", _messages(1))[0]["status"] == "sent"
+
+def test_agent_reports_campaign_and_throughput(tmp_path):
+    out = OutreachExecutorAgent("send").run({"messages": _messages(30), "campaign_id": "cmp-x", "batch_size": 8})
+    assert out["campaign_id"] == "cmp-x" and out["send_stats"]["batches"] == 4
+    assert {r["status"] for r in out["sent_status"]} == {"sent"}
+    rerun = OutreachExecutorAgent("send").run({"messages": _messages(30), "campaign_id": "cmp-x"})
+    assert rerun["send_stats"]["skipped"] == 0 and rerun["send_stats"]["sent"] == 30  # mock sends aren't ledgered
+    assert not (tmp_path / "send_ledger.sqlite").exists()
+
+def test_generated_messages_are_sent_to_the_lead_email(monkeypatch):
+    import agents.outreach_content as oc
+    import agents.outreach_executor as oe
+    from tools.clients import FakeGeminiModel
+    monkeypatch.setattr(oc.OutreachContentAgent, "_load_model", lambda self, name: FakeGeminiModel())
+    client = CountingSendGrid()
+    monkeypatch.setattr(oe, "is_mock", lambda: False)
+    monkeypatch.setattr(oe, "SendGridClient", lambda: client)
+    leads = [{"company": "Acme", "contact": "Ann", "domain": "acme.com", "email": "ann@acme.com"},
+             {"company": "Acme", "contact": "Bob", "domain": "acme.com", "email": "Bob@Acme.com"},
+             {"company": "Beta", "contact": "Cy", "domain": "beta.io"}]
+    content = oc.OutreachContentAgent("outreach_content").run(
+        {"ranked_leads": [{"lead": L, "score": 0.5} for L in leads], "cache": False})
+    assert [m["to"] for m in content["messages"]] == ["ann@acme.com", "Bob@Acme.com", None]
+    out = OutreachExecutorAgent("send").run({"messages": content["messages"], "campaign_id": "cmp-e2e"})
+    assert [r["status"] for r in out["sent_status"]] == ["sent", "sent", "failed"]
+    assert out["sent_status"][2]["error"] == "no recipient address"
+    # same-domain leads keep distinct keys; the key follows the address, not the display name
+    keys = [r["idempotency_key"] for r in out["sent_status"][:2]]
+    assert keys[0] != keys[1]
+    assert keys[1] == oe.idempotency_key("cmp-e2e", {"to": "bob@acme.com", "lead": "someone else"})
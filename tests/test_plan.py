@@ -0,0 +1,35 @@
+import langgraph_builder as lgb
+
+WF = {
+    "config": {"crit": {"preferred_tech": ["dbt"]}},
+    "steps": [
+        {"id": "search", "agent": "ProspectSearchAgent", "inputs": {"icp": {"industry": "SaaS"}}},
+        {"id": "score", "agent": "ScoringAgent", "inputs": {
+            "enriched_leads": "{{search.output.leads}}",
+            "scoring_criteria": "{{config.crit}}",
+            "note": "got {{steps.search.count}} from {{search.output.source}}",
+            "missing": "{{config.nope}}",
+        }},
+    ],
+}
+
+def test_static_inputs_are_not_copied():
+    plan = lgb.compile_workflow(WF)
+    search = plan.steps[0]
+    assert lgb.resolve_inputs(search.inputs, plan.new_context()) is WF["steps"][0]["inputs"]
+
+def test_refs_resolve_zero_copy():
+    plan = lgb.compile_workflow(WF)
+    ctx = plan.new_context()
+    leads = [{"company": "AcmeSoft"}]
+    ctx["steps"]["search"] = {"leads": leads, "count": 1, "source": "apollo"}
+    out = lgb.resolve_inputs(plan.steps[1].inputs, ctx)
+    assert out["enriched_leads"] is leads
+    assert out["scoring_criteria"] is WF["config"]["crit"]
+    assert out["note"] == "got 1 from apollo"
+    assert out["missing"] == "{{config.nope}}"
+    assert plan.dag == {"search": set(), "score": {"search"}}
+
+def test_dry_run_reports_unresolved():
+    problems = lgb.compile_workflow(WF).unresolved()
+    assert problems == ["score: unresolved reference {{config.nope}}"]
@@ -0,0 +1,38 @@
+import pytest
+import tracemalloc
+import langgraph_builder as lgb
+from agents.base import BaseAgent
+
+class ListAgent(BaseAgent):
+    def run(self, payload):
+        if payload.get("fail"):
+            raise RuntimeError("boom")
+        return {"items": [{"i": i} for i in range(payload.get("n", 0))]}
+
+@pytest.fixture(autouse=True)
+def list_agent(monkeypatch):
+    monkeypatch.setitem(lgb.AGENT_MAP, "List", "unused:List")
+    monkeypatch.setattr(lgb, "dimport", lambda path: ListAgent)
+    monkeypatch.setattr(lgb, "log_event", lambda *a, **k: None)
+    monkeypatch.setattr("agents.base.log_event", lambda *a, **k: None)
+
+WF = {"steps": [{"id": "a", "agent": "List", "inputs": {"n": 1000}},
+                {"id": "b", "agent": "List", "inputs": {"n": 10, "up": "{{a.output.items}}"}}]}
+
+def test_profile_records_per_step_stats():
+    ctx = lgb.run_workflow(WF, profile=True)
+    a, b = ctx["profile"]
+    assert (a["node"], a["items_out"], b["items_in"]) == ("a", 1000, 1000)
+    assert a["wall_s"] > 0 and a["mem_peak_mb"] > 0 and a["items_per_sec"] > 0
+    assert ctx["profile_run"]["mem_peak_mb"] >= a["mem_peak_mb"]
+
+def test_parallel_profile_reports_memory_and_calls_run_wide():
+    ctx = lgb.run_workflow(WF, max_parallel=2, profile=True)
+    a, _ = ctx["profile"]
+    assert a["wall_s"] > 0 and a["mem_peak_mb"] is None and a["client_calls"] is None
+    assert ctx["profile_run"]["mem_peak_mb"] > 0
+
+def test_failing_step_stops_tracing():
+    with pytest.raises(RuntimeError):
+        lgb.run_workflow({"steps": [{"id": "a", "agent": "List", "inputs": {"fail": True}}]}, profile=True)
+    assert not tracemalloc.is_tracing()
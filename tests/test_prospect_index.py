@@ -0,0 +1,43 @@
+import agents.base
+from agents.prospect_search import ProspectSearchAgent
+from tests.test_prospect_search import StubClient
+from utils.prospect_index import ProspectIndex, normalize_company, normalize_email, prospect_key
+
+def test_keys_are_normalized():
+    assert normalize_company("Acme Soft, Inc.") == normalize_company("acme  soft") == "acme soft"
+    assert normalize_email(" Jane.Doe+promo@GMail.com ") == "janedoe@gmail.com"
+    assert prospect_key({"company": "Acme Inc", "email": "A@acme.com"}) == prospect_key({"company": "ACME", "email": "a@acme.com"})
+
+def test_index_survives_reopen_and_sees_other_writers(tmp_path):
+    path = tmp_path / "seen.sqlite"
+    idx = ProspectIndex(path, capacity=1000)
+    idx.add([f"co|{i}@x.com" for i in range(300)])
+    idx.close()
+    other = ProspectIndex(path, capacity=1000)
+    reopened = ProspectIndex(path, capacity=1000)   # loads the saved filter
+    other.add(["late|1@y.com"])                      # written after `reopened` was opened
+    found = reopened.seen(["co|5@x.com", "late|1@y.com", "new|1@z.com"])
+    assert found == {"co|5@x.com", "late|1@y.com"}
+    assert reopened.seen([f"fresh|{i}" for i in range(2000)]) == set()
+    assert reopened.stats()["false_positive"] < 100
+
+def test_search_skips_prospects_contacted_by_earlier_runs(monkeypatch):
+    import agents.outreach_executor as oe
+    from tests.test_outreach_executor import CountingSendGrid
+    monkeypatch.setattr(agents.base, "log_event", lambda *a, **k: None)
+    search = lambda n, **kw: ProspectSearchAgent("search", clients=[StubClient("a", n)]).run(
+        {"_limit": 20, "page_size": 10, "skip_seen": True, **kw})["leads"]
+    first = search(3)
+    assert search(3) == first  # searching alone marks nothing as handled
+
+    # A live send records the delivered prospects, except the bounced one
+    monkeypatch.setattr(oe, "is_mock", lambda: False)
+    monkeypatch.setattr(oe, "SendGridClient", lambda: CountingSendGrid(fail_to={first[0]["email"]}))
+    messages = [{"lead": l["company"], "to": l["email"], "prospect_key": prospect_key(l)} for l in first]
+    out = oe.OutreachExecutorAgent("send").run({"messages": messages})
+    assert out["send_stats"]["contacted_indexed"] == 19
+
+    again = search(6)
+    assert len(again) == 20 and again[0] == first[0]
+    assert not {l["email"] for l in first[1:]} & {l["email"] for l in again}
+    assert search(3, skip_seen=False) == first
@@ -0,0 +1,53 @@
+import threading, time
+import pytest
+import agents.base
+from agents.prospect_search import ProspectSearchAgent
+
+class InFlight:
+    """Counts page fetches in progress across sources and remembers the peak."""
+    def __init__(self):
+        self.n = self.peak = 0
+        self._lock = threading.Lock()
+    def __enter__(self):
+        with self._lock:
+            self.n += 1
+            self.peak = max(self.peak, self.n)
+    def __exit__(self, *exc):
+        with self._lock:
+            self.n -= 1
+
+class StubClient:
+    def __init__(self, prefix, n_pages, delay=0.0, overlap=0, in_flight=None):
+        self.prefix, self.n_pages, self.delay, self.overlap = prefix, n_pages, delay, overlap
+        self.in_flight = in_flight or InFlight()
+        self.fetched = 0
+    def search_pages(self, query, per_page=100):
+        for p in range(self.n_pages):
+            with self.in_flight:
+                time.sleep(self.delay)
+            self.fetched += 1
+            page = []
+            for i in range(per_page):
+                n = p * per_page + i
+                who = "shared" if n < self.overlap else self.prefix
+                page.append({"company": f"{who}-co{n}", "email": f"{n}@{who}.com"})
+            yield page
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    monkeypatch.setattr(agents.base, "log_event", lambda *a, **k: None)
+
+def test_sources_are_queried_concurrently():
+    in_flight = InFlight()
+    a, c = StubClient("a", 4, delay=0.05, in_flight=in_flight), StubClient("c", 4, delay=0.05, in_flight=in_flight)
+    out = ProspectSearchAgent("search", clients=[a, c]).run({"_limit": 1000, "page_size": 5})
+    assert in_flight.peak == 2  # both sources had a page fetch in progress at once
+    assert len(out["leads"]) == 40
+
+def test_dedupe_and_early_stop():
+    a, c = StubClient("a", 100, overlap=10), StubClient("c", 100, overlap=10)
+    out = ProspectSearchAgent("search", clients=[a, c]).run({"_limit": 25, "page_size": 10})
+    keys = [(l["company"], l["email"]) for l in out["leads"]]
+    assert len(keys) == len(set(keys)) == 25
+    time.sleep(0.3)
+    assert a.fetched + c.fetched < 20  # far fewer than the 200 pages available
@@ -0,0 +1,104 @@
+import json, queue, threading
+import requests
+import agents.base
+from agents.response_tracker import ResponseTrackerAgent
+from tools.events import consume_queue, replay, start_webhook_server, synthetic_events, tail_file
+from utils.runstore import RunStore, get_store
+
+def _sent(n, campaign="cmp-e"):
+    return [{"lead": f"P{i}", "status": "sent", "message_id": f"{campaign}-{i}", "segment": {"signal": "new_cto"}} for i in range(n)]
+
+def test_events_update_index_and_totals_once(tmp_path):
+    store = RunStore(tmp_path / "runs.sqlite")
+    assert store.register_messages("r1", "cmp-e", _sent(3)) == 3
+    assert store.register_messages("r2", "cmp-e", _sent(3)) == 0  # resumed run: already indexed
+    res = store.apply_events([{"event": "open", "message_id": "cmp-e-0"}, {"event": "open", "message_id": "cmp-e-0"},
+                              {"event": "reply", "campaign_id": "cmp-e", "lead": "P2"}, {"event": "open", "message_id": "nope"}])
+    assert res == {"applied": 2, "duplicate": 1, "unknown": 1}
+    assert store.campaign_totals("cmp-e") == {"sent": 3, "opened": 1, "clicked": 0, "replied": 1, "booked_meeting": 0, "events": 3}
+    states = store.message_states(["cmp-e-2", "cmp-e-0"])
+    assert states[0]["replied"] and states[1]["opened"] and states[0]["segment"] == {"signal": "new_cto"}
+
+def test_sendgrid_events_match_by_idempotency_key_or_sg_message_id(tmp_path):
+    store = RunStore(tmp_path / "runs.sqlite")
+    sent = [{"lead": f"P{i}", "status": "sent", "message_id": f"x{i // 2}", "idempotency_key": f"k{i}"} for i in range(4)]
+    assert store.register_messages("r1", "cmp-s", sent) == 4  # a template batch shares one X-Message-Id
+    res = store.apply_events([
+        {"event": "open", "sg_message_id": "x0.filter0001.1.0", "idempotency_key": "k0"},
+        {"event": "click", "sg_message_id": "x0.filter0001.2.0", "custom_args": {"idempotency_key": "k1"}},
+        {"event": "open", "sg_message_id": "x1.filter0002.3.0"},
+        {"event": "open", "message_id": "x9"},
+    ])
+    assert res == {"applied": 3, "duplicate": 0, "unknown": 1}
+    states = store.message_states(["k0", "k1", "k2", "k3"])
+    assert [(s["opened"], s["clicked"]) for s in states] == [(True, False), (False, True), (False, False), (True, False)]
+    assert states[0]["message_id"] == "x0"
+
+def test_older_stores_gain_the_provider_id_column(tmp_path):
+    import sqlite3
+    path = tmp_path / "old.sqlite"
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE messages (message_id TEXT PRIMARY KEY, campaign_id TEXT NOT NULL, run_id TEXT, lead TEXT,"
+               " segment TEXT, sent_at REAL, opened INTEGER NOT NULL DEFAULT 0, clicked INTEGER NOT NULL DEFAULT 0,"
+               " replied INTEGER NOT NULL DEFAULT 0, booked_meeting INTEGER NOT NULL DEFAULT 0, updated_at REAL)")
+    db.commit(); db.close()
+    store = RunStore(path)
+    store.register_messages("r1", "cmp-o", [{"lead": "P0", "message_id": "sg-1", "idempotency_key": "k0"}])
+    assert store.apply_events([{"event": "open", "sg_message_id": "sg-1.f"}])["applied"] == 1
+
+def test_file_tail_reads_only_new_lines(tmp_path):
+    store = RunStore(tmp_path / "runs.sqlite")
+    store.register_messages("r1", "cmp-e", _sent(5))
+    path = tmp_path / "events.jsonl"
+    ids = [s["message_id"] for s in _sent(5)]
+    replay(synthetic_events(ids, seed=1), f"file:{path}")
+    first = tail_file(path, store)
+    assert tail_file(path, store) == {"applied": 0, "duplicate": 0, "unknown": 0, "invalid": 0}
+    with open(path, "a") as f:
+        f.write(json.dumps({"event": "meeting", "message_id": "cmp-e-4"}) + "\n" + '{"event": "op')  # partial line
+    assert tail_file(path, store)["applied"] + first["applied"] == sum(store.campaign_totals("cmp-e")[k] for k in ("opened", "clicked", "replied", "booked_meeting"))
+
+def test_file_tail_follows_truncation_and_rotation(tmp_path):
+    store = RunStore(tmp_path / "runs.sqlite")
+    store.register_messages("r1", "cmp-e", _sent(3))
+    path = tmp_path / "events.jsonl"
+    ev = lambda kind, i: json.dumps({"event": kind, "message_id": f"cmp-e-{i}"}) + "\n"
+    path.write_text(ev("open", 0) + ev("open", 1) + ev("click", 1))
+    assert tail_file(path, store)["applied"] == 3
+    path.write_text(ev("open", 2))  # truncated in place: shorter than the stored offset
+    assert tail_file(path, store)["applied"] == 1
+    path.rename(tmp_path / "events.jsonl.1")
+    path.write_text(ev("reply", 0) + ev("reply", 1) + ev("reply", 2) + ev("click", 0))  # rotated: new, longer file
+    assert tail_file(path, store)["applied"] == 4
+
+def test_file_tail_skips_malformed_lines(tmp_path):
+    store = RunStore(tmp_path / "runs.sqlite")
+    store.register_messages("r1", "cmp-e", _sent(2))
+    path = tmp_path / "events.jsonl"
+    path.write_text('{"event": "open", "message_id": "cmp-e-0"}\n{not json\n[1, 2]\n{"event": "open", "message_id": "cmp-e-1"}\n')
+    assert tail_file(path, store) == {"applied": 2, "duplicate": 0, "unknown": 0, "invalid": 2}
+    assert tail_file(path, store)["invalid"] == 0  # the offset moved past the bad lines
+
+def test_queue_and_webhook_sources(tmp_path):
+    store_path = str(tmp_path / "hook.sqlite")
+    get_store(store_path).register_messages("r1", "cmp-h", _sent(4, "cmp-h"))
+    server, url = start_webhook_server(store_path=store_path)
+    try:
+        out = replay([{"event": "open", "message_id": f"cmp-h-{i}"} for i in range(4)], url, batch_size=3)
+        assert out["events"] == 4 and out["applied"] == 4
+        assert requests.get(f"{url}/campaigns/cmp-h").json()["opened"] == 4
+        assert requests.post(f"{url}/events", json=[1, "open"]).status_code == 400
+    finally:
+        server.shutdown()
+    q = queue.Queue()
+    t = threading.Thread(target=lambda: [q.put({"event": "click", "message_id": f"cmp-h-{i}"}) for i in range(4)] + [q.put(None)])
+    t.start()
+    assert consume_queue(q, get_store(store_path), batch_size=2)["applied"] == 4
+
+def test_agent_events_mode(tmp_path, monkeypatch):
+    monkeypatch.setattr(agents.base, "log_event", lambda *a, **k: None)
+    sent = _sent(3)
+    out = ResponseTrackerAgent("track").run({"mode": "events", "campaign_id": "cmp-e", "sent_status": sent,
+                                             "events": [{"event": "click", "message_id": "cmp-e-1"}]})
+    assert [r["clicked"] for r in out["responses"]] == [False, True, False]
+    assert out["campaign_totals"]["sent"] == 3 and out["campaign_totals"]["clicked"] == 1
@@ -0,0 +1,35 @@
+from agents.feedback_trainer import FeedbackTrainerAgent
+from agents.response_tracker import ResponseTrackerAgent
+from utils import logger
+from utils.runstore import RunStore, get_store
+
+def test_metrics_history_returns_last_runs_per_campaign(tmp_path):
+    store = RunStore(tmp_path / "runs.sqlite")
+    for i in range(5):
+        store.record_metrics(f"run-{i}", "cmp-a", "feedback", {"open_rate": i / 10, "reply_rate": 0.01})
+    store.record_metrics("run-x", "cmp-b", "feedback", {"open_rate": 0.9})
+    history = store.metrics_history("cmp-a", last_runs=3)
+    assert [h["run_id"] for h in history] == ["run-2", "run-3", "run-4"]
+    assert history[-1]["metrics"] == {"open_rate": 0.4, "reply_rate": 0.01}
+    assert store.campaigns() == ["cmp-a", "cmp-b"]
+    store.close()
+    ro = RunStore(tmp_path / "runs.sqlite", readonly=True)
+    assert ro.recent_runs("cmp-b") == ["run-x"]
+
+def test_agents_write_to_the_store(monkeypatch):
+    monkeypatch.setattr(logger, "RUN_ID", "run-1")
+    monkeypatch.setattr("agents.base.log_event", lambda *a, **k: None)
+    sent = [{"lead": f"p{i}", "status": "sent"} for i in range(20)]
+    responses = ResponseTrackerAgent("track").run({"sent_status": sent, "campaign_id": "cmp-q"})["responses"]
+    out = FeedbackTrainerAgent("feedback").run({"responses": responses, "campaign_id": "cmp-q"})
+    store = get_store()
+    assert store.response_totals("cmp-q", "run-1")["responses"] == 20
+    assert store.response_totals("cmp-q")["opened"] == sum(r["opened"] for r in responses)
+    assert store.metrics_history("cmp-q")[0]["metrics"] == out["metrics"]
+    assert store.latest_event("cmp-q", "recommendations") == out["recommendations"]
+
+def test_default_path_ignores_per_campaign_run_dir(monkeypatch, tmp_path):
+    from utils import logger, runstore
+    monkeypatch.delenv("RUN_STORE_PATH")
+    monkeypatch.setattr(logger, "RUN_DIR", tmp_path / "campaigns" / "icp_a")
+    assert runstore.default_path() == runstore.DEFAULT_STORE_PATH
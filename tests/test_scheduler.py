@@ -0,0 +1,53 @@
+import threading, time
+import pytest
+import langgraph_builder as lgb
+
+class SleepAgent:
+    # Class-level in-flight counter: the peak shows how many steps ran at once
+    running, peak, lock = 0, 0, threading.Lock()
+    def __init__(self, node_id, instructions=None, tools=None):
+        self.id = node_id
+    def run(self, payload):
+        with SleepAgent.lock:
+            SleepAgent.running += 1
+            SleepAgent.peak = max(SleepAgent.peak, SleepAgent.running)
+        time.sleep(payload.get("sleep", 0))
+        with SleepAgent.lock:
+            SleepAgent.running -= 1
+        return {"value": self.id, "seen": payload.get("upstream")}
+
+def _wf(sleep=0.05):
+    return {"steps": [
+        {"id": "a", "agent": "Sleep", "inputs": {"sleep": sleep}},
+        {"id": "b", "agent": "Sleep", "inputs": {"sleep": sleep, "upstream": "{{a.output.value}}"}},
+        {"id": "c", "agent": "Sleep", "inputs": {"sleep": sleep, "upstream": "{{steps.a.value}}"}},
+        {"id": "d", "agent": "Sleep", "inputs": {"upstream": ["{{b.output.value}}", "{{c.output.value}}"]}},
+    ]}
+
+@pytest.fixture(autouse=True)
+def sleep_agent(monkeypatch):
+    monkeypatch.setattr(lgb, "log_event", lambda *a, **k: None)
+    monkeypatch.setitem(lgb.AGENT_MAP, "Sleep", "unused:Sleep")
+    monkeypatch.setattr(lgb, "dimport", lambda path: SleepAgent)
+    SleepAgent.running = SleepAgent.peak = 0
+
+def test_dependencies_from_refs():
+    dag = lgb.build_dag(_wf()["steps"])
+    assert dag == {"a": set(), "b": {"a"}, "c": {"a"}, "d": {"b", "c"}}
+
+def test_cycle_rejected():
+    steps = [
+        {"id": "x", "agent": "Sleep", "inputs": {"v": "{{y.output}}"}},
+        {"id": "y", "agent": "Sleep", "inputs": {"v": "{{x.output}}"}},
+    ]
+    with pytest.raises(ValueError):
+        lgb.build_dag(steps)
+
+def test_parallel_runs_critical_path():
+    ctx = lgb.run_workflow(_wf(), max_parallel=4)
+    assert ctx["steps"]["b"]["seen"] == "a"
+    assert ctx["steps"]["d"]["seen"] == ["b", "c"]
+    assert SleepAgent.peak == 2  # a -> (b || c) -> d: only b and c overlap
+    SleepAgent.peak = 0
+    lgb.run_workflow(_wf(), max_parallel=1)
+    assert SleepAgent.peak == 1
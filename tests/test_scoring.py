@@ -0,0 +1,21 @@
+import random
+from agents.scoring import BatchScorer, rank_leads, score_lead
+
+def _leads(n, seed=3):
+    rng = random.Random(seed)
+    techs = ["HubSpot", "Salesforce", "Snowflake", "dbt", "Mixpanel", "Marketo"]
+    roles = ["VP Sales", "CTO", "SVP Growth", "COO", ""]
+    return [{"role": rng.choice(roles), "technologies": rng.sample(techs, rng.randint(0, 4)),
+             "signal": rng.choice(["recent_funding", "hiring_for_sales", "new_cto", ""])} for _ in range(n)]
+
+CRITERIA = {"preferred_tech": ["HubSpot", "Salesforce", "dbt"], "avoid_tech": ["Mixpanel", "Marketo"]}
+
+def test_batch_scores_match_score_lead_exactly():
+    leads = _leads(2000)
+    assert BatchScorer(CRITERIA).score_all(leads) == [score_lead(L, CRITERIA) for L in leads]
+
+def test_top_k_matches_full_sort():
+    leads = _leads(500)
+    full = rank_leads(leads, CRITERIA)
+    assert rank_leads(leads, CRITERIA, top_k=25) == full[:25]
+    assert [x["score"] for x in full] == sorted((x["score"] for x in full), reverse=True)
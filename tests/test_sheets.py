@@ -0,0 +1,59 @@
+import time
+from tools.clients import GoogleSheetsClient
+from tools.sheets import FileSheet, SheetsWriteBuffer
+
+def test_buffer_coalesces_and_flushes_by_size_and_interval(tmp_path):
+    sheet = FileSheet(tmp_path / "sheet.csv")
+    buf = SheetsWriteBuffer(sheet.append_rows, max_rows=10, interval=60)
+    for i in range(4):
+        buf.append([["run", i, "a"], ["run", i, "b"]])
+    assert sheet.appends == 0
+    buf.append([["run", 4, "a"], ["run", 4, "b"]])  # 10 rows pending -> size flush
+    deadline = time.time() + 2
+    while sheet.appends == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert sheet.appends == 1 and len(sheet.read()) == 10
+    buf.interval = 0.05
+    buf.append([["late", 0, "x"]])
+    buf._wake.set()  # restart the wait with the shorter interval
+    deadline = time.time() + 2
+    while sheet.appends < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert sheet.read()[-1] == ["late", "0", "x"]
+    buf.close()
+
+def test_failed_append_keeps_rows():
+    calls = []
+    def flaky(rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise RuntimeError("quota")
+    buf = SheetsWriteBuffer(flaky, max_rows=1000, interval=60)
+    buf.append([["a"]])
+    buf.flush()
+    buf.append([["b"]])
+    buf.flush()
+    assert calls == [1, 2] and buf.stats()["errors"] == 1 and buf.stats()["pending"] == 0
+
+def test_failing_sheet_backs_off_then_drops_rows(monkeypatch):
+    import tools.sheets as sheets
+    monkeypatch.setattr(sheets, "log_event", lambda *a, **k: None)
+    calls = []
+    def down(rows):
+        calls.append(len(rows))
+        raise RuntimeError("quota")
+    buf = SheetsWriteBuffer(down, max_rows=1000, interval=60, max_pending=5, max_retries=2, backoff=30)
+    buf.append([[i] for i in range(8)])
+    assert buf.stats()["dropped"] == 3 and buf.stats()["pending"] == 5
+    buf.flush()
+    assert buf._retry_at > time.monotonic() + 20  # the background loop waits out the backoff
+    buf.flush(); buf.flush()
+    assert calls == [5, 5, 5] and buf.stats() == {**buf.stats(), "pending": 0, "dropped": 8, "errors": 3}
+    buf.close()
+
+def test_clients_share_one_buffer_per_sheet(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHEETS_FILE", str(tmp_path / "recs.csv"))
+    for run in range(3):
+        GoogleSheetsClient().append_recommendations([["run", str(run)]])
+    GoogleSheetsClient().flush()
+    assert FileSheet(tmp_path / "recs.csv").read() == [["run", "0"], ["run", "1"], ["run", "2"]]
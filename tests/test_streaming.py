@@ -0,0 +1,24 @@
+import pytest
+import agents.base
+from agents.enrichment import DataEnrichmentAgent
+from agents.prospect_search import ProspectSearchAgent
+from agents.scoring import ScoringAgent, rank_leads, rank_stream
+from utils.stream import chunked, is_stream
+from tests.test_scoring import CRITERIA, _leads
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    monkeypatch.setattr(agents.base, "log_event", lambda *a, **k: None)
+
+def test_rank_stream_matches_rank_leads():
+    leads = _leads(3000)
+    assert rank_stream(chunked(leads, 128), CRITERIA, 50) == rank_leads(leads, CRITERIA, 50)
+
+def test_search_enrich_score_stream_end_to_end():
+    found = ProspectSearchAgent("search").run({"stream": True, "chunk_size": 4, "_limit": 10})["leads"]
+    assert is_stream(found)
+    enriched = DataEnrichmentAgent("enrich").run({"leads": found})["enriched_leads"]
+    assert is_stream(enriched)
+    ranked = ScoringAgent("score").run({"enriched_leads": enriched, "scoring_criteria": CRITERIA, "top_k": 3})
+    assert len(ranked["ranked_leads"]) <= 3
+    assert all(isinstance(x["score"], float) for x in ranked["ranked_leads"])
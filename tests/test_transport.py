@@ -0,0 +1,97 @@
+import asyncio, time
+import pytest
+from tools import transport
+from tools.stub_server import start_stub_server
+
+pytest.importorskip("requests")
+
+@pytest.fixture
+def stub():
+    servers = []
+    def make(**knobs):
+        server, url, state = start_stub_server(**knobs)
+        servers.append(server)
+        return url, state
+    yield make
+    for s in servers:
+        s.shutdown()
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    transport.METRICS.reset()
+    monkeypatch.setattr(transport, "_buckets", {})
+
+def test_retries_429_and_5xx_then_succeeds(stub):
+    url, state = stub(fail_first=2, fail_status=429)
+    t = transport.HTTPTransport("stubprov", url, backoff_base=0.01)
+    assert t.post("/v1/x", json={"a": 1})["echo"] == {"a": 1}
+    m = transport.METRICS.snapshot()["stubprov"]
+    assert (m["calls"], m["retries"], m["errors"]) == (3, 2, 2)
+
+def test_gives_up_after_max_retries(stub):
+    url, _ = stub(fail_first=10)
+    t = transport.HTTPTransport("stubprov", url, max_retries=2, backoff_base=0.0)
+    with pytest.raises(transport.TransportError) as e:
+        t.get("/down")
+    assert e.value.status == 503
+
+def test_provider_rate_limit(stub, monkeypatch):
+    monkeypatch.setitem(transport.PROVIDER_RATE_LIMITS, "slow", 20.0)
+    url, _ = stub()
+    t = transport.HTTPTransport("slow", url)
+    t0 = time.perf_counter()
+    for _ in range(30):
+        t.get("/x")
+    assert time.perf_counter() - t0 >= 0.4  # 20-token burst, then 20/s
+
+def test_async_fan_out_is_concurrent(stub):
+    url, _ = stub(latency=0.05)
+    aio = transport.AsyncHTTPTransport(transport.HTTPTransport("stubprov", url), max_in_flight=20)
+    t0 = time.perf_counter()
+    out = asyncio.run(aio.gather([("GET", f"/p{i}", {}) for i in range(40)]))
+    assert len(out) == 40 and time.perf_counter() - t0 < 1.0
+
+def test_clients_sharing_a_session_send_their_own_headers(monkeypatch):
+    from tools.clients import ApolloClient
+    sent = []
+    monkeypatch.setattr(transport.HTTPTransport, "request", lambda self, m, p, **kw: sent.append(kw["headers"]) or {})
+    a, b = ApolloClient(api_key="key-a"), ApolloClient(api_key="key-b")
+    a.http.get("/x"); b.http.get("/x"); a.http.get("/x")
+    assert a.http.transport is b.http.transport
+    assert [h["X-Api-Key"] for h in sent] == ["key-a", "key-b", "key-a"]
+    assert not transport.get_transport("apollo", a.base_url).session.headers.get("X-Api-Key")
+
+def test_sendgrid_returns_provider_message_ids(stub, monkeypatch):
+    from tools.clients import SendGridClient
+    url, state = stub()
+    monkeypatch.setenv("SENDGRID_BASE_URL", url)
+    monkeypatch.setenv("SENDGRID_API_KEY", "sg-key")
+    monkeypatch.setattr(transport, "_transports", {})
+    batch = [{"to": f"p{i}@co.com", "subject": "Hi", "body": "...", "idempotency_key": f"k{i}"} for i in range(3)]
+    out = SendGridClient().send_batch(batch)
+    assert {r["id"] for r in out} == {"stub-1", "stub-2", "stub-3"}
+    monkeypatch.setenv("SENDGRID_TEMPLATE_ID", "d-123")
+    assert [r["id"] for r in SendGridClient().send_batch(batch)] == ["stub-4"] * 3
+
+def test_metrics_keep_exact_counts_but_a_bounded_latency_window():
+    m = transport.TransportMetrics(window=10)
+    for i in range(100):
+        m.record("p", i / 1000, 500 if i % 10 == 0 else 200)
+    mark = m.mark()
+    for _ in range(3):
+        m.record("p", 0.5, 200)
+    assert len(m._calls["p"]["latencies"]) == 10
+    assert m.snapshot()["p"]["calls"] == 103 and m.snapshot()["p"]["errors"] == 10
+    since = m.snapshot(since=mark)["p"]
+    assert (since["calls"], since["errors"], since["p50_ms"]) == (3, 0, 500.0)
+
+def test_client_fan_out_works_inside_a_running_event_loop(stub, monkeypatch):
+    from tools.clients import SendGridClient
+    url, _ = stub()
+    monkeypatch.setenv("SENDGRID_BASE_URL", url)
+    monkeypatch.setenv("SENDGRID_API_KEY", "sg-key")
+    monkeypatch.setattr(transport, "_transports", {})
+    batch = [{"to": f"p{i}@co.com", "subject": "Hi", "body": "...", "idempotency_key": f"k{i}"} for i in range(3)]
+    async def handler():
+        return SendGridClient().send_batch(batch)
+    assert [r["status"] for r in asyncio.run(handler())] == ["sent"] * 3
@@ -0,0 +1,47 @@
+import json, threading, urllib.request
+import worker
+
+WF = {"steps": [
+    {"id": "search", "agent": "ProspectSearchAgent", "inputs": {"_limit": 5}},
+    {"id": "enrich", "agent": "DataEnrichmentAgent", "inputs": {"leads": "{{search.output.leads}}", "cache": False}},
+]}
+
+def test_worker_runs_submitted_workflows():
+    server = worker.serve(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        first = worker.submit(url, WF, no_checkpoint=True)
+        second = worker.submit(url, WF, no_checkpoint=True, run_id="seg-2")
+        assert len(first["final"]["enriched_leads"]) <= 5 and second["run_id"] == "seg-2"
+        health = json.loads(urllib.request.urlopen(f"{url}/health").read())
+        assert health["runs"] == 2
+    finally:
+        server.shutdown()
+
+class Boom:
+    def __init__(self, node_id, instructions=None, tools=None):
+        pass
+    def run(self, payload):
+        raise ValueError("bad lead row")
+
+def _status(url, body):
+    req = urllib.request.Request(f"{url}/run", data=json.dumps(body).encode(), method="POST")
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def test_worker_separates_bad_requests_from_run_failures(monkeypatch):
+    monkeypatch.setitem(worker.lgb.AGENT_MAP, "Boom", "tests.test_worker:Boom")
+    server = worker.serve(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        assert _status(url, {"steps": []}) == 400
+        assert _status(url, {"workflow": {"steps": [{"id": "x", "agent": "Nope"}]}}) == 400
+        assert _status(url, {"workflow": {"steps": [{"agent": "Boom"}]}}) == 400
+        assert _status(url, {"workflow": {"steps": [{"id": "x", "agent": "Boom"}]}, "no_checkpoint": True}) == 500
+    finally:
+        server.shutdown()
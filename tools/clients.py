@@ -1,11 +1,21 @@
 from __future__ import annotations
-import os, random
+import itertools, json, os, random, re, time
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
+from tools.sheets import FileSheet, get_buffer
+from tools.transport import AsyncHTTPTransport, BoundTransport, TransportError, get_transport, tracked
 
-load_dotenv()
+_env_loaded = False
+
+def load_env() -> None:
+    # .env is read on first use instead of at import, so importing clients stays cheap
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
 
 def is_mock() -> bool:
+    load_env()
     keys = ["APOLLO_API_KEY", "CLAY_API_KEY", "CLEARBIT_KEY", "SENDGRID_API_KEY", "OPENAI_API_KEY"]
     return not any(os.getenv(k) for k in keys)
 
@@ -28,24 +38,28 @@ def mock_leads(n=5) -> List[Dict[str, Any]]:
         })
     return out
 
+MOCK_ROLES = ["VP Sales", "Head of RevOps", "CTO", "Director of Demand Gen", "COO"]
+MOCK_STACKS = [["HubSpot","Salesforce"], ["Snowflake","dbt"], ["Segment","Marketo"], ["Amplitude","Mixpanel"]]
+
 def mock_enrich(leads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    roles = ["VP Sales", "Head of RevOps", "CTO", "Director of Demand Gen", "COO"]
-    stacks = [["HubSpot","Salesforce"], ["Snowflake","dbt"], ["Segment","Marketo"], ["Amplitude","Mixpanel"]]
     out = []
     for L in leads:
         out.append({
             "company": L["company"],
             "contact": L["contact_name"],
-            "role": random.choice(roles),
-            "technologies": random.choice(stacks),
-            "domain": f"{L['company'].replace(' ', '').lower()}.com"
+            "role": random.choice(MOCK_ROLES),
+            "technologies": random.choice(MOCK_STACKS),
+            "domain": f"{L['company'].replace(' ', '').lower()}.com",
+            **({"signal": L["signal"]} if "signal" in L else {}),
+            **({"email": L["email"]} if L.get("email") else {}),
         })
     return out
 
 def mock_send(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     res = []
     for i, m in enumerate(messages):
-        res.append({"lead": m.get("lead"), "status": "sent", "message_id": f"mock-{i}"})
+        res.append({"lead": m.get("lead"), "status": "sent", "message_id": f"mock-{i}",
+                    **({"segment": m["segment"]} if "segment" in m else {})})
     return res
 
 def mock_responses(sent_status: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -58,6 +72,7 @@ def mock_responses(sent_status: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             "clicked": random.random() < 0.3,
             "replied": random.random() < 0.15,
             "booked_meeting": random.random() < 0.05,
+            **({"segment": s["segment"]} if "segment" in s else {}),
         })
     return out
 
@@ -73,43 +88,236 @@ def mock_recos(metrics: Dict[str, float]) -> List[str]:
         recs.append("Scale volume 2x; current variant performing adequately.")
     return recs
 
-class ApolloClient:
+def mock_pages(total: int, per_page: int):
+    for start in range(0, total, per_page):
+        yield mock_leads(min(per_page, total - start))
+
+class HTTPClient:
+    """Base for provider clients: live calls go through the shared pooled transport."""
+    provider = ""
+    base_url = ""
+    base_url_env = ""
+    api_key: Optional[str] = None
+    _http: Optional[BoundTransport] = None
+    _auth: Optional[Dict[str, str]] = None
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+    def _request_headers(self) -> Dict[str, str]:
+        # Computed once per client; subclasses with expiring credentials override this
+        if self._auth is None:
+            self._auth = self._headers()
+        return self._auth
+    @property
+    def http(self) -> BoundTransport:
+        if self._http is None:
+            self._http = BoundTransport(get_transport(self.provider, os.getenv(self.base_url_env) or self.base_url),
+                                        self._request_headers)
+        return self._http
+
+def _not_found_ok(result: Any) -> Any:
+    # Unknown person/company is a normal answer for lookups; anything else is a real failure
+    if isinstance(result, TransportError) and result.status == 404:
+        return None
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+class ApolloClient(HTTPClient):
+    provider, base_url, base_url_env = "apollo", "https://api.apollo.io", "APOLLO_BASE_URL"
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.getenv("APOLLO_API_KEY")
+    def _headers(self) -> Dict[str, str]:
+        return {"X-Api-Key": self.api_key} if self.api_key else {}
+    @tracked
     def search(self, query: Dict[str, Any]) -> List[Dict[str, Any]]:
         if is_mock():
             return mock_leads(10)
-        raise NotImplementedError("Apollo live client not implemented in this scaffold.")
+        return [l for page in self.search_pages(query) for l in page]
+    @tracked
+    def search_pages(self, query: Dict[str, Any], per_page: int = 100):
+        if is_mock():
+            yield from mock_pages(10, per_page)
+            return
+        signal = (query.get("signals") or [""])[0]
+        page, total_pages = 1, 1
+        while page <= total_pages:
+            data = self.http.post("/v1/mixed_people/search", json={
+                "page": page, "per_page": per_page,
+                "q_keywords": " ".join(str(v) for v in query.get("icp", {}).values()),
+            })
+            total_pages = data.get("pagination", {}).get("total_pages", page)
+            yield [{
+                "company": (p.get("organization") or {}).get("name", ""),
+                "contact_name": p.get("name", ""),
+                "email": p.get("email") or "",
+                "linkedin": p.get("linkedin_url", ""),
+                "signal": signal,
+            } for p in data.get("people", [])]
+            page += 1
 
-class ClayClient:
+class ClayClient(HTTPClient):
+    # Clay has no generic search API: point CLAY_BASE_URL at a table/webhook endpoint that
+    # answers POST /search {"query", "page", "per_page"} with {"leads": [...], "has_more": bool}.
+    provider, base_url, base_url_env = "clay", "", "CLAY_BASE_URL"
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.getenv("CLAY_API_KEY")
+    @tracked
     def search(self, query: Dict[str, Any]) -> List[Dict[str, Any]]:
         if is_mock():
             return mock_leads(8)
-        raise NotImplementedError("Clay live client not implemented in this scaffold.")
+        return [l for page in self.search_pages(query) for l in page]
+    @tracked
+    def search_pages(self, query: Dict[str, Any], per_page: int = 100):
+        if is_mock():
+            yield from mock_pages(8, per_page)
+            return
+        if not os.getenv(self.base_url_env):
+            raise NotImplementedError("Clay live client needs CLAY_BASE_URL in this scaffold.")
+        page, more = 1, True
+        while more:
+            data = self.http.post("/search", json={"query": query, "page": page, "per_page": per_page})
+            more = bool(data.get("has_more"))
+            yield data.get("leads", [])
+            page += 1
 
-class ClearbitClient:
+class ClearbitClient(HTTPClient):
+    provider, base_url, base_url_env = "clearbit", "https://person.clearbit.com", "CLEARBIT_BASE_URL"
+    BULK_SIZE = 100
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.getenv("CLEARBIT_KEY")
+    @tracked
     def enrich(self, email: str) -> Dict[str, Any]:
         if is_mock():
             return {"role": "VP Sales", "technologies": ["Salesforce","Outreach"]}
-        raise NotImplementedError("Clearbit live client not implemented in this scaffold.")
+        data = self.http.get("/v2/combined/find", params={"email": email})
+        return {
+            "role": ((data.get("person") or {}).get("employment") or {}).get("title") or "",
+            "technologies": (data.get("company") or {}).get("tech", []),
+        }
+    @tracked
+    def enrich_people(self, emails: List[str]) -> Dict[str, Dict[str, Any]]:
+        # Bulk person lookup, at most BULK_SIZE emails per call
+        if is_mock():
+            return {e: {"role": random.choice(MOCK_ROLES)} for e in emails}
+        # Clearbit has no bulk endpoint: fan the batch out over the pooled session
+        found = [_not_found_ok(r) for r in AsyncHTTPTransport(self.http).gather_sync(
+            [("GET", "/v2/people/find", {"params": {"email": e}}) for e in emails], True)]
+        return {e: {"role": ((p or {}).get("employment") or {}).get("title") or ""} for e, p in zip(emails, found)}
+    @tracked
+    def enrich_companies(self, domains: List[str]) -> Dict[str, Dict[str, Any]]:
+        # Bulk company lookup, at most BULK_SIZE domains per call
+        if is_mock():
+            return {d: {"technologies": random.choice(MOCK_STACKS)} for d in domains}
+        base = os.getenv("CLEARBIT_COMPANY_BASE_URL") or "https://company.clearbit.com"
+        found = [_not_found_ok(r) for r in AsyncHTTPTransport(self.http).gather_sync(
+            [("GET", f"{base}/v2/companies/find", {"params": {"domain": d}}) for d in domains], True)]
+        return {d: {"technologies": (c or {}).get("tech", [])} for d, c in zip(domains, found)}
 
-class SendGridClient:
+class SendGridClient(HTTPClient):
+    provider, base_url, base_url_env = "sendgrid", "https://api.sendgrid.com", "SENDGRID_BASE_URL"
+    BATCH_SIZE = 1000  # personalizations per /v3/mail/send request
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.getenv("SENDGRID_API_KEY")
+    def _mail(self, personalizations: List[Dict[str, Any]], **extra) -> Dict[str, Any]:
+        return {"personalizations": personalizations,
+                "from": {"email": os.getenv("SENDGRID_FROM", "outreach@example.com")}, **extra}
+    @tracked
+    def send_batch(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # messages: [{to, subject, body, idempotency_key}], at most BATCH_SIZE; one status per message
+        if is_mock():
+            return [{"status": "sent", "id": f"sg-mock-{m['idempotency_key'][:12]}"} for m in messages]
+        template_id = os.getenv("SENDGRID_TEMPLATE_ID")
+        if template_id:
+            # One request for the whole batch: a dynamic template renders each personalization's subject/body.
+            # SendGrid returns one X-Message-Id per request; its events carry it as the sg_message_id prefix.
+            _, headers = self.http.post("/v3/mail/send", response_headers=True, json=self._mail([{
+                "to": [{"email": m["to"]}],
+                "dynamic_template_data": {"subject": m["subject"], "body": m["body"]},
+                "custom_args": {"idempotency_key": m["idempotency_key"]},
+            } for m in messages], template_id=template_id))
+            return [{"status": "sent", "id": headers.get("X-Message-Id")} for _ in messages]
+        # Without a template every email needs its own content: fan out over the pooled session
+        results = AsyncHTTPTransport(self.http).gather_sync([("POST", "/v3/mail/send", {"json": self._mail(
+            [{"to": [{"email": m["to"]}], "custom_args": {"idempotency_key": m["idempotency_key"]}}],
+            subject=m["subject"], content=[{"type": "text/plain", "value": m["body"]}],
+        ), "response_headers": True}) for m in messages], True)
+        return [{"status": "failed", "id": None, "error": str(r)} if isinstance(r, BaseException)
+                else {"status": "sent", "id": r[1].get("X-Message-Id")} for r in results]
+    @tracked
     def send_email(self, to_email: str, subject: str, body: str) -> Dict[str, Any]:
         if is_mock():
             return {"status": "sent", "id": f"sg-mock"}
-        raise NotImplementedError("SendGrid live client not implemented in this scaffold.")
+        self.http.post("/v3/mail/send", json={
+            "personalizations": [{"to": [{"email": to_email}]}],
+            "from": {"email": os.getenv("SENDGRID_FROM", "outreach@example.com")},
+            "subject": subject,
+            "content": [{"type": "text/plain", "value": body}],
+        })
+        return {"status": "sent", "id": None}
 
-class GoogleSheetsClient:
-    def __init__(self, sheet_id: Optional[str] = None):
+class GoogleSheetsClient(HTTPClient):
+    provider, base_url, base_url_env = "sheets", "https://sheets.googleapis.com", "SHEETS_BASE_URL"
+    def __init__(self, sheet_id: Optional[str] = None, buffered: bool = True):
         self.sheet_id = sheet_id or os.getenv("SHEET_ID")
+        self.buffered = buffered
+    _creds: Any = None
+    def _request_headers(self) -> Dict[str, str]:
+        # Service-account token is loaded once and refreshed only when it has expired
+        from google.auth.transport.requests import Request
+        if self._creds is None:
+            from google.oauth2 import service_account
+            self._creds = service_account.Credentials.from_service_account_file(
+                os.getenv("GOOGLE_SHEETS_SERVICE_ACCOUNT_JSON", "service_account.json"),
+                scopes=["https://www.googleapis.com/auth/spreadsheets"],
+            )
+        if not self._creds.valid:
+            self._creds.refresh(Request())
+        return {"Authorization": f"Bearer {self._creds.token}"}
     def append_recommendations(self, rows: List[List[str]]) -> None:
+        # Buffered by default: rows from every run in the process are coalesced into batched appends
+        if not self.buffered:
+            return self.append_rows(rows)
+        self._buffer().append(rows)
+    def flush(self) -> None:
+        self._buffer().flush()
+    def _buffer(self):
+        path = os.getenv("SHEETS_FILE")
+        if path:
+            return get_buffer(f"file:{path}", FileSheet(path).append_rows)
+        return get_buffer(f"sheet:{self.sheet_id}", self.append_rows)
+    @tracked
+    def append_rows(self, rows: List[List[str]]) -> None:
+        # One append round-trip
         if is_mock():
             print("[MOCK] Writing to sheet:", rows[:2], "...")
             return
-        raise NotImplementedError("Google Sheets live client not implemented in this scaffold.")
+        if not self.sheet_id:
+            raise NotImplementedError("Google Sheets live client needs SHEET_ID in this scaffold.")
+        self.http.post(
+            f"/v4/spreadsheets/{self.sheet_id}/values/A1:append",
+            params={"valueInputOption": "RAW", "insertDataOption": "INSERT_ROWS"},
+            json={"values": rows},
+        )
+
+class FakeGeminiModel:
+    """Offline stand-in for genai.GenerativeModel (select with model="fake")."""
+    def __init__(self, model_name: str = "fake", latency: float = 0.0, fail_every: int = 0):
+        self.model_name = model_name
+        self.latency = latency
+        self.fail_every = fail_every
+        self._calls = itertools.count(1)
+    def generate_content(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None):
+        n = next(self._calls)
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_every and n % self.fail_every == 0:
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+        if "LEADS_JSON:" in prompt:
+            leads = json.loads(prompt.split("LEADS_JSON:", 1)[1])
+            text = json.dumps([{"id": L["id"], "subject": f"Quick idea for {L['company']}",
+                                "body": f"Hi there, noticed {L['company']} is growing. Open to a 15-min chat?"} for L in leads])
+            return type("FakeResponse", (), {"text": text})()
+        m = re.search(r"^Company: (.*)$", prompt, re.M)
+        company = m.group(1) if m else "your team"
+        text = f"Subject: Quick idea for {company}\nBody: Hi there, noticed {company} is growing. Open to a 15-min chat?"
+        return type("FakeResponse", (), {"text": text})()
@@ -0,0 +1,218 @@
+from __future__ import annotations
+import argparse, json, os, pathlib, queue, random, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from utils.runstore import RunStore, get_store
+from utils.stream import chunked
+
+# Response events look like webhook payloads:
+#   {"event": "open" | "click" | "reply" | "meeting", "message_id": "...", "ts": 1700000000.0}
+# SendGrid's own events ({"event": "open", "sg_message_id": "...", "idempotency_key": "..."}) match too,
+# and when the provider only knows the recipient, {"event": ..., "campaign_id": "...", "lead": "..."}.
+
+def _add(total: Dict[str, int], res: Dict[str, int]) -> Dict[str, int]:
+    for k, v in res.items():
+        total[k] = total.get(k, 0) + v
+    return total
+
+def ingest(events: Iterable[Dict[str, Any]], store: Optional[RunStore] = None, batch_size: int = 1000) -> Dict[str, int]:
+    store = store or get_store()
+    total = {"applied": 0, "duplicate": 0, "unknown": 0}
+    for batch in chunked(events, batch_size):
+        _add(total, store.apply_events(batch))
+    return total
+
+def tail_file(path: str | pathlib.Path, store: Optional[RunStore] = None) -> Dict[str, int]:
+    """Ingest JSONL events appended to `path` since the last call (offset kept in the store).
+
+    The offset is stored per inode, so a rotated file (new inode) is read from the start,
+    and a file truncated below the stored offset is re-read from the start too. Lines that
+    are not a JSON object are counted as "invalid" and skipped, so one bad line can't stall the tail.
+    """
+    store = store or get_store()
+    path = pathlib.Path(path)
+    if not path.exists():
+        return {"applied": 0, "duplicate": 0, "unknown": 0, "invalid": 0}
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        source = f"file:{path.resolve()}@{st.st_ino}"
+        offset = store.get_offset(source)
+        if st.st_size < offset:
+            offset = 0
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1  # a half-written last line waits for the next tail
+    events, invalid = [], 0
+    for line in data[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            ev = json.loads(line)
+        except ValueError:
+            ev = None
+        if isinstance(ev, dict):
+            events.append(ev)
+        else:
+            invalid += 1
+    res = ingest(events, store)
+    store.set_offset(source, offset + end)
+    return {**res, "invalid": invalid}
+
+def consume_queue(q: "queue.Queue[Any]", store: Optional[RunStore] = None, batch_size: int = 1000,
+                  timeout: float = 0.5) -> Dict[str, int]:
+    """Drain `q` in batches until a None sentinel arrives; events are applied as they come."""
+    store = store or get_store()
+    total = {"applied": 0, "duplicate": 0, "unknown": 0}
+    done = False
+    while not done:
+        batch = [q.get()]
+        deadline = time.monotonic() + timeout
+        while len(batch) < batch_size and batch[-1] is not None:
+            try:
+                batch.append(q.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        if batch[-1] is None:
+            batch.pop()
+            done = True
+        if batch:
+            _add(total, store.apply_events(batch))
+    return total
+
+def _handler(store_path: Optional[str]):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: Dict[str, Any]):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != "/events":
+                self._send(404, {"error": "not found"}); return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"[]")
+            except ValueError as e:
+                self._send(400, {"error": str(e)}); return
+            events = body if isinstance(body, list) else [body]  # SendGrid posts arrays
+            if not all(isinstance(ev, dict) for ev in events):
+                self._send(400, {"error": "events must be JSON objects"}); return
+            self._send(200, ingest(events, get_store(store_path)))
+
+        def do_GET(self):
+            if self.path.startswith("/campaigns/"):
+                self._send(200, get_store(store_path).campaign_totals(self.path.split("/", 2)[2]))
+            else:
+                self._send(404, {"error": "not found"})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def start_webhook_server(port: int = 0, store_path: Optional[str] = None, host: str = "127.0.0.1") -> Tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer((host, port), _handler(store_path))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="events-http", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+# ------------------------------------------------------------------
+# 🔁 Replay / load generation
+# ------------------------------------------------------------------
+EVENT_RATES = {"open": 0.6, "click": 0.2, "reply": 0.08, "meeting": 0.02}
+
+def synthetic_events(message_ids: List[str], seed: int = 0, repeats: float = 0.1) -> Iterator[Dict[str, Any]]:
+    # Seeded funnel (a click implies an open, etc.) plus some duplicate opens, in shuffled arrival order
+    rng = random.Random(seed)
+    events = []
+    for mid in message_ids:
+        if rng.random() >= EVENT_RATES["open"]:
+            continue
+        events.append({"event": "open", "message_id": mid})
+        if rng.random() < repeats:
+            events.append({"event": "open", "message_id": mid})
+        for ev in ("click", "reply", "meeting"):
+            if rng.random() >= EVENT_RATES[ev] / EVENT_RATES["open"]:
+                break
+            events.append({"event": ev, "message_id": mid})
+    rng.shuffle(events)
+    now = time.time()
+    for i, ev in enumerate(events):
+        yield {**ev, "ts": now + i * 0.001}
+
+def replay(events: Iterable[Dict[str, Any]], target: str, batch_size: int = 500, rate: Optional[float] = None,
+           store_path: Optional[str] = None) -> Dict[str, Any]:
+    """Send events to "store", "file:PATH" (append JSONL) or an http(s) webhook URL, optionally paced to `rate`/sec."""
+    import requests
+
+    session = requests.Session() if target.startswith("http") else None
+    total = {"applied": 0, "duplicate": 0, "unknown": 0}
+    n, t0 = 0, time.perf_counter()
+    for batch in chunked(events, batch_size):
+        if target == "store":
+            _add(total, get_store(store_path).apply_events(batch))
+        elif target.startswith("file:"):
+            with open(target[5:], "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(ev) + "\n" for ev in batch))
+        elif session is not None:
+            resp = session.post(f"{target.rstrip('/')}/events", json=batch, timeout=30)
+            resp.raise_for_status()
+            _add(total, resp.json())
+        else:
+            raise ValueError(f"unknown replay target {target!r}")
+        n += len(batch)
+        if rate:
+            ahead = n / rate - (time.perf_counter() - t0)
+            if ahead > 0:
+                time.sleep(ahead)
+    elapsed = time.perf_counter() - t0
+    return {"events": n, "elapsed_s": round(elapsed, 3), "events_per_sec": round(n / elapsed, 1) if elapsed else None, **total}
+
+def main():
+    ap = argparse.ArgumentParser(description="Response event ingestion: webhook server and replay/load tool")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sv = sub.add_parser("serve", help="Accept POST /events and update the run store")
+    sv.add_argument("--host", default="127.0.0.1")
+    sv.add_argument("--port", type=int, default=8788)
+    rp = sub.add_parser("replay", help="Replay a JSONL event file, or synthetic events, into a target")
+    rp.add_argument("--from", dest="source", help="JSONL event file to replay (default: synthetic events)")
+    rp.add_argument("--campaign", default="cmp-replay", help="Campaign for synthetic messages")
+    rp.add_argument("--messages", type=int, default=10_000, help="Synthetic messages to register and generate events for")
+    rp.add_argument("--seed", type=int, default=0)
+    rp.add_argument("--to", default="store", help='"store", "file:PATH" or a webhook base URL')
+    rp.add_argument("--batch", type=int, default=500)
+    rp.add_argument("--rate", type=float, default=None, help="Events per second (default: as fast as possible)")
+    args = ap.parse_args()
+
+    if args.cmd == "serve":
+        server, url = start_webhook_server(args.port, host=args.host)
+        print(f"Event webhook on {url}/events (store: {get_store().path}; Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    if args.source:
+        with open(args.source, encoding="utf-8") as f:
+            events = [json.loads(line) for line in f if line.strip()]
+    else:
+        ids = [f"{args.campaign}-{i}" for i in range(args.messages)]
+        # Register the synthetic sends so the target can resolve them (same store as a local `serve`)
+        get_store().register_messages("replay", args.campaign, [{"message_id": m, "lead": m} for m in ids])
+        events = list(synthetic_events(ids, args.seed))
+    print(json.dumps(replay(events, args.to, args.batch, args.rate)))
+    if not args.source:
+        print(json.dumps({"campaign": args.campaign, **get_store().campaign_totals(args.campaign)}))
+
+if __name__ == "__main__":
+    main()
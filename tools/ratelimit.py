@@ -0,0 +1,40 @@
+from __future__ import annotations
+import os, threading, time
+from typing import Optional
+
+class TokenBucket:
+    """Thread-safe token bucket; `acquire` blocks until a token is available."""
+
+    def __init__(self, rate_per_sec: float, capacity: Optional[float] = None):
+        self.rate = float(rate_per_sec)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, rpm: Optional[float]) -> Optional["TokenBucket"]:
+        return cls(rpm / 60.0, capacity=max(1.0, rpm / 60.0)) if rpm else None
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+def rate_share() -> float:
+    # Number of processes splitting every provider quota (batch_runner sets it); each process gets 1/share
+    try:
+        return max(1.0, float(os.getenv("RATE_LIMIT_SHARE") or 1))
+    except ValueError:
+        return 1.0
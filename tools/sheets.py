@@ -0,0 +1,148 @@
+from __future__ import annotations
+import atexit, csv, os, pathlib, threading, time
+from multiprocessing import util as mp_util
+from typing import Any, Callable, Dict, List, Tuple
+from utils.logger import log_event
+
+FLUSH_ROWS = 500         # rows that trigger an immediate append
+FLUSH_INTERVAL = 5.0     # seconds buffered rows may wait before they are appended
+MAX_PENDING = 50_000     # rows held while the sheet is failing; the oldest beyond this are dropped
+MAX_RETRIES = 5          # consecutive failed appends before the batch is dropped
+RETRY_BACKOFF = 2.0      # seconds before the first retry, doubled per failure (capped at RETRY_BACKOFF_MAX)
+RETRY_BACKOFF_MAX = 300.0
+
+class FileSheet:
+    """Local stand-in for a spreadsheet: appends go to one CSV file (set SHEETS_FILE to use it)."""
+
+    def __init__(self, path: str | pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.appends = 0
+        self._lock = threading.Lock()
+
+    def append_rows(self, rows: List[List[Any]]) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8", newline="") as f:
+                csv.writer(f).writerows(rows)
+            self.appends += 1
+
+    def read(self) -> List[List[str]]:
+        if not self.path.exists():
+            return []
+        with open(self.path, encoding="utf-8", newline="") as f:
+            return list(csv.reader(f))
+
+class SheetsWriteBuffer:
+    """Write-behind buffer that coalesces appends from many agents/runs into batched API calls.
+
+    Rows are flushed when FLUSH_ROWS are pending, every FLUSH_INTERVAL seconds, and at
+    interpreter or pool-worker exit. A failed append keeps its rows and the background flush
+    backs off exponentially; after `max_retries` failures in a row the batch is dropped, and rows
+    beyond `max_pending` are dropped oldest first. Dropped rows are counted and logged as errors.
+    """
+
+    def __init__(self, sink: Callable[[List[List[Any]]], None], max_rows: int = FLUSH_ROWS,
+                 interval: float = FLUSH_INTERVAL, max_pending: int = MAX_PENDING, max_retries: int = MAX_RETRIES,
+                 backoff: float = RETRY_BACKOFF):
+        self.sink = sink
+        self.max_rows = max_rows
+        self.interval = interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rows_in = self.appends = self.errors = self.dropped = 0
+        self._failures = 0
+        self._retry_at = 0.0
+        self._pending: List[List[Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = threading.Thread(target=self._loop, name="sheets-writer", daemon=True)
+        self._thread.start()
+
+    def append(self, rows: List[List[Any]]) -> None:
+        with self._lock:
+            self._pending.extend(rows)
+            self.rows_in += len(rows)
+            full = len(self._pending) >= self.max_rows
+            over = self._trim()
+        if over:
+            log_event("sheets", "error", {"dropped": over, "reason": f"more than {self.max_pending} rows pending"})
+        if full:
+            self._wake.set()
+
+    def _trim(self) -> int:
+        # Caller holds self._lock
+        over = len(self._pending) - self.max_pending
+        if over <= 0:
+            return 0
+        del self._pending[:over]
+        self.dropped += over
+        return over
+
+    def _loop(self):
+        while not self._stop:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if time.monotonic() >= self._retry_at:
+                self.flush()
+
+    def flush(self) -> None:
+        # Explicit flushes (and close) try right away; only the background loop waits out the backoff
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                self.sink(batch)
+                self.appends += 1
+                self._failures, self._retry_at = 0, 0.0
+            except Exception as e:
+                self.errors += 1
+                self._failures += 1
+                error = f"{type(e).__name__}: {e}"
+                if self._failures > self.max_retries:
+                    self._failures, self._retry_at = 0, 0.0
+                    self.dropped += len(batch)
+                    log_event("sheets", "error", {"dropped": len(batch), "reason": f"{self.max_retries} retries failed",
+                                                  "error": error})
+                    return
+                self._retry_at = time.monotonic() + min(self.backoff * 2 ** (self._failures - 1), RETRY_BACKOFF_MAX)
+                with self._lock:
+                    self._pending[:0] = batch
+                    over = self._trim()
+                log_event("sheets", "error", {"rows": len(batch), "error": error, "attempt": self._failures,
+                                              **({"dropped": over} if over else {})})
+
+    def close(self) -> None:
+        self._stop = True
+        self._wake.set()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rows_in": self.rows_in, "appends": self.appends, "errors": self.errors, "dropped": self.dropped,
+                "pending": len(self._pending)}
+
+_buffers: Dict[Tuple[int, str], SheetsWriteBuffer] = {}
+_buffers_lock = threading.Lock()
+
+def get_buffer(target: str, sink: Callable[[List[List[Any]]], None]) -> SheetsWriteBuffer:
+    # One buffer per destination sheet per process; the first caller's sink is used for every flush
+    key = (os.getpid(), target)
+    with _buffers_lock:
+        buf = _buffers.get(key)
+        if buf is None:
+            buf = _buffers[key] = SheetsWriteBuffer(sink)
+            # multiprocessing workers exit without running atexit hooks, but do run Finalize callbacks
+            mp_util.Finalize(buf, buf.close, exitpriority=10)
+        return buf
+
+def flush_all() -> None:
+    pid = os.getpid()
+    for (owner, _), buf in list(_buffers.items()):
+        if owner == pid:
+            buf.flush()
+
+atexit.register(flush_all)
@@ -0,0 +1,79 @@
+from __future__ import annotations
+import argparse, json, random, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+class StubState:
+    """Failure/latency knobs for the stub; `fail_first` failures are served per path before successes."""
+
+    def __init__(self, latency: float = 0.0, fail_first: int = 0, fail_rate: float = 0.0, fail_status: int = 503):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.hits: Dict[str, int] = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def next_status(self, path: str) -> int:
+        with self.lock:
+            n = self.hits[path] = self.hits.get(path, 0) + 1
+            self.requests += 1
+        if n <= self.fail_first or random.random() < self.fail_rate:
+            return self.fail_status
+        return 200
+
+def _handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so pooling is observable
+
+        def _reply(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            if state.latency:
+                time.sleep(state.latency)
+            path = self.path.split("?", 1)[0]
+            status = state.next_status(path)
+            data = json.dumps({"path": path, "method": self.command, "echo": json.loads(body or b"null")}).encode()
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "0")
+            self.send_header("X-Message-Id", f"stub-{state.requests}")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PUT = _reply
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def start_stub_server(port: int = 0, **knobs) -> Tuple[ThreadingHTTPServer, str, StubState]:
+    state = StubState(**knobs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-http", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", state
+
+def main():
+    ap = argparse.ArgumentParser(description="Local stub HTTP server for offline transport tests")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--fail-first", type=int, default=0)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--fail-status", type=int, default=503)
+    args = ap.parse_args()
+    server, url, _ = start_stub_server(args.port, latency=args.latency, fail_first=args.fail_first,
+                                       fail_rate=args.fail_rate, fail_status=args.fail_status)
+    print(f"Stub server on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+from __future__ import annotations
+import asyncio, functools, inspect, itertools, random, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from tools.ratelimit import TokenBucket, rate_share
+
+# Requests/sec per provider (shared by every client of that provider in the process; divided by
+# RATE_LIMIT_SHARE when several processes run against the same quota)
+PROVIDER_RATE_LIMITS: Dict[str, float] = {
+    "apollo": 5.0,
+    "clay": 5.0,
+    "clearbit": 10.0,
+    "sendgrid": 50.0,
+    "sheets": 1.0,
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TransportError(RuntimeError):
+    def __init__(self, provider: str, status: Optional[int], msg: str):
+        super().__init__(f"[{provider}] {msg}")
+        self.provider = provider
+        self.status = status
+
+LATENCY_WINDOW = 4096  # latency samples kept per provider; older ones drop off (counters are exact)
+
+class TransportMetrics:
+    """Per-provider call counts, retries and errors, plus the latencies (seconds) of the most recent calls.
+
+    Counters are exact for the life of the process; percentiles cover the last LATENCY_WINDOW calls
+    per provider, so a long-lived worker's memory stays flat however many requests it makes.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, provider: str, latency: float, status: Optional[int], retried: bool = False):
+        with self._lock:
+            m = self._calls.get(provider)
+            if m is None:
+                m = self._calls[provider] = {"calls": 0, "retries": 0, "errors": 0,
+                                             "latencies": deque(maxlen=self.window)}
+            m["calls"] += 1
+            m["retries"] += int(retried)
+            m["errors"] += int(status is None or status >= 400)
+            m["latencies"].append(latency)
+
+    def mark(self) -> Dict[str, Tuple[int, int, int]]:
+        with self._lock:
+            return {p: (m["retries"], m["errors"], m["calls"]) for p, m in self._calls.items()}
+
+    def snapshot(self, since: Optional[Dict[str, Tuple[int, int, int]]] = None) -> Dict[str, Dict[str, Any]]:
+        # `since` (from mark()) restricts the stats to calls recorded after that point
+        out = {}
+        with self._lock:
+            for provider, m in self._calls.items():
+                retries0, errors0, calls0 = (since or {}).get(provider, (0, 0, 0))
+                calls = m["calls"] - calls0
+                if calls <= 0:
+                    continue
+                window = m["latencies"]
+                lat = sorted(itertools.islice(window, max(0, len(window) - calls), None))
+                pct = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))] * 1000, 2)
+                out[provider] = {
+                    "calls": calls, "retries": m["retries"] - retries0, "errors": m["errors"] - errors0,
+                    "p50_ms": pct(0.50), "p95_ms": pct(0.95), "max_ms": pct(1.0),
+                }
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+
+METRICS = TransportMetrics()          # HTTP requests made by HTTPTransport
+CLIENT_METRICS = TransportMetrics()   # client method calls (mock or live), keyed "provider.method"
+
+def _tracked_pages(key: str, gen):
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = next(gen)
+        except StopIteration:
+            return
+        except Exception:
+            CLIENT_METRICS.record(key, time.perf_counter() - t0, None)
+            raise
+        CLIENT_METRICS.record(key, time.perf_counter() - t0, 200)
+        yield item
+
+def tracked(fn):
+    """Record count/latency of a client method in CLIENT_METRICS; generators are timed per item."""
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        key = f"{self.provider}.{fn.__name__}"
+        t0 = time.perf_counter()
+        try:
+            res = fn(self, *args, **kwargs)
+        except Exception:
+            CLIENT_METRICS.record(key, time.perf_counter() - t0, None)
+            raise
+        if inspect.isgenerator(res):
+            return _tracked_pages(key, res)
+        CLIENT_METRICS.record(key, time.perf_counter() - t0, 200)
+        return res
+    return wrapper
+
+_buckets: Dict[str, Optional[TokenBucket]] = {}
+_buckets_lock = threading.Lock()
+
+def provider_bucket(provider: str) -> Optional[TokenBucket]:
+    with _buckets_lock:
+        if provider not in _buckets:
+            rate = PROVIDER_RATE_LIMITS.get(provider)
+            _buckets[provider] = TokenBucket(rate / rate_share()) if rate else None
+        return _buckets[provider]
+
+class HTTPTransport:
+    """Pooled keep-alive session with per-provider rate limiting and jittered retries."""
+
+    def __init__(self, provider: str, base_url: str, headers: Optional[Dict[str, str]] = None,
+                 timeout: float = 30.0, max_retries: int = 4, backoff_base: float = 0.5, pool_size: int = 32):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.provider = provider
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(headers or {})
+        self._conn_errors: Tuple[type, ...] = (requests.ConnectionError, requests.Timeout)
+
+    def _delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # "Full jitter" exponential backoff
+        return random.uniform(0, self.backoff_base * (2 ** attempt))
+
+    def request(self, method: str, path: str, response_headers: bool = False, **kwargs) -> Any:
+        # response_headers=True returns (body, headers), e.g. for ids that providers only send as a header
+        url = path if path.startswith("http") else f"{self.base_url}/{path.lstrip('/')}"
+        kwargs.setdefault("timeout", self.timeout)
+        bucket = provider_bucket(self.provider)
+        for attempt in range(self.max_retries + 1):
+            if bucket:
+                bucket.acquire()
+            t0 = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except self._conn_errors as e:
+                METRICS.record(self.provider, time.perf_counter() - t0, None, retried=attempt > 0)
+                if attempt < self.max_retries:
+                    time.sleep(self._delay(attempt, None))
+                    continue
+                raise TransportError(self.provider, None, str(e)) from e
+            METRICS.record(self.provider, time.perf_counter() - t0, resp.status_code, retried=attempt > 0)
+            if resp.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                time.sleep(self._delay(attempt, resp.headers.get("Retry-After")))
+                continue
+            if resp.status_code >= 400:
+                raise TransportError(self.provider, resp.status_code, f"{method} {url} -> {resp.status_code}: {resp.text[:200]}")
+            if not resp.content:
+                body = {}
+            else:
+                try:
+                    body = resp.json()
+                except ValueError:
+                    body = resp.text
+            return (body, resp.headers) if response_headers else body
+
+    def get(self, path: str, **kwargs) -> Any:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> Any:
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+class AsyncHTTPTransport:
+    """asyncio front-end over HTTPTransport: calls run on worker threads, capped by a semaphore."""
+
+    def __init__(self, transport: HTTPTransport | BoundTransport, max_in_flight: int = 16):
+        self.transport = transport
+        self.max_in_flight = max_in_flight
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    async def request(self, method: str, path: str, **kwargs) -> Any:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_in_flight)
+        async with self._sem:
+            return await asyncio.to_thread(self.transport.request, method, path, **kwargs)
+
+    async def gather(self, calls: List[Tuple[str, str, Dict[str, Any]]], return_exceptions: bool = False) -> List[Any]:
+        return await asyncio.gather(*(self.request(m, p, **kw) for m, p, kw in calls), return_exceptions=return_exceptions)
+
+    def gather_sync(self, calls: List[Tuple[str, str, Dict[str, Any]]], return_exceptions: bool = False) -> List[Any]:
+        """gather() for synchronous callers, safe to call from inside a running event loop."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.gather(calls, return_exceptions))
+        # asyncio.run() refuses to nest (e.g. under an async web handler): fan out on threads over the same session
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            futures = [pool.submit(self.transport.request, m, p, **kw) for m, p, kw in calls]
+            out = []
+            for f in futures:
+                try:
+                    out.append(f.result())
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    out.append(e)
+            return out
+
+_transports: Dict[Tuple[str, str], HTTPTransport] = {}
+_transports_lock = threading.Lock()
+
+def get_transport(provider: str, base_url: str) -> HTTPTransport:
+    # One pooled session per (provider, base_url) for the whole process; credentials are per client (BoundTransport)
+    key = (provider, base_url)
+    with _transports_lock:
+        t = _transports.get(key)
+        if t is None:
+            t = _transports[key] = HTTPTransport(provider, base_url)
+        return t
+
+class BoundTransport:
+    """A shared pooled transport plus one client's headers, sent with each request (the session is never mutated)."""
+
+    def __init__(self, transport: HTTPTransport, headers: Callable[[], Dict[str, str]]):
+        self.transport = transport
+        self.provider = transport.provider
+        self.headers = headers
+
+    def request(self, method: str, path: str, **kwargs) -> Any:
+        kwargs["headers"] = {**self.headers(), **(kwargs.get("headers") or {})}
+        return self.transport.request(method, path, **kwargs)
+
+    def get(self, path: str, **kwargs) -> Any:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> Any:
+        return self.request("POST", path, **kwargs)
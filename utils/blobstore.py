@@ -0,0 +1,87 @@
+from __future__ import annotations
+import gzip, hashlib, json, os, pathlib, threading, time
+from typing import Any, Optional
+
+BLOB_KEY = "_blob"
+
+class BlobStore:
+    """Content-addressed store of gzip-compressed JSON blobs under `root/<ab>/<sha256>.json.gz`.
+
+    Identical payloads (the same lead list logged by several steps or runs) are written once.
+    A blob's mtime is refreshed whenever it is stored again, so prune() drops the least recently
+    logged blobs first.
+    """
+
+    def __init__(self, root: str | pathlib.Path):
+        self.root = pathlib.Path(root)
+        self.writes = self.reused = 0
+        self._lock = threading.Lock()
+
+    def path(self, digest: str) -> pathlib.Path:
+        return self.root / digest[:2] / f"{digest}.json.gz"
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if path.exists():
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass  # pruned meanwhile; the next put of this payload writes it again
+            else:
+                with self._lock:
+                    self.reused += 1
+                return digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(gzip.compress(data, compresslevel=5, mtime=0))
+        tmp.replace(path)  # concurrent writers of the same digest write the same bytes
+        with self._lock:
+            self.writes += 1
+        return digest
+
+    def prune(self, max_age_s: Optional[float] = None, max_bytes: Optional[int] = None) -> int:
+        """Delete blobs not stored for `max_age_s`, then the oldest ones until the store fits in `max_bytes`.
+
+        Returns how many were deleted. Log lines that referenced a deleted blob keep their sample/preview.
+        """
+        blobs = []
+        for p in self.root.glob("*/*.json.gz"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            blobs.append((st.st_mtime, st.st_size, p))
+        blobs.sort()
+        cutoff = time.time() - max_age_s if max_age_s is not None else None
+        total = sum(size for _, size, _ in blobs)
+        removed = 0
+        for mtime, size, p in blobs:
+            if not ((cutoff is not None and mtime < cutoff) or (max_bytes is not None and total > max_bytes)):
+                break
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def get(self, digest: str) -> bytes:
+        return gzip.decompress(self.path(digest).read_bytes())
+
+    def load(self, digest: str) -> Any:
+        return json.loads(self.get(digest))
+
+def is_ref(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get(BLOB_KEY), str)
+
+def resolve(value: Any, store: BlobStore) -> Any:
+    """Swap blob references in a logged payload back for the full values they summarize."""
+    if is_ref(value):
+        return store.load(value[BLOB_KEY])
+    if isinstance(value, dict):
+        return {k: resolve(v, store) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve(v, store) for v in value]
+    return value
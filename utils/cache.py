@@ -0,0 +1,158 @@
+from __future__ import annotations
+import hashlib, json, os, pathlib, sqlite3, threading, time
+from typing import Any, Dict, List, Optional
+
+CACHE_DIR = pathlib.Path(".cache")
+
+def content_key(*parts: str) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class DiskCache:
+    """SQLite-backed JSON key/value cache with TTL + max-entries (LRU) eviction.
+
+    With readonly=True (or CACHE_READONLY=1) the file is opened read-only: lookups
+    work, writes/eviction are skipped, and a missing file behaves as an empty cache.
+    """
+
+    EVICT_EVERY = 256
+
+    def __init__(self, path: str | pathlib.Path, ttl: Optional[float] = 30 * 86400, max_entries: Optional[int] = 100_000,
+                 readonly: Optional[bool] = None):
+        self.path = pathlib.Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.readonly = os.getenv("CACHE_READONLY") == "1" if readonly is None else readonly
+        self.hits = self.misses = self.writes = self.evictions = 0
+        self._lock = threading.Lock()
+        if self.readonly:
+            self._db = None
+            if self.path.exists():
+                self._db = sqlite3.connect(f"file:{self.path.resolve()}?mode=ro", uri=True, timeout=30,
+                                           check_same_thread=False, isolation_level=None)
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed_at)")
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._select_one(key)
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                if row is not None and not self.readonly:
+                    self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            if not self.readonly:
+                self._db.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        # Only live hits are returned; expired rows are left for the next eviction pass
+        now = time.time()
+        found: Dict[str, Any] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._select(
+                    f"SELECT key, value, created_at FROM cache WHERE key IN ({','.join('?' * len(part))})", part
+                )
+                for key, value, created in rows:
+                    if self.ttl is None or now - created <= self.ttl:
+                        found[key] = value
+                if found and not self.readonly:
+                    self._db.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?", [(now, k) for k in part if k in found])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return {k: json.loads(v) for k, v in found.items()}
+
+    def _select(self, sql: str, params) -> List[tuple]:
+        if self._db is None:
+            return []
+        try:
+            return self._db.execute(sql, params).fetchall()
+        except sqlite3.OperationalError:
+            if self.readonly:
+                return []  # read-only view of a cache that was never initialized
+            raise
+
+    def _select_one(self, key: str) -> Optional[tuple]:
+        rows = self._select("SELECT value, created_at FROM cache WHERE key = ?", (key,))
+        return rows[0] if rows else None
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        if self.readonly:
+            return
+        now = time.time()
+        rows = [(k, json.dumps(v, ensure_ascii=False), now, now) for k, v in items.items()]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)", rows
+                )
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            before = self.writes
+            self.writes += len(rows)
+            if self.writes // self.EVICT_EVERY != before // self.EVICT_EVERY:
+                self._evict(now)
+
+    def set(self, key: str, value: Any) -> None:
+        if self.readonly:
+            return
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, data, now, now),
+            )
+            self.writes += 1
+            if self.writes % self.EVICT_EVERY == 0:
+                self._evict(now)
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict(time.time())
+
+    def _evict(self, now: float) -> None:
+        if self.readonly:
+            return
+        if self.ttl is not None:
+            self.evictions += self._db.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl,)).rowcount
+        if self.max_entries is not None:
+            self.evictions += self._db.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._evict(time.time())
+            if self._db is not None:
+                self._db.close()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+import hashlib, json, os, pathlib, time
+from typing import Any, Dict, Optional
+from utils.leads import json_default
+
+def checkpoint_key(*parts: Any) -> str:
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+# Retention: checkpoints not written or resumed from for MAX_AGE_DAYS are deleted, then the least
+# recently used ones beyond MAX_ENTRIES. Pruning runs on a store's first save and every PRUNE_EVERY saves.
+MAX_AGE_DAYS = float(os.getenv("CHECKPOINT_MAX_AGE_DAYS", "14"))
+MAX_ENTRIES = int(os.getenv("CHECKPOINT_MAX_ENTRIES", "2000"))
+PRUNE_EVERY = 100
+
+class CheckpointStore:
+    """One JSON file per step output, addressed by the step's checkpoint key."""
+
+    def __init__(self, root: str | pathlib.Path, max_age_days: Optional[float] = MAX_AGE_DAYS,
+                 max_entries: Optional[int] = MAX_ENTRIES):
+        self.root = pathlib.Path(root)
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        self.saves = 0
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            output = json.loads(path.read_text(encoding="utf-8"))["output"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(path)  # resumed from: keep it through the next prune
+        except OSError:
+            pass
+        return output
+
+    def prune(self) -> int:
+        """Delete expired checkpoints, then the least recently used beyond max_entries; returns how many."""
+        files = []
+        for p in self.root.glob("*/*.json"):
+            try:
+                files.append((p.stat().st_mtime, p))
+            except FileNotFoundError:
+                continue
+        files.sort(reverse=True)
+        cutoff = time.time() - self.max_age_days * 86400 if self.max_age_days is not None else None
+        removed = 0
+        for i, (mtime, p) in enumerate(files):
+            if (cutoff is not None and mtime < cutoff) or (self.max_entries is not None and i >= self.max_entries):
+                try:
+                    p.unlink()
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def save(self, key: str, step_id: str, agent: str, output: Dict[str, Any]) -> bool:
+        try:
+            data = json.dumps({"step": step_id, "agent": agent, "key": key, "created": time.time(), "output": output},
+                              ensure_ascii=False, default=json_default)
+        except (TypeError, ValueError):
+            return False  # e.g. streamed (iterator) outputs can't be checkpointed
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(data, encoding="utf-8")
+        tmp.replace(path)
+        if self.saves % PRUNE_EVERY == 0:
+            self.prune()
+        self.saves += 1
+        return True
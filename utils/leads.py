@@ -0,0 +1,184 @@
+from __future__ import annotations
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterable, Iterator, List
+
+# Low-cardinality string fields are interned so every row shares one copy.
+INTERNED_FIELDS = ("company", "role", "signal", "domain")
+_ABSENT = object()
+
+class LeadTable(Sequence):
+    """Column-oriented lead storage: one list per field instead of one dict per lead.
+
+    Rows come back as LeadRow views that behave like read-only dicts, so agents that
+    do `lead.get("company")` / `lead["role"]` keep working unchanged.
+    """
+    __slots__ = ("columns", "n")
+
+    def __init__(self, columns: Dict[str, List[Any]], n: int):
+        self.columns = columns
+        self.n = n
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "LeadTable":
+        records = list(records)
+        fields: Dict[str, None] = {}
+        for r in records:
+            fields.update(dict.fromkeys(r))
+        columns = {f: [r.get(f, _ABSENT) for r in records] for f in fields}
+        for f in INTERNED_FIELDS:
+            col = columns.get(f)
+            if col:
+                columns[f] = [sys.intern(v) if type(v) is str else v for v in col]
+        techs = columns.get("technologies")
+        if techs:
+            # Identical stacks share one tuple
+            shared: Dict[tuple, tuple] = {}
+            columns["technologies"] = [
+                shared.setdefault(t, t) if isinstance(t, tuple) else t
+                for t in (tuple(v) if isinstance(v, list) else v for v in techs)
+            ]
+        return cls(columns, len(records))
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return LeadView(self, array("q", range(self.n))[i])
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        return LeadRow(self, i)
+
+    def __iter__(self) -> Iterator["LeadRow"]:
+        return (LeadRow(self, i) for i in range(self.n))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Sequence) and len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def column(self, name: str, default: Any = None) -> List[Any]:
+        col = self.columns.get(name)
+        if col is None:
+            return [default] * self.n
+        return [default if v is _ABSENT else v for v in col]
+
+    def take(self, indices: Iterable[int]) -> "LeadView":
+        return LeadView(self, array("q", indices))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [row.to_dict() for row in self]
+
+class LeadRow(Mapping):
+    """Read-only dict view of one LeadTable row."""
+    __slots__ = ("_t", "_i")
+
+    def __init__(self, table: LeadTable, i: int):
+        self._t = table
+        self._i = i
+
+    def __getitem__(self, key: str) -> Any:
+        col = self._t.columns.get(key)
+        if col is None or col[self._i] is _ABSENT:
+            raise KeyError(key)
+        v = col[self._i]
+        return list(v) if key == "technologies" and isinstance(v, tuple) else v
+
+    def __iter__(self):
+        return (k for k, col in self._t.columns.items() if col[self._i] is not _ABSENT)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: self[k] for k in self}
+
+    def __repr__(self) -> str:
+        return f"LeadRow({self.to_dict()!r})"
+
+class LeadView(Sequence):
+    """Zero-copy selection/reordering of a LeadTable (only the index array is stored)."""
+    __slots__ = ("table", "index")
+
+    def __init__(self, table: LeadTable, index: array):
+        self.table = table
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return LeadView(self.table, self.index[i])
+        return LeadRow(self.table, self.index[i])
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Sequence) and len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [row.to_dict() for row in self]
+
+class RankedItem(Mapping):
+    """Dict shim for {"lead": ..., "score": ...} without materializing the wrapper dict."""
+    __slots__ = ("lead", "score")
+    _KEYS = ("lead", "score")
+
+    def __init__(self, lead: LeadRow, score: float):
+        self.lead = lead
+        self.score = score
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "lead":
+            return self.lead
+        if key == "score":
+            return self.score
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return 2
+
+class RankedLeads(Sequence):
+    """Ranked view over a LeadTable: row order plus aligned scores; slicing copies indices only."""
+    __slots__ = ("table", "order", "scores")
+
+    def __init__(self, table: LeadTable, order: array, scores: array):
+        self.table = table
+        self.order = order
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return RankedLeads(self.table, self.order[i], self.scores[i])
+        return RankedItem(LeadRow(self.table, self.order[i]), self.scores[i])
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Sequence) and len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def leads(self) -> LeadView:
+        return LeadView(self.table, self.order)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [{"lead": LeadRow(self.table, i).to_dict(), "score": s} for i, s in zip(self.order, self.scores)]
+
+def json_default(obj: Any) -> Any:
+    # json.dumps hook so tables/views serialize as plain records; anything else still fails
+    if isinstance(obj, (LeadTable, LeadView, RankedLeads)):
+        return obj.to_records()
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def json_or_str(obj: Any) -> Any:
+    # Lenient variant for logs and reports: unknown objects fall back to str()
+    try:
+        return json_default(obj)
+    except TypeError:
+        return str(obj)
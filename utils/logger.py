@@ -1,14 +1,181 @@
 from __future__ import annotations
-import json, pathlib, datetime as dt
+import atexit, json, os, pathlib, queue, sys, threading, time, uuid, datetime as dt
+from collections.abc import Sequence
+from typing import Any, Dict, List, Optional, Tuple
+from utils.blobstore import BLOB_KEY, BlobStore
+from utils.leads import json_or_str
+
+def new_run_id() -> str:
+    return f"{dt.datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
 
 RUN_DIR = pathlib.Path(".runs")
-RUN_DIR.mkdir(exist_ok=True)
+RUN_ID = os.getenv("RUN_ID") or new_run_id()
+
+FLUSH_INTERVAL = 0.5        # seconds a batch may sit in memory before it is written
+MAX_BATCH = 5000            # records per write pass
+MAX_BYTES = 20 * 1024 * 1024
+BACKUP_COUNT = 5
+
+# Payload policy: values that serialize above SPILL_BYTES are written once to the content-addressed
+# blob store under RUN_DIR/blobs and logged as {"_blob": sha256, "bytes", "count"/"sample" | "preview"}.
+# LOG_PAYLOADS=full keeps every payload inline.
+# Retention: blobs not logged again for BLOB_MAX_AGE_DAYS are deleted, then the least recently logged
+# ones until the store fits in BLOB_MAX_MB. The writer prunes when it opens a run dir's store and after
+# every BLOB_PRUNE_EVERY new blobs; log lines whose blob is gone still carry their sample/preview.
+PAYLOAD_POLICY = os.getenv("LOG_PAYLOADS", "sample")
+SPILL_BYTES = 4 * 1024
+SAMPLE_ITEMS = 3
+PREVIEW_CHARS = 200
+BLOB_MAX_AGE_DAYS = float(os.getenv("LOG_BLOB_MAX_AGE_DAYS", "30"))
+BLOB_MAX_MB = float(os.getenv("LOG_BLOB_MAX_MB", "1024"))
+BLOB_PRUNE_EVERY = 1000
 
 def ts() -> str:
-    return dt.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+    return dt.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+def configure(run_dir: Optional[str | pathlib.Path] = None, run_id: Optional[str] = None) -> str:
+    """Point subsequent log_event calls at another run dir / run id; returns the active run id."""
+    global RUN_DIR, RUN_ID
+    if run_dir is not None:
+        RUN_DIR = pathlib.Path(run_dir)
+    if run_id is not None:
+        RUN_ID = run_id
+    return RUN_ID
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=json_or_str)
+
+def compact_payload(value: Any, blobs: BlobStore) -> Any:
+    """Keep small values inline; spill large ones to `blobs`, leaving counts and a sample behind."""
+    if isinstance(value, dict):
+        return {k: compact_payload(v, blobs) for k, v in value.items()}
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    enc = _dumps(value)
+    if len(enc) <= SPILL_BYTES:
+        return value
+    ref: Dict[str, Any] = {BLOB_KEY: blobs.put(enc.encode("utf-8")), "bytes": len(enc)}
+    if isinstance(value, str):
+        ref["preview"] = value[:PREVIEW_CHARS]
+    elif isinstance(value, Sequence):
+        ref["count"] = len(value)
+        ref["sample"] = [value[i] for i in range(min(SAMPLE_ITEMS, len(value)))]
+    return ref
+
+def _report(msg: str, e: Exception) -> None:
+    print(f"[logger] {msg}: {type(e).__name__}: {e}", file=sys.stderr)
+
+def _rotate(path: pathlib.Path) -> None:
+    try:
+        if path.stat().st_size < MAX_BYTES:
+            return
+        for i in range(BACKUP_COUNT - 1, 0, -1):
+            src = path.with_name(f"{path.name}.{i}")
+            if src.exists():
+                src.replace(path.with_name(f"{path.name}.{i + 1}"))
+        path.replace(path.with_name(f"{path.name}.1"))
+    except FileNotFoundError:
+        pass  # not written yet, or another process rotated it first
+
+class _BatchWriter:
+    # One daemon thread per process drains the queue and appends each file once per batch.
+    def __init__(self):
+        self.pid = os.getpid()
+        self.q: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self.blobs: Dict[pathlib.Path, BlobStore] = {}
+        self.thread = threading.Thread(target=self._loop, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, item: Tuple[pathlib.Path, str, Dict[str, Any]]) -> None:
+        self.q.put(item)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        done = threading.Event()
+        self.q.put(done)
+        done.wait(timeout)
+
+    def _loop(self):
+        while True:
+            batch: List[Any] = [self.q.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < MAX_BATCH and not isinstance(batch[-1], threading.Event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:  # never let one bad batch stop the writer
+                _report("log batch dropped", e)
+            finally:
+                for item in batch:
+                    if isinstance(item, threading.Event):
+                        item.set()
+
+    def _write(self, batch: List[Any]) -> None:
+        files: Dict[pathlib.Path, List[str]] = {}
+        for item in batch:
+            if isinstance(item, threading.Event):
+                continue
+            run_dir, node_id, rec = item
+            files.setdefault(run_dir / f"{node_id}.log", []).append(self._encode(run_dir, rec) + "\n")
+        for path, lines in files.items():
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                _rotate(path)
+                # One write per file per batch keeps other processes' lines from splitting ours
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+            except OSError as e:
+                _report(f"could not write {path}", e)
+
+    def _encode(self, run_dir: pathlib.Path, rec: Dict[str, Any]) -> str:
+        try:
+            if PAYLOAD_POLICY != "full":
+                blobs = self.blobs.get(run_dir)
+                if blobs is None:
+                    blobs = self.blobs[run_dir] = BlobStore(run_dir / "blobs")
+                    self._prune(blobs)
+                before = blobs.writes
+                rec = {**rec, "payload": compact_payload(rec["payload"], blobs)}
+                if blobs.writes // BLOB_PRUNE_EVERY > before // BLOB_PRUNE_EVERY:
+                    self._prune(blobs)
+            return _dumps(rec)
+        except Exception as e:
+            # Unserializable payload (e.g. non-string dict keys): keep the record, with the payload as repr
+            return _dumps({**rec, "payload": {"repr": repr(rec.get("payload"))[:10_000],
+                                              "log_error": f"{type(e).__name__}: {e}"}})
+
+    @staticmethod
+    def _prune(blobs: BlobStore) -> None:
+        try:
+            blobs.prune(max_age_s=BLOB_MAX_AGE_DAYS * 86400, max_bytes=int(BLOB_MAX_MB * 2**20))
+        except OSError as e:
+            _report(f"could not prune {blobs.root}", e)
+
+_writer: Optional[_BatchWriter] = None
+_writer_lock = threading.Lock()
+
+def _get_writer() -> _BatchWriter:
+    global _writer
+    w = _writer
+    if w is None or w.pid != os.getpid():  # first use, or we are a forked child
+        with _writer_lock:
+            if _writer is None or _writer.pid != os.getpid():
+                _writer = _BatchWriter()
+            w = _writer
+    return w
+
+def flush(timeout: Optional[float] = 10.0) -> None:
+    if _writer is not None and _writer.pid == os.getpid():
+        _writer.flush(timeout)
+
+atexit.register(flush)
 
 def log_event(node_id: str, kind: str, payload):
-    rec = {"ts": ts(), "node": node_id, "kind": kind, "payload": payload}
-    path = RUN_DIR / f"{node_id}.log"
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    # Payloads are serialized on the writer thread; don't mutate them after logging.
+    rec = {"ts": ts(), "run_id": RUN_ID, "node": node_id, "kind": kind, "payload": payload}
+    _get_writer().put((RUN_DIR, node_id, rec))
@@ -0,0 +1,56 @@
+from __future__ import annotations
+import cProfile, pathlib, time, tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from tools.transport import CLIENT_METRICS, METRICS
+
+def count_items(obj: Any) -> Optional[int]:
+    # Size of the largest list in a payload/output dict (leads, messages, responses, ...)
+    if isinstance(obj, dict):
+        sizes = [len(v) for v in obj.values() if isinstance(v, list)]
+        return max(sizes) if sizes else None
+    return len(obj) if isinstance(obj, list) else None
+
+@contextmanager
+def profile_step(node_id: str, cprofile_dir: Optional[str | pathlib.Path] = None,
+                 attribute: bool = True) -> Iterator[Dict[str, Any]]:
+    """Collect wall/CPU time, tracemalloc peak and tool-client calls for one step.
+
+    CPU time is per thread (steps run on pool threads). The tracemalloc peak and the
+    client-call counters are process-wide, so with attribute=False (steps running in
+    parallel) they are left as None rather than charged to whichever step reads them.
+    """
+    stats: Dict[str, Any] = {"node": node_id}
+    started_tracing = attribute and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if attribute:
+        tracemalloc.reset_peak()
+        mem0 = tracemalloc.get_traced_memory()[0]
+        client_mark, http_mark = CLIENT_METRICS.mark(), METRICS.mark()
+    prof = cProfile.Profile() if cprofile_dir else None
+    wall0, cpu0 = time.perf_counter(), time.thread_time()
+    if prof:
+        prof.enable()
+    try:
+        yield stats
+    finally:
+        if prof:
+            prof.disable()
+        wall, cpu = time.perf_counter() - wall0, time.thread_time() - cpu0
+        stats.update({"wall_s": round(wall, 6), "cpu_s": round(cpu, 6),
+                      "mem_peak_mb": None, "client_calls": None, "http": None})
+        if attribute:
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+            stats.update({
+                "mem_peak_mb": round(max(0, peak - mem0) / 2**20, 3),
+                "client_calls": CLIENT_METRICS.snapshot(since=client_mark),
+                "http": METRICS.snapshot(since=http_mark),
+            })
+        if prof:
+            path = pathlib.Path(cprofile_dir) / f"{node_id}.prof"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            prof.dump_stats(str(path))
+            stats["cprofile"] = str(path)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+import hashlib, math, os, pathlib, re, sqlite3, struct, threading, time
+from typing import Any, Dict, Iterable, List, Optional, Set
+from utils.cache import CACHE_DIR
+
+_COMPANY_SUFFIXES = {"inc", "llc", "ltd", "limited", "corp", "corporation", "co", "company", "gmbh", "plc", "ag", "sa", "bv"}
+_DOTLESS_DOMAINS = {"gmail.com", "googlemail.com"}
+
+def normalize_company(name: str) -> str:
+    words = re.findall(r"[a-z0-9]+", (name or "").lower())
+    while len(words) > 1 and words[-1] in _COMPANY_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+def normalize_email(email: str) -> str:
+    local, _, domain = (email or "").strip().lower().partition("@")
+    local = local.split("+", 1)[0]
+    if domain in _DOTLESS_DOMAINS:
+        local = local.replace(".", "")
+    return f"{local}@{domain}" if domain else local
+
+def prospect_key(lead: Dict[str, Any]) -> str:
+    return f"{normalize_company(lead.get('company', ''))}|{normalize_email(lead.get('email') or '')}"
+
+def index_path(path: str | pathlib.Path | None = None) -> pathlib.Path:
+    return pathlib.Path(path or os.getenv("SEEN_INDEX_PATH") or CACHE_DIR / "prospects_seen.sqlite")
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 16-byte digests (double hashing, k probes)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.m = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.k = max(1, round(self.m / capacity * math.log(2)))
+        self.bits = bytearray((self.m + 7) // 8)
+        self.count = 0
+
+    def _probes(self, digest: bytes):
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.m
+        return ((h1 + i * h2) % m for i in range(self.k))
+
+    def add(self, digest: bytes) -> None:
+        bits = self.bits
+        for p in self._probes(digest):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._probes(digest))
+
+_HEADER = struct.Struct("<4sQQIQQ")  # magic, capacity, m, k, count, watermark
+
+class ProspectIndex:
+    """Cross-run index of prospects already handled, keyed by normalized (company, email).
+
+    A SQLite table of 16-byte key digests is the exact set; an in-memory Bloom filter in
+    front of it answers most "never seen" lookups without touching disk. The filter is
+    saved next to the database with the last row id it covers, and rows added by other
+    processes since then are folded in on load and before each lookup.
+    """
+
+    def __init__(self, path: str | pathlib.Path, capacity: int = 1_000_000, error_rate: float = 0.01):
+        self.path = pathlib.Path(path)
+        self.bloom_path = self.path.with_name(self.path.name + ".bloom")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.checks = self.bloom_hits = self.exact_hits = self.added = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS prospects (id INTEGER PRIMARY KEY, key BLOB NOT NULL UNIQUE,"
+            " state TEXT NOT NULL, run_id TEXT, first_seen REAL NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self.watermark = 0
+        self.bloom = self._load_bloom()
+        self._refresh()
+
+    def _load_bloom(self) -> BloomFilter:
+        try:
+            data = self.bloom_path.read_bytes()
+            magic, capacity, m, k, count, watermark = _HEADER.unpack_from(data)
+            bloom = BloomFilter(capacity, self.error_rate)
+            if magic == b"PIBF" and (bloom.m, bloom.k) == (m, k) and count < capacity and len(data) == _HEADER.size + len(bloom.bits):
+                bloom.bits[:] = data[_HEADER.size:]
+                bloom.count = count
+                self.watermark = watermark
+                return bloom
+        except (FileNotFoundError, struct.error):
+            pass
+        # Missing, stale or over capacity: rebuild from the exact set, sized for growth
+        total = self._db.execute("SELECT COUNT(*) FROM prospects").fetchone()[0]
+        self.capacity = max(self.capacity, 2 * total)
+        self.watermark = 0
+        return BloomFilter(self.capacity, self.error_rate)
+
+    def _refresh(self) -> None:
+        for rowid, key in self._db.execute("SELECT id, key FROM prospects WHERE id > ? ORDER BY id", (self.watermark,)):
+            self.bloom.add(key)
+            self.watermark = rowid
+
+    def seen(self, keys: Iterable[str], max_age: Optional[float] = None) -> Set[str]:
+        """Subset of `keys` already in the index (optionally only entries seen within `max_age` seconds)."""
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            self._refresh()
+            self.checks += len(keys)
+            maybe = {_digest(k): k for k in keys}
+            maybe = {d: k for d, k in maybe.items() if d in self.bloom}
+            self.bloom_hits += len(maybe)
+            found: Set[str] = set()
+            digests = list(maybe)
+            cutoff = time.time() - max_age if max_age is not None else None
+            for i in range(0, len(digests), 500):
+                part = digests[i:i + 500]
+                sql = f"SELECT key FROM prospects WHERE key IN ({','.join('?' * len(part))})"
+                params: List[Any] = list(part)
+                if cutoff is not None:
+                    sql += " AND last_seen >= ?"
+                    params.append(cutoff)
+                found.update(maybe[row[0]] for row in self._db.execute(sql, params))
+            self.exact_hits += len(found)
+        return found
+
+    def add(self, keys: Iterable[str], state: str = "seen", run_id: Optional[str] = None) -> None:
+        now = time.time()
+        rows = [(_digest(k), state, run_id, now, now) for k in dict.fromkeys(keys)]
+        if not rows:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT INTO prospects (key, state, run_id, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET state = excluded.state, run_id = excluded.run_id,"
+                    " last_seen = excluded.last_seen", rows)
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            self.added += len(rows)
+            self._refresh()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"checked": self.checks, "bloom_positive": self.bloom_hits, "already_seen": self.exact_hits,
+                "false_positive": self.bloom_hits - self.exact_hits, "added": self.added, "indexed": self.bloom.count}
+
+    def close(self) -> None:
+        with self._lock:
+            bloom = self.bloom
+            tmp = self.bloom_path.with_name(f"{self.bloom_path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(_HEADER.pack(b"PIBF", bloom.capacity, bloom.m, bloom.k, bloom.count, self.watermark) + bytes(bloom.bits))
+            tmp.replace(self.bloom_path)
+            self._db.close()
@@ -0,0 +1,324 @@
+from __future__ import annotations
+import json, os, pathlib, sqlite3, threading, time
+from typing import Any, Dict, List, Optional
+from utils.leads import json_or_str
+
+DEFAULT_CAMPAIGN_ID = "cmp-mock-001"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT NOT NULL, campaign_id TEXT NOT NULL, started_at REAL NOT NULL,
+    PRIMARY KEY (run_id, campaign_id));
+CREATE INDEX IF NOT EXISTS runs_campaign ON runs(campaign_id, started_at);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id TEXT NOT NULL, campaign_id TEXT NOT NULL, node TEXT NOT NULL, ts REAL NOT NULL,
+    name TEXT NOT NULL, value REAL);
+CREATE INDEX IF NOT EXISTS metrics_campaign ON metrics(campaign_id, ts);
+CREATE INDEX IF NOT EXISTS metrics_run ON metrics(run_id, node);
+CREATE TABLE IF NOT EXISTS events (
+    run_id TEXT NOT NULL, campaign_id TEXT NOT NULL, node TEXT NOT NULL, kind TEXT NOT NULL, ts REAL NOT NULL,
+    payload TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS events_campaign ON events(campaign_id, node, kind, ts);
+CREATE INDEX IF NOT EXISTS events_run ON events(run_id, node, kind);
+CREATE TABLE IF NOT EXISTS responses (
+    run_id TEXT NOT NULL, campaign_id TEXT NOT NULL, node TEXT NOT NULL, ts REAL NOT NULL, lead TEXT,
+    opened INTEGER, clicked INTEGER, replied INTEGER, booked_meeting INTEGER);
+CREATE INDEX IF NOT EXISTS responses_campaign ON responses(campaign_id, ts);
+CREATE INDEX IF NOT EXISTS responses_run ON responses(run_id, node);
+CREATE TABLE IF NOT EXISTS segments (
+    run_id TEXT NOT NULL, campaign_id TEXT NOT NULL, node TEXT NOT NULL, ts REAL NOT NULL,
+    dim TEXT NOT NULL, value TEXT NOT NULL,
+    n INTEGER, opened INTEGER, clicked INTEGER, replied INTEGER, booked_meeting INTEGER);
+CREATE INDEX IF NOT EXISTS segments_campaign ON segments(campaign_id, ts);
+CREATE INDEX IF NOT EXISTS segments_run ON segments(run_id, campaign_id);
+CREATE TABLE IF NOT EXISTS messages (
+    message_id TEXT PRIMARY KEY, campaign_id TEXT NOT NULL, run_id TEXT, lead TEXT, segment TEXT, sent_at REAL,
+    opened INTEGER NOT NULL DEFAULT 0, clicked INTEGER NOT NULL DEFAULT 0, replied INTEGER NOT NULL DEFAULT 0,
+    booked_meeting INTEGER NOT NULL DEFAULT 0, updated_at REAL, provider_id TEXT);
+CREATE INDEX IF NOT EXISTS messages_campaign ON messages(campaign_id);
+CREATE INDEX IF NOT EXISTS messages_lead ON messages(campaign_id, lead, sent_at);
+CREATE TABLE IF NOT EXISTS campaign_totals (
+    campaign_id TEXT PRIMARY KEY, sent INTEGER NOT NULL DEFAULT 0, opened INTEGER NOT NULL DEFAULT 0,
+    clicked INTEGER NOT NULL DEFAULT 0, replied INTEGER NOT NULL DEFAULT 0, booked_meeting INTEGER NOT NULL DEFAULT 0,
+    events INTEGER NOT NULL DEFAULT 0, updated_at REAL);
+CREATE TABLE IF NOT EXISTS ingest_offsets (source TEXT PRIMARY KEY, offset INTEGER NOT NULL);
+"""
+
+# Columns added after the first release; older stores get them (and their indexes) on open
+_MESSAGE_COLUMNS = {"provider_id": "TEXT"}
+_MESSAGE_INDEXES = """
+CREATE INDEX IF NOT EXISTS messages_provider ON messages(provider_id, sent_at);
+"""
+
+RESPONSE_FLAGS = ("opened", "clicked", "replied", "booked_meeting")
+# Webhook event name -> response flag it sets
+EVENT_FLAGS = {"open": "opened", "click": "clicked", "reply": "replied", "meeting": "booked_meeting",
+               **{f: f for f in RESPONSE_FLAGS}}
+
+DEFAULT_STORE_PATH = pathlib.Path(".runs") / "runs.sqlite"
+
+def message_key(sent: Dict[str, Any]) -> Optional[str]:
+    # A send's row key: its idempotency key (unique per recipient), else the provider's message id.
+    # Provider ids alone are not enough: a SendGrid template batch shares one X-Message-Id.
+    return sent.get("idempotency_key") or sent.get("message_id")
+
+def default_path() -> pathlib.Path:
+    # Fixed root, not logger.RUN_DIR: batch campaigns get their own run dirs but share one history
+    return pathlib.Path(os.getenv("RUN_STORE_PATH") or DEFAULT_STORE_PATH)
+
+class RunStore:
+    """Indexed SQLite store for campaign history (metrics, responses, recommendations).
+
+    The JSONL logs stay as the raw trace; this is what analytics and the dashboard
+    query, so "campaign X over its last N runs" is an index range scan.
+    """
+
+    def __init__(self, path: str | pathlib.Path, readonly: bool = False):
+        self.path = pathlib.Path(path)
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        if readonly:
+            self._db = sqlite3.connect(f"file:{self.path.resolve()}?mode=ro", uri=True, timeout=30,
+                                       check_same_thread=False, isolation_level=None)
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        have = {r[1] for r in self._db.execute("PRAGMA table_info(messages)")}
+        for col, kind in _MESSAGE_COLUMNS.items():
+            if col not in have:
+                self._db.execute(f"ALTER TABLE messages ADD COLUMN {col} {kind}")
+        self._db.executescript(_MESSAGE_INDEXES)
+
+    def _write(self, sql: str, rows: List[tuple]) -> None:
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(sql, rows)
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _query(self, sql: str, params=()) -> List[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # -- writes ---------------------------------------------------------
+    def record_run(self, run_id: str, campaign_id: str) -> None:
+        self._write("INSERT OR IGNORE INTO runs (run_id, campaign_id, started_at) VALUES (?, ?, ?)",
+                    [(run_id, campaign_id, time.time())])
+
+    def record_metrics(self, run_id: str, campaign_id: str, node: str, metrics: Dict[str, float]) -> None:
+        self.record_run(run_id, campaign_id)
+        now = time.time()
+        self._write("INSERT INTO metrics (run_id, campaign_id, node, ts, name, value) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(run_id, campaign_id, node, now, k, v) for k, v in metrics.items()])
+
+    def record_event(self, run_id: str, campaign_id: str, node: str, kind: str, payload: Any) -> None:
+        self.record_run(run_id, campaign_id)
+        self._write("INSERT INTO events (run_id, campaign_id, node, kind, ts, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(run_id, campaign_id, node, kind, time.time(),
+                      json.dumps(payload, ensure_ascii=False, default=json_or_str))])
+
+    def record_responses(self, run_id: str, campaign_id: str, node: str, responses: List[Dict[str, Any]]) -> None:
+        self.record_run(run_id, campaign_id)
+        now = time.time()
+        self._write(
+            "INSERT INTO responses (run_id, campaign_id, node, ts, lead, opened, clicked, replied, booked_meeting)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, campaign_id, node, now, None if r.get("lead") is None else str(r.get("lead")),
+              *(int(bool(r.get(f))) for f in RESPONSE_FLAGS)) for r in responses],
+        )
+
+    def record_segments(self, run_id: str, campaign_id: str, node: str, counts: Dict[tuple, List[int]]) -> None:
+        """counts: {(dim, value): [n, opened, clicked, replied, booked_meeting]} for one run."""
+        self.record_run(run_id, campaign_id)
+        now = time.time()
+        self._write(
+            "INSERT INTO segments (run_id, campaign_id, node, ts, dim, value, n, opened, clicked, replied, booked_meeting)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, campaign_id, node, now, dim, value, *c) for (dim, value), c in counts.items()],
+        )
+
+    # -- event-driven response tracking ----------------------------------
+    def register_messages(self, run_id: str, campaign_id: str, sent: List[Dict[str, Any]]) -> int:
+        """Index sent messages by message_key(), provider message id and lead; returns how many were new."""
+        now = time.time()
+        rows = [(message_key(s), campaign_id, run_id, None if s.get("lead") is None else str(s["lead"]),
+                 json.dumps(s["segment"]) if s.get("segment") else None, now, s.get("message_id"))
+                for s in sent if message_key(s) and s.get("status", "sent") in ("sent", "skipped")]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                added = self._db.executemany(
+                    "INSERT OR IGNORE INTO messages (message_id, campaign_id, run_id, lead, segment, sent_at, provider_id)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)", rows).rowcount
+                self._db.execute(
+                    "INSERT INTO campaign_totals (campaign_id, sent, updated_at) VALUES (?, ?, ?)"
+                    " ON CONFLICT(campaign_id) DO UPDATE SET sent = sent + excluded.sent, updated_at = excluded.updated_at",
+                    (campaign_id, max(added, 0), now))
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        return max(added, 0)
+
+    def apply_events(self, events: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Set response flags from events in one transaction; campaign totals move only on 0 -> 1 flips.
+
+        An event is matched by, in order: its idempotency key (top level, as SendGrid flattens
+        custom_args, or under "custom_args"), its SendGrid sg_message_id (whose prefix is the
+        X-Message-Id returned at send time), its message_id, or a campaign_id + lead (the lead's
+        latest message is used).
+        """
+        applied = duplicate = unknown = 0
+        deltas: Dict[str, Dict[str, int]] = {}
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for ev in events:
+                    flag = EVENT_FLAGS.get(str(ev.get("event", "")).lower())
+                    if flag is None:
+                        unknown += 1
+                        continue
+                    row = self._find_message(ev, flag)
+                    if row is None:
+                        unknown += 1
+                        continue
+                    message_id, campaign_id, already = row
+                    d = deltas.setdefault(campaign_id, {"events": 0})
+                    d["events"] += 1
+                    if already:
+                        duplicate += 1
+                        continue
+                    self._db.execute(f"UPDATE messages SET {flag} = 1, updated_at = ? WHERE message_id = ?", (now, message_id))
+                    d[flag] = d.get(flag, 0) + 1
+                    applied += 1
+                for campaign_id, d in deltas.items():
+                    self._db.execute(
+                        "INSERT INTO campaign_totals (campaign_id, updated_at) VALUES (?, ?) ON CONFLICT(campaign_id) DO NOTHING",
+                        (campaign_id, now))
+                    self._db.execute(
+                        "UPDATE campaign_totals SET " + ", ".join(f"{k} = {k} + ?" for k in d) + ", updated_at = ?"
+                        " WHERE campaign_id = ?", (*d.values(), now, campaign_id))
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        return {"applied": applied, "duplicate": duplicate, "unknown": unknown}
+
+    def _find_message(self, ev: Dict[str, Any], flag: str) -> Optional[tuple]:
+        select = f"SELECT message_id, campaign_id, {flag} FROM messages WHERE "
+        custom = ev.get("custom_args") if isinstance(ev.get("custom_args"), dict) else {}
+        idem = ev.get("idempotency_key") or custom.get("idempotency_key")
+        if idem:
+            return self._db.execute(select + "message_id = ?", (idem,)).fetchone()
+        if ev.get("sg_message_id"):
+            # "<X-Message-Id>.filter...": the prefix is what send_batch stored as the provider id
+            return self._db.execute(select + "provider_id = ? ORDER BY sent_at DESC LIMIT 1",
+                                    (str(ev["sg_message_id"]).split(".", 1)[0],)).fetchone()
+        if ev.get("message_id"):
+            return self._db.execute(select + "message_id = ? OR provider_id = ? LIMIT 1",
+                                    (ev["message_id"], ev["message_id"])).fetchone()
+        return self._db.execute(select + "campaign_id = ? AND lead = ? ORDER BY sent_at DESC LIMIT 1",
+                                (ev.get("campaign_id"), ev.get("lead"))).fetchone()
+
+    def message_states(self, message_ids: List[str]) -> List[Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for i in range(0, len(message_ids), 500):
+            part = message_ids[i:i + 500]
+            for mid, provider_id, lead, segment, *flags in self._query(
+                "SELECT message_id, provider_id, lead, segment, " + ", ".join(RESPONSE_FLAGS) +
+                f" FROM messages WHERE message_id IN ({','.join('?' * len(part))})", part):
+                out[mid] = {"lead": lead, "message_id": provider_id or mid, **{f: bool(v) for f, v in zip(RESPONSE_FLAGS, flags)},
+                            **({"segment": json.loads(segment)} if segment else {})}
+        return [out[m] for m in message_ids if m in out]
+
+    def messages_for_lead(self, campaign_id: str, lead: str) -> List[str]:
+        rows = self._query("SELECT message_id FROM messages WHERE campaign_id = ? AND lead = ? ORDER BY sent_at",
+                           (campaign_id, lead))
+        return [r[0] for r in rows]
+
+    def campaign_totals(self, campaign_id: str) -> Dict[str, int]:
+        cols = ("sent", *RESPONSE_FLAGS, "events")
+        rows = self._query(f"SELECT {', '.join(cols)} FROM campaign_totals WHERE campaign_id = ?", (campaign_id,))
+        return dict(zip(cols, rows[0] if rows else (0,) * len(cols)))
+
+    def get_offset(self, source: str) -> int:
+        rows = self._query("SELECT offset FROM ingest_offsets WHERE source = ?", (source,))
+        return rows[0][0] if rows else 0
+
+    def set_offset(self, source: str, offset: int) -> None:
+        self._write("INSERT OR REPLACE INTO ingest_offsets (source, offset) VALUES (?, ?)", [(source, offset)])
+
+    # -- queries --------------------------------------------------------
+    def campaigns(self) -> List[str]:
+        return [r[0] for r in self._query("SELECT DISTINCT campaign_id FROM runs ORDER BY campaign_id")]
+
+    def recent_runs(self, campaign_id: str, limit: int = 30) -> List[str]:
+        rows = self._query("SELECT run_id FROM runs WHERE campaign_id = ? ORDER BY started_at DESC LIMIT ?",
+                           (campaign_id, limit))
+        return [r[0] for r in rows]
+
+    def metrics_history(self, campaign_id: str, last_runs: int = 30) -> List[Dict[str, Any]]:
+        """[{run_id, ts, metrics: {name: value}}] for the campaign's last N runs that logged metrics, oldest first."""
+        rows = self._query(
+            "SELECT run_id, ts, name, value FROM metrics WHERE campaign_id = ? AND run_id IN ("
+            " SELECT run_id FROM (SELECT run_id, MAX(ts) AS last FROM metrics WHERE campaign_id = ?"
+            " GROUP BY run_id ORDER BY last DESC LIMIT ?)) ORDER BY ts",
+            (campaign_id, campaign_id, last_runs),
+        )
+        runs: Dict[str, Dict[str, Any]] = {}
+        for run_id, ts, name, value in rows:
+            r = runs.setdefault(run_id, {"run_id": run_id, "ts": ts, "metrics": {}})
+            r["ts"] = ts
+            r["metrics"][name] = value
+        return list(runs.values())
+
+    def segment_window(self, campaign_id: str, last_runs: int = 30) -> Dict[tuple, List[int]]:
+        """Per-segment counters summed over the campaign's last N runs (only per-run aggregates are read)."""
+        rows = self._query(
+            "SELECT dim, value, SUM(n), " + ", ".join(f"SUM({f})" for f in RESPONSE_FLAGS) +
+            " FROM segments WHERE campaign_id = ? AND run_id IN ("
+            " SELECT run_id FROM (SELECT run_id, MAX(ts) AS last FROM segments WHERE campaign_id = ?"
+            " GROUP BY run_id ORDER BY last DESC LIMIT ?)) GROUP BY dim, value",
+            (campaign_id, campaign_id, last_runs),
+        )
+        return {(dim, value): list(c) for dim, value, *c in rows}
+
+    def latest_event(self, campaign_id: str, kind: str, node: Optional[str] = None) -> Any:
+        sql, params = "SELECT payload FROM events WHERE campaign_id = ? AND kind = ?", [campaign_id, kind]
+        if node is not None:
+            sql, params = "SELECT payload FROM events WHERE campaign_id = ? AND node = ? AND kind = ?", [campaign_id, node, kind]
+        rows = self._query(sql + " ORDER BY ts DESC LIMIT 1", params)
+        return json.loads(rows[0][0]) if rows else None
+
+    def response_totals(self, campaign_id: str, run_id: Optional[str] = None) -> Dict[str, int]:
+        sql = "SELECT COUNT(*), " + ", ".join(f"COALESCE(SUM({f}), 0)" for f in RESPONSE_FLAGS) + \
+              " FROM responses WHERE campaign_id = ?"
+        params: List[Any] = [campaign_id]
+        if run_id is not None:
+            sql += " AND run_id = ?"
+            params.append(run_id)
+        total, *counts = self._query(sql, params)[0]
+        return {"responses": total, **dict(zip(RESPONSE_FLAGS, counts))}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+_stores: Dict[tuple, RunStore] = {}
+_stores_lock = threading.Lock()
+
+def get_store(path: Optional[str | pathlib.Path] = None) -> RunStore:
+    # One connection per store file per process (agents on parallel steps share it; forks reconnect)
+    key = (os.getpid(), pathlib.Path(path) if path is not None else default_path())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = RunStore(key[1])
+        return store
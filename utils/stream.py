@@ -0,0 +1,18 @@
+from __future__ import annotations
+import itertools
+from typing import Any, Iterable, Iterator, List
+
+# In streaming mode, lead lists are passed between agents as lazy iterators of chunks
+# (each chunk a plain list of lead dicts). A stream can only be consumed once.
+DEFAULT_CHUNK_SIZE = 500
+
+def chunked(items: Iterable[Any], size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Any]]:
+    it = iter(items)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def is_stream(obj: Any) -> bool:
+    return isinstance(obj, Iterator)
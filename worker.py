@@ -0,0 +1,137 @@
+from __future__ import annotations
+import argparse, json, os, sys, threading, time, traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+import langgraph_builder as lgb
+from utils import logger
+from utils.checkpoint import CheckpointStore
+from utils.leads import json_or_str
+
+# ------------------------------------------------------------------
+# 🔥 Warm worker: agents, clients and model handles stay loaded between runs
+# ------------------------------------------------------------------
+class Worker:
+    def __init__(self):
+        self.started = time.time()
+        self.runs = 0
+        self.lock = threading.Lock()  # one run at a time per worker; start more workers for concurrency
+
+    def warm(self) -> None:
+        from tools.clients import load_env
+        load_env()
+        for path in lgb.AGENT_MAP.values():
+            lgb.dimport(path)
+        key = os.getenv("GEMINI_API_KEY")
+        if key:
+            from agents.outreach_content import DEFAULT_MODEL, get_model
+            try:
+                get_model(os.getenv("GEMINI_MODEL", DEFAULT_MODEL), key)
+            except Exception as e:
+                print(f"Gemini warm-up failed: {e}", file=sys.stderr)
+
+    def compile(self, req: Any) -> lgb.Plan:
+        """Validate a /run request up front; raises ValueError if it can never run (a 400, not a 500)."""
+        if not isinstance(req, dict) or not isinstance(req.get("workflow"), dict):
+            raise ValueError("request must be a JSON object with a 'workflow' object")
+        try:
+            plan = lgb.compile_workflow(req["workflow"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"invalid workflow: {type(e).__name__}: {e}") from e
+        unknown = [f"{s.id}: unknown agent {s.agent!r}" for s in plan.steps if s.agent not in lgb.AGENT_MAP]
+        if unknown:
+            raise ValueError(f"invalid workflow: {'; '.join(unknown)}")
+        return plan
+
+    def run(self, req: Dict[str, Any], plan: lgb.Plan | None = None) -> Dict[str, Any]:
+        workflow = req["workflow"]
+        plan = plan or self.compile(req)
+        with self.lock:
+            run_id = logger.configure(run_id=req.get("run_id") or logger.new_run_id())
+            t0 = time.perf_counter()
+            checkpoints = None if req.get("no_checkpoint") else CheckpointStore(logger.RUN_DIR / "checkpoints")
+            ctx = lgb.run_workflow(plan, max_parallel=int(req.get("max_parallel", 1)), checkpoints=checkpoints,
+                                   resume=bool(req.get("resume")), profile=bool(req.get("profile")))
+            logger.flush()
+            self.runs += 1
+        return {
+            "run_id": run_id,
+            "elapsed_s": round(time.perf_counter() - t0, 4),
+            "final": ctx["steps"][workflow["steps"][-1]["id"]],
+            "profile": ctx.get("profile"),
+            "profile_run": ctx.get("profile_run"),
+        }
+
+    def health(self) -> Dict[str, Any]:
+        return {"ok": True, "runs": self.runs, "uptime_s": round(time.time() - self.started, 1),
+                "agents": sorted(lgb.AGENT_MAP)}
+
+def make_handler(worker: Worker):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: Dict[str, Any]):
+            data = json.dumps(body, default=json_or_str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, worker.health())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/run":
+                self._send(404, {"error": "not found"}); return
+            try:
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                plan = worker.compile(req)
+            except ValueError as e:
+                self._send(400, {"error": str(e)}); return
+            # Past validation, any failure (KeyError/ValueError included) is the workflow's, not the request's
+            try:
+                self._send(200, worker.run(req, plan))
+            except Exception as e:
+                traceback.print_exc()
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+def submit(url: str, workflow: Dict[str, Any], **options) -> Dict[str, Any]:
+    import urllib.request
+    req = urllib.request.Request(f"{url.rstrip('/')}/run", data=json.dumps({"workflow": workflow, **options}).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(json.loads(e.read() or b"{}").get("error", str(e))) from e
+
+def serve(host: str = "127.0.0.1", port: int = 8787) -> ThreadingHTTPServer:
+    worker = Worker()
+    worker.warm()
+    server = ThreadingHTTPServer((host, port), make_handler(worker))
+    server.daemon_threads = True
+    return server
+
+def main():
+    ap = argparse.ArgumentParser(description="Resident worker that runs workflows with agents/clients kept warm")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8787)
+    args = ap.parse_args()
+    server = serve(args.host, args.port)
+    print(f"Worker listening on http://{args.host}:{server.server_address[1]} (POST /run, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()